@@ -0,0 +1,105 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure the ``QtEventLoop`` used by ``eval_asyncio``: the duration of many
+concurrent requests to a local echo server, the longest stall of the GUI
+event loop meanwhile, and the number of loop iterations while idle.
+"""
+
+import asyncio
+import time
+
+from qtpy.QtCore import QEventLoop, QTimer
+from qtpy.QtWidgets import QApplication
+
+from pyqtconsole.qtasyncio import QtEventLoop
+
+
+async def echo(reader, writer):
+    while True:
+        data = await reader.read(1024)
+        if not data:
+            break
+        writer.write(data)
+    writer.close()
+
+
+async def client(port, rounds):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    for i in range(rounds):
+        writer.write(b'ping')
+        await reader.readexactly(4)
+    writer.close()
+
+
+async def requests(clients, rounds):
+    server = await asyncio.start_server(echo, '127.0.0.1', 0, backlog=1024)
+    port = server.sockets[0].getsockname()[1]
+    await asyncio.gather(*(client(port, rounds) for i in range(clients)))
+    server.close()
+    await server.wait_closed()
+
+
+async def sleeps(count, delay):
+    await asyncio.gather(*(asyncio.sleep(delay) for i in range(count)))
+
+
+def run(app, loop, coro):
+    task = loop.create_task(coro)
+    while not task.done():
+        app.processEvents(QEventLoop.WaitForMoreEvents)
+    return task.result()
+
+
+def measure(app, loop, coro):
+    """Return the duration and the largest gap between timer events while
+    running the coroutine."""
+    ticks = []
+    timer = QTimer()
+    timer.timeout.connect(lambda: ticks.append(time.time()))
+    timer.start(1)
+    start = time.time()
+    run(app, loop, coro)
+    end = time.time()
+    timer.stop()
+    ticks = [start] + [t for t in ticks if t > start] + [end]
+    return end - start, max(b - a for a, b in zip(ticks, ticks[1:]))
+
+
+def count_idle_iterations(app, loop, seconds=1):
+    iterations = [0]
+    run_forever = loop.run_forever
+
+    def counting_run_forever():
+        iterations[0] += 1
+        run_forever()
+    loop.run_forever = counting_run_forever
+    # a pending timer far in the future and an idle connection:
+    loop.call_later(3600, lambda: None)
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        app.processEvents(QEventLoop.AllEvents, 100)
+    del loop.run_forever
+    return iterations[0]
+
+
+def main():
+    app = QApplication([])
+    loop = QtEventLoop()
+    asyncio.set_event_loop(loop)
+    print('%8s  %6s  %9s  %12s' % ('clients', 'rounds', 'duration',
+                                   'longest stall'))
+    for clients, rounds in [(1, 1000), (100, 10), (500, 2)]:
+        duration, stall = measure(app, loop, requests(clients, rounds))
+        print('%8d  %6d  %7.0f ms  %9.1f ms' % (
+            clients, rounds, duration * 1e3, stall * 1e3))
+    duration, stall = measure(app, loop, sleeps(10000, 0.5))
+    print('10000 concurrent sleep(0.5): %.0f ms, longest stall %.1f ms' % (
+        duration * 1e3, stall * 1e3))
+    print('iterations while idle for 1s: %d' % count_idle_iterations(
+        app, loop))
+    loop.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure the overhead of ``PythonConsole.enable_cell_stats`` on executing a
+trivial command and an allocation heavy command, without statistics, with
+time and output statistics, and with traced memory allocation.
+"""
+
+import time
+
+from pyqtconsole.interpreter import PythonInterpreter
+
+COMMANDS = [
+    ('x = 1', 'x = 1\n', 10000),
+    ('allocate', 'data = [str(i) for i in range(100000)]\n', 20),
+]
+
+
+class Output(object):
+
+    def write(self, data):
+        pass
+
+    def flush(self):
+        pass
+
+
+def measure(source, repeat, collect, memory):
+    interpreter = PythonInterpreter(None, Output())
+    interpreter.collect_stats = collect
+    interpreter.trace_memory = memory
+    codes = interpreter.compile(source, '<input>', 'multi')
+    start = time.time()
+    for i in range(repeat):
+        interpreter.exec_(codes)
+    return (time.time() - start) / repeat
+
+
+def main():
+    print('%-10s  %12s  %12s  %12s' % ('command', 'no stats', 'stats',
+                                       'memory'))
+    for name, source, repeat in COMMANDS:
+        times = [measure(source, repeat, collect, memory)
+                 for collect, memory in [(False, False), (True, False),
+                                         (True, True)]]
+        print('%-10s  %9.1f µs  %9.1f µs  %9.1f µs' % (
+            (name,) + tuple(t * 1e6 for t in times)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure the time needed to layout completion lists of different sizes.
+"""
+
+import random
+import string
+import time
+
+from pyqtconsole.text import columnize, common_prefix
+
+
+def make_words(count, seed=0):
+    rng = random.Random(seed)
+    chars = string.ascii_lowercase + '_'
+    return ['x' + ''.join(rng.choice(chars)
+                          for _ in range(rng.randrange(2, 20)))
+            for _ in range(count)]
+
+
+def measure(func, *args, **kwargs):
+    start = time.time()
+    func(*args, **kwargs)
+    return time.time() - start
+
+
+def main(sizes=(100, 1000, 3000)):
+    print('%6s  %12s  %12s  %12s' % (
+        'words', 'vertical', 'horizontal', 'prefix'))
+    for size in sizes:
+        words = make_words(size)
+        print('%6d  %9.3f ms  %9.3f ms  %9.3f ms' % (
+            size,
+            measure(columnize, words, colsep='  |  ') * 1e3,
+            measure(columnize, words, arrange_vertical=False) * 1e3,
+            measure(common_prefix, words) * 1e3,
+        ))
+
+
+if __name__ == '__main__':
+    main()
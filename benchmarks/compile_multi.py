@@ -0,0 +1,54 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure the time needed by the interpreter to compile a pasted script when
+pressing Enter, and when pressing Enter again to finish its last block.
+"""
+
+import time
+from codeop import CommandCompiler
+
+from pyqtconsole.interpreter import compile_multi, CompileCache
+
+CHUNK = '''\
+def func_%(i)d(x, y=%(i)d):
+    """Docstring."""
+    if x > y:
+        return [i * x for i in range(y)]
+    return {'x': x, 'y': y}
+
+value_%(i)d = func_%(i)d(%(i)d) + [%(i)d]
+'''
+
+
+def make_script(lines):
+    chunks = []
+    for i in range(lines // CHUNK.count('\n')):
+        chunks.append(CHUNK % {'i': i})
+    return ''.join(chunks) + 'for i in range(3):\n    print(i)'
+
+
+def measure(func, *args):
+    start = time.time()
+    func(*args)
+    return (time.time() - start) * 1e3
+
+
+def main(lines=5000):
+    source = make_script(lines)
+    compiler = CommandCompiler()
+    cache = CompileCache()
+
+    def compile_source(source):
+        return compile_multi(compiler, source, '<input>', 'multi', cache)
+
+    print('lines: %d' % source.count('\n'))
+    # The trailing block is incomplete until followed by an empty line:
+    print('enter:        %9.3f ms' % measure(compile_source, source))
+    print('enter again:  %9.3f ms' % measure(compile_source, source + '\n'))
+    cache.clear()
+    print('uncached:     %9.3f ms' % measure(compile_source, source + '\n'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure the latency of updating the completion dropdown with lists of
+different sizes.
+"""
+
+import time
+
+from qtpy.QtWidgets import QApplication
+from pyqtconsole.console import PythonConsole
+from pyqtconsole.autocomplete import COMPLETE_MODE
+
+
+def main(sizes=(10, 100, 1000), number=200):
+    app = QApplication([])
+    console = PythonConsole()
+    console.set_auto_complete_mode(COMPLETE_MODE.DROPDOWN)
+    console.show()
+    console.insert_input_text('x')
+    auto_complete = console.auto_complete
+    print('%6s  %12s' % ('words', 'update'))
+    for size in sizes:
+        words = ['x%05d' % i for i in range(size)]
+        start = time.time()
+        for i in range(number):
+            auto_complete.show_completion_suggestions(words[i % 2:])
+            app.processEvents()
+        elapsed = (time.time() - start) / number
+        print('%6d  %9.3f ms' % (size, elapsed * 1e3))
+    console.exit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure the time needed to compute completions with the different
+completion tiers.
+"""
+
+import os
+import time
+
+from qtpy.QtWidgets import QApplication
+from pyqtconsole.console import PythonConsole
+from pyqtconsole.autocomplete import COMPLETE_TIER
+from pyqtconsole.completer import jedi_completions
+
+LINES = ['o', 'os.pa', 'os.path.jo', 'os.getcwd().up']
+
+
+def main(number=20):
+    app = QApplication([])      # noqa: F841
+    console = PythonConsole(locals={'os': os})
+    tiers = [COMPLETE_TIER.NAMESPACE, COMPLETE_TIER.JEDI, COMPLETE_TIER.AUTO]
+    print('%-16s' % 'line' + ''.join('  %12s' % tier for tier in tiers))
+    jedi_completions(LINES[0], console.interpreter.locals)     # warm up
+    for line in LINES:
+        times = []
+        for tier in tiers:
+            console.set_completion_tier(tier)
+            start = time.time()
+            for i in range(number):
+                console._get_completions(line)
+            times.append((time.time() - start) / number)
+        print('%-16s' % line + ''.join(
+            '  %9.3f ms' % (t * 1e3) for t in times))
+    console.exit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure the import time of the console and the latency of the first
+completion that needs jedi, with or without warming up in the background.
+
+Usage: python first_completion.py [--warm-up]
+"""
+
+import os
+import sys
+import threading
+import time
+
+
+def main(warm_up=False):
+    start = time.time()
+    from qtpy.QtWidgets import QApplication
+    from pyqtconsole.console import PythonConsole
+    print('import:           %9.3f ms' % ((time.time() - start) * 1e3))
+
+    app = QApplication([])
+    console = PythonConsole(locals={'os': os})
+    if warm_up:
+        done = threading.Event()
+        console.warm_up_completion(0)
+        app.processEvents()
+        console.auto_complete.call_in_background(done.set)
+        start = time.time()
+        done.wait()
+        print('warm-up:          %9.3f ms' % ((time.time() - start) * 1e3))
+
+    start = time.time()
+    console.get_completions('os.getcwd().up')
+    print('first completion: %9.3f ms' % ((time.time() - start) * 1e3))
+    console.exit()
+
+
+if __name__ == '__main__':
+    main('--warm-up' in sys.argv[1:])
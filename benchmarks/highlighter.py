@@ -0,0 +1,33 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure the time needed to highlight lines of python code of different
+lengths.
+"""
+
+import time
+
+from qtpy.QtGui import QTextDocument
+from qtpy.QtWidgets import QApplication
+from pyqtconsole.highlighter import PythonHighlighter
+
+CODE = "if x in (1, 2.5): y = foo('abc', \"def\") or None  # comment "
+
+
+def main(lengths=(80, 1000, 10000, 100000), total=1000000):
+    app = QApplication([])      # noqa: F841
+    print('%10s  %12s  %12s' % ('line length', 'per line', 'per char'))
+    for length in lengths:
+        line = (CODE * (length // len(CODE) + 1))[:length]
+        lines = max(total // length, 1)
+        document = QTextDocument('\n'.join([line] * lines))
+        highlighter = PythonHighlighter(document)
+        start = time.time()
+        highlighter.rehighlight()
+        elapsed = (time.time() - start) / lines
+        print('%10d  %9.3f ms  %9.3f us' % (
+            length, elapsed * 1e3, elapsed / length * 1e6))
+
+
+if __name__ == '__main__':
+    main()
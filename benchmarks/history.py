@@ -0,0 +1,50 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure the time needed to load a large history file lazily (as the console
+does) compared to reading the entire file, and the time needed to compact it.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from itertools import islice
+
+from pyqtconsole.commandhistory import HistoryFile
+
+
+def measure(func, *args):
+    start = time.time()
+    func(*args)
+    return (time.time() - start) * 1e3
+
+
+def read_all(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def main(size=1000000, maxsize=10000):
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmpdir, 'history')
+        with open(path, 'w') as f:
+            for i in range(size):
+                f.write(json.dumps('print("entry %d")' % i) + '\n')
+        history = HistoryFile(path, maxsize=size)
+        print('entries:         %9d' % size)
+        print('first 64:        %9.3f ms' % measure(
+            lambda: list(islice(history.entries(), 64))))
+        print('last %d:      %9.3f ms' % (maxsize, measure(
+            lambda: list(islice(history.entries(), maxsize)))))
+        print('read all:        %9.3f ms' % measure(read_all, path))
+        history.maxsize = maxsize
+        print('compact:         %9.3f ms' % measure(history.compact))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure the time per keystroke of the reverse incremental history search
+(Ctrl-R) with the history index compared to a linear scan, and the time
+needed to find the entries for prefix-filtered history navigation.
+"""
+
+import random
+import time
+
+from pyqtconsole.commandhistory import HistoryIndex
+
+WORDS = ['print', 'np', 'array', 'x', 'y', 'foo', 'bar', 'import', 'os',
+         'path', 'join', 'for', 'in', 'range', 'len', 'data', 'self',
+         'value', 'result', 'plot']
+
+QUERIES = ['print(', 'np.array', 'plot(value', 'import os', 'result7',
+           'zq', 'range(len(data', 'x y foo(12)']
+
+
+def make_entries(count, seed=0):
+    rng = random.Random(seed)
+    return ['%s(%d)' % (' '.join(
+        rng.choice(WORDS) + (str(rng.randrange(100))
+                             if rng.random() < 0.3 else '')
+        for _ in range(rng.randrange(2, 10))), rng.randrange(1000))
+        for _ in range(count)]
+
+
+def linear_find(entries, query, stop):
+    for i in range(min(stop, len(entries)) - 1, -1, -1):
+        if query in entries[i]:
+            return i
+    return -1
+
+
+def type_query(find, size, query):
+    """Simulate typing the query, return the maximum time per keystroke."""
+    worst = 0
+    match = size
+    for i in range(1, len(query) + 1):
+        start = time.time()
+        found = find(query[:i], match + 1)
+        worst = max(worst, time.time() - start)
+        if found < 0:
+            break
+        match = found
+    return worst
+
+
+def measure(func, *args):
+    start = time.time()
+    func(*args)
+    return time.time() - start
+
+
+def main(size=100000):
+    entries = make_entries(size)
+    index = HistoryIndex(entries)
+    start = time.time()
+    index.find('\x01', size)     # builds all blocks
+    print('build index: %.3f s for %d entries' % (time.time() - start, size))
+    print('%-20s  %16s  %16s' % ('query', 'index', 'linear'))
+    for query in QUERIES:
+        t_index = type_query(index.find, size, query)
+        t_linear = type_query(
+            lambda q, stop: linear_find(entries, q, stop), size, query)
+        print('%-20s  %13.3f ms  %13.3f ms' % (
+            query, t_index * 1e3, t_linear * 1e3))
+
+    start = time.time()
+    index.startswith('')
+    print('build prefix index: %.3f s' % (time.time() - start))
+    print('%-20s  %8s  %16s  %16s' % ('prefix', 'matches', 'index', 'linear'))
+    for prefix in ['print', 'np array', 'plot value', 'zq']:
+        t_index = measure(index.startswith, prefix)
+        t_linear = measure(lambda: [i for i, e in enumerate(entries)
+                                    if e.startswith(prefix)])
+        print('%-20s  %8d  %13.3f ms  %13.3f ms' % (
+            prefix, len(index.startswith(prefix)),
+            t_index * 1e3, t_linear * 1e3))
+
+
+if __name__ == '__main__':
+    main()
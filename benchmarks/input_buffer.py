@@ -0,0 +1,30 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure the cost of reading the input buffer for different scrollback sizes.
+The time should be independent of the number of lines in the console.
+"""
+
+import timeit
+
+from qtpy.QtWidgets import QApplication
+from pyqtconsole.console import PythonConsole
+
+
+def main(sizes=(1000, 100000, 500000), number=100):
+    app = QApplication([])      # noqa: F841
+    print('%10s  %16s  %16s' % ('lines', 'input_buffer', 'toPlainText'))
+    for size in sizes:
+        console = PythonConsole()
+        console._insert_output_text('some output line\n' * size)
+        console.insert_input_text('foo.bar(1, 2)')
+        t_new = timeit.timeit(console.input_buffer, number=number)
+        t_old = timeit.timeit(
+            lambda: console.edit.toPlainText()[console._prompt_pos:],
+            number=number)
+        print('%10d  %13.3f ms  %13.3f ms' % (
+            size, t_new / number * 1e3, t_old / number * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure how long it takes until ``PythonInterpreter.interrupt()`` stops a
+command in the main thread and in another thread, and the overhead that
+interrupt handling adds to executing a command. Commands that can not be
+interrupted end by themselves after 2 seconds.
+"""
+
+import os
+import threading
+import time
+
+from pyqtconsole.interpreter import PythonInterpreter
+
+COMMANDS = [
+    ('python loop', 'import time\nend = time.time() + 2\n'
+                    'while time.time() < end:\n    pass\n'),
+    ('sleep', 'import time\ntime.sleep(2)\n'),
+    ('pipe read', 'import os\nos.read(fd, 1)\n'),
+]
+
+
+class Output(object):
+
+    def write(self, data):
+        pass
+
+    def flush(self):
+        pass
+
+
+def execute(interpreter, source):
+    interpreter.exec_(interpreter.compile(source, '<input>', 'multi'))
+
+
+def measure(source, in_thread):
+    """Return the time between calling ``interrupt()`` and the end of the
+    command."""
+    interpreter = PythonInterpreter(None, Output())
+    read_fd, write_fd = os.pipe()
+    interpreter.locals['fd'] = read_fd
+    unblock = threading.Timer(2, os.write, (write_fd, b'x'))
+    unblock.start()
+    interrupted = []
+
+    def interrupt():
+        while not interpreter.executing():
+            time.sleep(0.001)
+        time.sleep(0.05)
+        interrupted.append(time.time())
+        interpreter.interrupt()
+
+    if in_thread:
+        worker = threading.Thread(target=execute, args=(interpreter, source))
+        worker.start()
+        interrupt()
+        worker.join()
+    else:
+        helper = threading.Thread(target=interrupt)
+        helper.start()
+        execute(interpreter, source)
+        helper.join()
+    end = time.time()
+    unblock.cancel()
+    unblock.join()
+    os.close(read_fd)
+    os.close(write_fd)
+    return end - interrupted[0]
+
+
+def main(repeat=10000):
+    print('%-12s  %-12s  %10s' % ('command', 'thread', 'latency'))
+    for name, source in COMMANDS:
+        for thread_name, in_thread in [('main', False), ('other', True)]:
+            latency = measure(source, in_thread)
+            print('%-12s  %-12s  %7.2f ms' % (
+                name, thread_name, latency * 1e3))
+    interpreter = PythonInterpreter(None, Output())
+    codes = interpreter.compile('x = 1', '<input>', 'multi')
+    start = time.time()
+    for i in range(repeat):
+        interpreter.exec_(codes)
+    print('execute "x = 1": %.1f µs' % ((time.time() - start) / repeat * 1e6))
+
+
+if __name__ == '__main__':
+    main()
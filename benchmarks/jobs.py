@@ -0,0 +1,58 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure the time needed to submit a background job, and the total time of
+several CPU bound jobs compared to executing them one after another.
+"""
+
+import os
+import time
+
+from qtpy.QtWidgets import QApplication
+
+from pyqtconsole.jobs import JobManager
+
+SOURCE = 'x = sum(i * i for i in range(n))'
+
+
+class Interpreter(object):
+
+    def __init__(self, **locals):
+        self.locals = locals
+        self.namespace_generation = 0
+
+
+class Output(object):
+
+    def write(self, data):
+        pass
+
+
+def main(count=4, n=3 * 10 ** 6):
+    app = QApplication([])
+    manager = JobManager(Interpreter(n=n), Output())
+    try:
+        manager.submit('0')     # start the worker processes
+        manager.wait()
+        app.processEvents()
+
+        start = time.time()
+        for i in range(count):
+            exec(SOURCE, {'n': n})
+        sequential = time.time() - start
+
+        start = time.time()
+        jobs = [manager.submit(SOURCE) for i in range(count)]
+        submitted = time.time() - start
+        manager.wait()
+        concurrent = time.time() - start
+    finally:
+        manager.shutdown()
+    print('cpus:            %d' % os.cpu_count())
+    print('submit:          %7.3f ms per job' % (submitted / len(jobs) * 1e3))
+    print('sequential:      %7.3f s for %d jobs' % (sequential, count))
+    print('background jobs: %7.3f s for %d jobs' % (concurrent, count))
+
+
+if __name__ == '__main__':
+    main()
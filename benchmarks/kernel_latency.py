@@ -0,0 +1,69 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure how long the GUI event loop is blocked while the console executes a
+CPU bound command in a thread (``eval_in_thread``) compared to a separate
+process (``eval_in_subprocess``).
+"""
+
+import time
+
+from qtpy.QtCore import QEventLoop, QTimer
+from qtpy.QtWidgets import QApplication
+
+from pyqtconsole.console import PythonConsole
+
+COMMANDS = [
+    # pure python, the GIL is switched every 5 ms:
+    'for i in range(10 ** 7): pass\n',
+    # C code that holds the GIL until it is done:
+    'x = sum(range(10 ** 8))',
+]
+
+
+def run(app, console, source):
+    """Execute the source and wait until the next prompt is shown."""
+    line = console._current_line
+    console.process_input(source)
+    while console._current_line == line:
+        app.processEvents(QEventLoop.WaitForMoreEvents)
+
+
+def measure(app, setup, source):
+    """Return the duration and the largest gap between timer events while
+    executing the source."""
+    console = PythonConsole()
+    setup(console)
+    try:
+        ticks = []
+        timer = QTimer()
+        timer.timeout.connect(lambda: ticks.append(time.time()))
+        timer.start(1)
+        run(app, console, '0')
+        start = time.time()
+        run(app, console, source)
+        end = time.time()
+        timer.stop()
+        ticks = [start] + [t for t in ticks if t > start] + [end]
+        return end - start, max(b - a for a, b in zip(ticks, ticks[1:]))
+    finally:
+        console.exit()
+
+
+def main():
+    app = QApplication([])
+    modes = [
+        ('thread', PythonConsole.eval_in_thread),
+        ('subprocess', PythonConsole.eval_in_subprocess),
+    ]
+    print('%-32s  %-10s  %9s  %12s' % ('command', 'mode', 'duration',
+                                       'longest stall'))
+    for source in COMMANDS:
+        for name, setup in modes:
+            duration, stall = measure(app, setup, source)
+            print('%-32s  %-10s  %7.0f ms  %9.0f ms' % (
+                source.strip(), name, duration * 1e3, stall * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure how long it takes to insert program output into the console when the
+output is lexed by the syntax highlighter (as before) and when it is marked
+as output and skipped.
+"""
+
+import time
+
+from qtpy.QtGui import QTextCursor
+from qtpy.QtWidgets import QApplication
+from pyqtconsole.console import PythonConsole
+
+LINE = "{'key': [1, 2.5, 0x1f], 'def': \"if x in y or not z\"}  # for\n"
+
+
+def lexed(console, text):
+    cursor = console._textCursor()
+    cursor.movePosition(QTextCursor.End)
+    cursor.insertText(text)
+
+
+def skipped(console, text):
+    console._insert_output_text(text)
+
+
+def main(lines=20000, batch=100):
+    app = QApplication([])      # noqa: F841
+    text = LINE * batch
+    for insert in (lexed, skipped):
+        console = PythonConsole()
+        start = time.time()
+        for _ in range(lines // batch):
+            insert(console, text)
+        elapsed = time.time() - start
+        print('%-8s %8.0f lines/s' % (insert.__name__, lines / elapsed))
+
+
+if __name__ == '__main__':
+    main()
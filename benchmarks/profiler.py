@@ -0,0 +1,52 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure the overhead of ``%prun`` with ``cProfile`` and with the sampling
+profiler on a command that makes many small function calls, and the time
+needed to show the table.
+"""
+
+import time
+
+from pyqtconsole.interpreter import PythonInterpreter
+
+SETUP = '''
+def fib(n):
+    return n if n < 2 else fib(n - 1) + fib(n - 2)
+'''
+
+COMMAND = 'fib(25)\n'
+
+
+class Output(object):
+
+    def __init__(self):
+        self.chars = 0
+
+    def write(self, data):
+        self.chars += len(data)
+
+    def flush(self):
+        pass
+
+
+def measure(prefix):
+    interpreter = PythonInterpreter(None, Output())
+    interpreter.exec_signal.connect(interpreter.exec_)
+    interpreter.runsource(SETUP, symbol='multi')
+    start = time.time()
+    interpreter.runsource(prefix + COMMAND, symbol='multi')
+    return time.time() - start, interpreter.stdout.chars
+
+
+def main():
+    print('%-22s  %9s  %8s' % ('prefix', 'duration', 'output'))
+    for prefix in ['', '%prun ', '%prun -q ', '%prun -i 1 ',
+                   '%prun -i 10 ']:
+        duration, chars = measure(prefix)
+        print('%-22s  %6.0f ms  %8d' % (
+            repr(prefix + COMMAND.strip()), duration * 1e3, chars))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import asyncio
+
+from qtpy.QtWidgets import QApplication
+from pyqtconsole.console import PythonConsole
+
+
+if __name__ == '__main__':
+    app = QApplication([])
+
+    console = PythonConsole()
+    console.push_local_ns('asyncio', asyncio)
+    console.show()
+    console.eval_asyncio()
+    sys.exit(app.exec_())
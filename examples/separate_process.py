@@ -0,0 +1,17 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+
+from qtpy.QtWidgets import QApplication
+from pyqtconsole.console import PythonConsole
+
+
+if __name__ == '__main__':
+    app = QApplication([])
+
+    console = PythonConsole()
+    console.push_local_ns('argv', sys.argv)
+    console.show()
+    console.eval_in_subprocess()
+    sys.exit(app.exec_())
@@ -1,8 +1,13 @@
 # -*- coding: utf-8 -*-
-from qtpy.QtCore import Qt, QObject, QEvent
+import re
+import threading
+from collections import OrderedDict, deque
+
+from qtpy.QtCore import (
+    Qt, QObject, QEvent, QStringListModel, QTimer, Signal, Slot)
 from qtpy.QtWidgets import QCompleter
 
-from .text import columnize, long_substr
+from .text import columnize, common_prefix
 
 
 class COMPLETE_MODE(object):
@@ -10,16 +15,179 @@ class COMPLETE_MODE(object):
     INLINE = 2
 
 
+class COMPLETE_TIER(object):
+    NAMESPACE = 'namespace'     # inspect live objects only
+    JEDI = 'jedi'               # static analysis with jedi only
+    AUTO = 'auto'               # namespace first, jedi as fallback
+
+
+class CompletionCache(object):
+
+    """LRU cache for completions. Lines are split into a context and the
+    prefix of the identifier being completed. Completions for a longer prefix
+    are obtained by filtering the cached completions for a shorter prefix in
+    the same context. Entries are only valid for the same ``generation`` (of
+    the namespace). Since completers may hide private names unless the prefix
+    starts with ``_`` (or ``__``), prefixes with a different number of leading
+    underscores are cached separately.
+
+    The number of cache hits and misses is counted in ``hits`` and
+    ``misses``."""
+
+    _prefix_re = re.compile(r'\w*$', re.UNICODE)
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, line, generation, get_completions):
+        """Return the completions for ``line``, calling
+        ``get_completions(line)`` if they are not available in the cache."""
+        prefix = self._prefix_re.search(line).group()
+        private = min(len(prefix) - len(prefix.lstrip('_')), 2)
+        key = (line[:len(line)-len(prefix)], private, generation)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._entries[key] = entry
+        if entry is not None and prefix.startswith(entry[0]):
+            self.hits += 1
+            return [word for word in entry[1] if word.startswith(prefix)]
+
+        self.misses += 1
+        words = get_completions(line)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (prefix, words)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return words
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+
+
+class CompletionWorker(QObject):
+
+    """Computes completions in a background thread. Only the most recent
+    request is processed, requests that are still pending when a new one
+    arrives are dropped. Results are delivered via ``done_signal``.
+
+    Functions passed to ``call_soon`` are called in the same thread while no
+    request is pending, e.g. to prepare caches."""
+
+    done_signal = Signal(int, object)
+
+    def __init__(self, get_completions, parent=None):
+        super(CompletionWorker, self).__init__(parent)
+        self._get_completions = get_completions
+        self._cond = threading.Condition()
+        self._request = None
+        self._tasks = deque()
+        self._closed = False
+        thread = threading.Thread(target=self._run)
+        thread.daemon = True
+        thread.start()
+
+    def request(self, generation, text):
+        """Compute completions for ``text``, tagged with ``generation``."""
+        with self._cond:
+            self._request = (generation, text)
+            self._cond.notify()
+
+    def call_soon(self, func):
+        """Call ``func()`` in the background thread."""
+        with self._cond:
+            self._tasks.append(func)
+            self._cond.notify()
+
+    def close(self):
+        """Stop the background thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while (self._request is None and not self._tasks and
+                       not self._closed):
+                    self._cond.wait()
+                if self._closed:
+                    return
+                if self._request is None:
+                    task = self._tasks.popleft()
+                else:
+                    generation, text = self._request
+                    self._request = None
+                    task = None
+            if task is not None:
+                try:
+                    task()
+                except Exception:
+                    pass
+                continue
+            try:
+                words = self._get_completions(text)
+            except Exception:
+                words = []
+            try:
+                self.done_signal.emit(generation, words)
+            except RuntimeError:    # underlying C++ object was deleted
+                return
+
+
 class AutoComplete(QObject):
     def __init__(self, parent):
         super(AutoComplete, self).__init__(parent)
         self.mode = COMPLETE_MODE.INLINE
-        self.completer = None
         self._last_key = None
 
+        # The completer is reused, showing new suggestions only swaps the
+        # contents of its model:
+        self._model = QStringListModel(self)
+        self.completer = QCompleter(self._model, self)
+        self.completer.setWidget(parent.edit)
+        self.completer.setCaseSensitivity(Qt.CaseSensitive)
+        self.completer.setModelSorting(QCompleter.CaseSensitivelySortedModel)
+        self.completer.activated.connect(self._activated)
+
+        # Completions are computed asynchronously. Each request gets a new
+        # generation number, results for older generations are ignored:
+        self._generation = 0
+        self._update = False
+        self._worker = CompletionWorker(parent.get_completions, self)
+        self._worker.done_signal.connect(self._completions_ready)
+
+        # Wait for a pause in typing before updating the completions:
+        self._update_timer = QTimer(self)
+        self._update_timer.setSingleShot(True)
+        self._update_timer.setInterval(50)
+        self._update_timer.timeout.connect(self._update_completion_now)
+
         parent.edit.installEventFilter(self)
         self.init_completion_list([])
 
+    def set_delay(self, msecs):
+        """Set the delay after the last key press before the suggestions
+        shown in the dropdown are updated."""
+        self._update_timer.setInterval(msecs)
+
+    def call_in_background(self, func):
+        """Call ``func()`` in the thread that computes completions, while
+        no completions are requested."""
+        self._worker.call_soon(func)
+
+    def close(self):
+        """Stop the background thread that computes completions."""
+        self._update_timer.stop()
+        self._worker.close()
+
     def eventFilter(self, widget, event):
         if event.type() == QEvent.KeyPress:
             return bool(self.key_pressed_handler(event))
@@ -29,6 +197,9 @@ class AutoComplete(QObject):
         intercepted = False
         key = event.key()
 
+        # Any key press makes pending results outdated:
+        self._generation += 1
+
         if key == Qt.Key_Tab:
             intercepted = self.handle_tab_key(event)
         elif key in (Qt.Key_Return, Qt.Key_Enter, Qt.Key_Space):
@@ -68,40 +239,55 @@ class AutoComplete(QObject):
             return True
 
     def init_completion_list(self, words):
-        self.completer = QCompleter(words, self)
+        self._model.setStringList(words)
         self.completer.setCompletionPrefix(self.parent().input_buffer())
-        self.completer.setWidget(self.parent().edit)
-        self.completer.setCaseSensitivity(Qt.CaseSensitive)
-        self.completer.setModelSorting(QCompleter.CaseSensitivelySortedModel)
 
         if self.mode == COMPLETE_MODE.DROPDOWN:
             self.completer.setCompletionMode(QCompleter.PopupCompletion)
-            self.completer.activated.connect(self.insert_completion)
         else:
             self.completer.setCompletionMode(QCompleter.InlineCompletion)
 
+    def _activated(self, completion):
+        if self.mode == COMPLETE_MODE.DROPDOWN:
+            self.insert_completion(completion)
+
     def trigger_complete(self):
         _buffer = self.parent().input_buffer().strip()
-        self.show_completion_suggestions(_buffer)
-
-    def show_completion_suggestions(self, _buffer):
-        words = self.parent().get_completions(_buffer)
+        self.request_completions(_buffer)
+
+    def request_completions(self, _buffer, update=False):
+        """Compute completions for the given buffer in the background and
+        show them when they are ready, unless another key was pressed in the
+        meantime."""
+        self._generation += 1
+        self._update = update
+        self._worker.request(self._generation, _buffer)
+
+    @Slot(int, object)
+    def _completions_ready(self, generation, words):
+        if generation != self._generation:
+            return
+        self.show_completion_suggestions(words)
+        if self._update and self.completing():
+            self.completer.setCurrentRow(0)
+            model = self.completer.completionModel()
+            self.completer.popup().setCurrentIndex(model.index(0, 0))
 
+    def show_completion_suggestions(self, words):
         # No words to show, just return
         if len(words) == 0:
             return
 
-        # Close any popups before creating a new one
-        if self.completer.popup():
-            self.completer.popup().close()
-
         self.init_completion_list(words)
 
-        leastcmn = long_substr(words)
+        leastcmn = common_prefix(words)
         self.insert_completion(leastcmn)
 
         # If only one word to complete, just return and don't display options
         if len(words) == 1:
+            self.hide_completion_suggestions()
+            if self.mode == COMPLETE_MODE.INLINE:
+                self.parent().insert_input_text(' ')
             return
 
         if self.mode == COMPLETE_MODE.DROPDOWN:
@@ -145,20 +331,16 @@ class AutoComplete(QObject):
             self.parent().clear_input_buffer()
             self.parent().insert_input_text(completion)
 
-            words = self.parent().get_completions(completion)
-
-            if len(words) == 1:
-                self.parent().insert_input_text(' ')
-
     def update_completion(self, key):
+        if self.completing():
+            self._update_timer.start()
+
+    def _update_completion_now(self):
         if self.completing():
             _buffer = self.parent().input_buffer()
 
             if len(_buffer) > 1:
-                self.show_completion_suggestions(_buffer)
-                self.completer.setCurrentRow(0)
-                model = self.completer.completionModel()
-                self.completer.popup().setCurrentIndex(model.index(0, 0))
+                self.request_completions(_buffer, update=True)
             else:
                 self.completer.popup().hide()
 
@@ -1,34 +1,336 @@
 # -*- coding: utf-8 -*-
+import os
+import json
+import tempfile
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from itertools import islice
+
 from qtpy.QtCore import QObject
 
+try:
+    import fcntl
+except ImportError:     # windows
+    fcntl = None
+
+_replace = getattr(os, 'replace', os.rename)     # python 2
+
+try:
+    _from_bytes = int.from_bytes
+except AttributeError:      # python 2
+    def _from_bytes(data, byteorder):
+        return int(bytes(data[::-1]).encode('hex') or '0', 16)
+
+
+class HistoryFile(object):
+
+    """Append-only history file that stores one JSON encoded entry per line.
+
+    Entries are appended with a single write to a file opened in append mode,
+    so that several consoles can share the same file. The file is read
+    backwards in chunks, i.e. only the entries that are actually used need
+    to be loaded. ``compact()`` drops all but the last ``maxsize`` entries.
+    Where ``flock()`` is available, it holds an exclusive lock while the file
+    is rewritten, so that concurrent appends are not lost."""
+
+    chunk_size = 1 << 16
+
+    def __init__(self, path, maxsize=10000):
+        self.path = path
+        self.maxsize = maxsize
+
+    def append(self, entry):
+        """Append an entry to the file."""
+        data = (json.dumps(entry) + '\n').encode('ascii')
+        fd = self._open_locked(False)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def entries(self):
+        """Iterate over the last ``maxsize`` entries, newest first. The size
+        of the file is determined immediately, entries that are appended
+        afterwards are not included."""
+        records = (entry for offset, entry in self._records(self._size()))
+        return islice(records, self.maxsize)
+
+    def compact(self):
+        """Drop all but the last ``maxsize`` entries from the file."""
+        if self._size() == 0:
+            return
+        lock = self._open_locked(True)
+        try:
+            offset = 0
+            records = self._records(self._size())
+            for offset, entry in islice(
+                    records, self.maxsize, self.maxsize + 1):
+                pass
+            if offset == 0:
+                return
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path) or '.')
+            try:
+                with os.fdopen(fd, 'wb') as dst, open(self.path, 'rb') as src:
+                    src.seek(offset)
+                    # Without a lock, entries that are appended after this
+                    # loop are lost:
+                    for chunk in iter(lambda: src.read(self.chunk_size), b''):
+                        dst.write(chunk)
+                _replace(tmp, self.path)
+            except Exception:
+                os.remove(tmp)
+                raise
+        finally:
+            os.close(lock)
+
+    def _open_locked(self, exclusive):
+        """Open the file for appending and lock it. Since ``compact()``
+        replaces the file, retry until the locked file is the current one.
+        If locking fails, the file is returned unlocked."""
+        while True:
+            fd = os.open(
+                self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            if fcntl is None:
+                return fd
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            except (IOError, OSError):
+                # e.g. not supported on some network file systems:
+                return fd
+            try:
+                if os.path.samestat(os.fstat(fd), os.stat(self.path)):
+                    return fd
+            except OSError:
+                pass        # removed in the meantime
+            os.close(fd)
+
+    def _size(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def _records(self, end):
+        """Yield ``(stop, entry)`` for the entries before ``end``, last
+        first, where ``stop`` is the offset after the entry's line. Invalid
+        lines (e.g. incomplete writes) are skipped."""
+        for start, line in self._lines(end):
+            try:
+                entry = json.loads(line.decode('ascii'))
+            except ValueError:
+                continue
+            yield start + len(line) + 1, entry
+
+    def _lines(self, end):
+        """Yield ``(offset, line)`` for the non-empty lines before ``end``,
+        reading the file backwards in chunks."""
+        if end == 0:
+            return
+        with open(self.path, 'rb') as f:
+            pos = end
+            head = b''
+            while pos > 0:
+                size = min(self.chunk_size, pos)
+                pos -= size
+                f.seek(pos)
+                data = f.read(size) + head
+                lines = data.split(b'\n')
+                head = lines.pop(0)
+                stop = pos + len(data)
+                for line in reversed(lines):
+                    start = stop - len(line)
+                    if line:
+                        yield start, line
+                    stop = start - 1
+            if head:
+                yield 0, head
+
+
+class HistoryIndex(object):
+
+    """Index for finding the most recent history entries that contain a
+    given substring.
+
+    Entries are grouped into blocks. Each block stores its entries joined
+    into one string that can be searched with ``str.rfind``, and a bit mask
+    of the character 1-, 2- and 3-grams that occur in it (a bloom filter).
+    Blocks whose mask lacks any n-gram of the query are skipped. Blocks are
+    built when a search first reaches them.
+
+    For prefix lookups, a list of ``(entry, index)`` pairs is kept sorted, so
+    that the entries with a common prefix form a contiguous range."""
+
+    block_size = 128
+    bits = 8192
+
+    def __init__(self, entries=()):
+        self._entries = list(entries)
+        self._blocks = {}
+        self._sorted = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getitem__(self, index):
+        return self._entries[index]
+
+    def add(self, entry):
+        """Append an entry."""
+        self._blocks.pop(len(self._entries) // self.block_size, None)
+        if self._sorted is not None:
+            insort(self._sorted, (entry, len(self._entries)))
+        self._entries.append(entry)
+
+    def find(self, query, stop=None):
+        """Return the index of the last entry before ``stop`` that contains
+        ``query``, or -1 if there is none."""
+        size = self.block_size
+        if stop is None or stop > len(self._entries):
+            stop = len(self._entries)
+        mask = self._mask(query)
+        blocks = self._blocks
+        for num in range((stop - 1) // size, -1, -1):
+            block = blocks.get(num) or self._block(num)
+            if block[0] & mask != mask:
+                continue
+            block_mask, text, offsets = block
+            end = stop - num * size
+            if end < len(offsets):
+                # exclude entries from stop onwards, and the separator:
+                pos = text.rfind(query, 0, offsets[end] - 1)
+            else:
+                pos = text.rfind(query)
+            if pos >= 0:
+                return num * size + bisect_right(offsets, pos) - 1
+        return -1
+
+    def startswith(self, prefix):
+        """Return the sorted list of indices of the entries that start with
+        ``prefix``."""
+        if self._sorted is None:
+            self._sorted = sorted(zip(self._entries, range(len(self))))
+        items = self._sorted
+        start = stop = bisect_left(items, (prefix,))
+        while stop < len(items) and items[stop][0].startswith(prefix):
+            stop += 1
+        return sorted(index for entry, index in items[start:stop])
+
+    def _block(self, num):
+        block = self._blocks.get(num)
+        if block is None:
+            size = self.block_size
+            entries = self._entries[num*size:(num+1)*size]
+            offsets = array('i', [0])
+            for entry in entries[:-1]:
+                offsets.append(offsets[-1] + len(entry) + 1)
+            text = '\0'.join(entries)
+            block = self._blocks[num] = (self._mask(text), text, offsets)
+        return block
+
+    def _mask(self, text):
+        grams = set(text)
+        grams.update(zip(text, text[1:]))
+        grams.update(zip(text, text[1:], text[2:]))
+        bits = self.bits - 1
+        data = bytearray(self.bits >> 3)
+        for h in map(hash, grams):
+            h &= bits
+            data[h >> 3] |= 1 << (h & 7)
+        return _from_bytes(data, 'little')
+
 
 class CommandHistory(QObject):
+
+    """Command history of a console.
+
+    When navigating away from a non-empty input, only the entries that start
+    with that input are visited (like in IPython). Entries equal to the one
+    that is currently shown are skipped."""
+
     def __init__(self, parent):
         super(CommandHistory, self).__init__(parent)
         self._cmd_history = []
         self._idx = 0
         self._pending_input = ''
+        self._matches = None
+        self._file = None
+        self._older = iter(())
+        self._index = None
+
+    def set_file(self, path, maxsize=10000):
+        """Load and save the history in the given file, keeping at most
+        ``maxsize`` entries. Older entries are only read from the file when
+        navigating back to them."""
+        self._file = HistoryFile(path, maxsize)
+        self._older = self._file.entries()
+
+    def close(self):
+        """Stop reading from the history file and compact it."""
+        self._older = iter(())
+        if self._file:
+            try:
+                self._file.compact()
+            except (IOError, OSError):
+                pass
 
     def add(self, str_):
         if str_:
             self._cmd_history.append(str_)
+            if self._file:
+                try:
+                    self._file.append(str_)
+                except (IOError, OSError):
+                    # e.g. disk full, keep the history only in memory:
+                    self._file = None
+            if self._index is not None:
+                self._index.add(str_)
 
         self._pending_input = ''
+        self._matches = None
         self._idx = len(self._cmd_history)
 
     def inc(self):
-        # index starts at 0 so + 1 to make sure that we are within the
-        # limits of the list
-        if self._cmd_history:
-            self._idx = min(self._idx + 1, len(self._cmd_history))
-            self._insert_in_editor(self.current())
+        """Show the next newer matching entry, or the pending input."""
+        if self._idx == len(self._cmd_history):
+            return
+        current = self.current()
+        for idx in self._newer_matches():
+            if self._cmd_history[idx] != current:
+                break
+        else:
+            idx = len(self._cmd_history)
+        self._idx = idx
+        self._insert_in_editor(self.current())
 
     def dec(self, _input):
+        """Show the next older entry that starts with the pending input."""
         if self._idx == len(self._cmd_history):
             self._pending_input = _input
-        if len(self._cmd_history) and self._idx > 0:
-            self._idx -= 1
-            self._insert_in_editor(self.current())
+            self._matches = (self._get_index().startswith(_input)
+                             if _input else None)
+        current = self.current()
+        for idx in self._older_matches():
+            if self._cmd_history[idx] != current:
+                self._idx = idx
+                self._insert_in_editor(self.current())
+                break
+
+    def search(self, query, stop=None):
+        """Return the index of the most recent entry before ``stop`` that
+        contains ``query``, or -1. The whole history is loaded and indexed
+        on first use."""
+        return self._get_index().find(query, stop)
+
+    def load(self):
+        """Load the whole history from the file, e.g. before determining
+        positions in it."""
+        self._get_index()
+
+    def __getitem__(self, index):
+        return self._cmd_history[index]
+
+    def __len__(self):
+        return len(self._cmd_history)
 
     def current(self):
         if self._idx == len(self._cmd_history):
@@ -36,6 +338,55 @@ class CommandHistory(QObject):
         else:
             return self._cmd_history[self._idx]
 
+    def _get_index(self):
+        if self._index is None:
+            while self._load_older():
+                pass
+            self._index = HistoryIndex(self._cmd_history)
+        return self._index
+
+    def _older_matches(self):
+        """Iterate over the indices of the matching entries before the
+        current one, newest first."""
+        if self._matches is not None:
+            for i in range(bisect_left(self._matches, self._idx) - 1, -1, -1):
+                yield self._matches[i]
+        else:
+            # Empty prefix, only load older entries from file when needed:
+            idx = self._idx
+            while True:
+                if idx == 0:
+                    idx = self._load_older()
+                    if idx == 0:
+                        return
+                idx -= 1
+                yield idx
+
+    def _newer_matches(self):
+        """Iterate over the indices of the matching entries after the
+        current one, oldest first."""
+        if self._matches is not None:
+            for i in range(bisect_right(self._matches, self._idx),
+                           len(self._matches)):
+                yield self._matches[i]
+        else:
+            for idx in range(self._idx + 1, len(self._cmd_history)):
+                yield idx
+
+    def _load_older(self):
+        # Load in batches of growing size to keep the cost of prepending
+        # to the list linear:
+        count = max(len(self._cmd_history), 64)
+        try:
+            older = list(islice(self._older, count))
+        except (IOError, OSError):
+            self._older = iter(())
+            return 0
+        older.reverse()
+        self._cmd_history[:0] = older
+        self._idx += len(older)
+        return len(older)
+
     def _insert_in_editor(self, str_):
         self.parent().clear_input_buffer()
         self.parent().insert_input_text(str_)
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Completion of names and attributes, either by inspecting live objects
+(similar to ``rlcompleter``) or by static analysis with jedi.
+"""
+
+import keyword
+import re
+import types
+
+try:
+    import builtins
+    from inspect import getattr_static
+except ImportError:     # python 2
+    import __builtin__ as builtins
+    getattr_static = None
+
+# A dotted name at the end of the line, and the prefix being completed:
+CHAIN_RE = re.compile(r'((?:[^\W\d]\w*\.)*)(\w*)$', re.UNICODE)
+
+# Characters in front of the dotted name that indicate a complex expression,
+# e.g. ``foo().bar`` or ``x[0].real``:
+_COMPLEX = frozenset('.)]}\'"')
+
+# Descriptors that are safe to pass through when resolving a dotted name:
+_ROUTINES = (types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+# jedi takes a while to import, it is only loaded when it is first needed:
+_jedi = None
+
+
+def namespace_completions(line, namespace):
+    """Complete the dotted name at the end of ``line`` using the objects in
+    ``namespace`` and builtins.
+
+    Attributes are looked up statically, so properties and other descriptors
+    are never invoked. Returns ``None`` if the expression is too complex or
+    can not be resolved safely, in which case a more capable completer should
+    be tried."""
+    match = CHAIN_RE.search(line)
+    chain, prefix = match.groups()
+    start = match.start()
+    if start > 0 and line[start-1] in _COMPLEX or prefix[:1].isdigit():
+        return None
+    try:
+        if chain:
+            names = dir(resolve(chain[:-1].split('.'), namespace))
+        else:
+            names = list(namespace) + dir(builtins) + keyword.kwlist
+    except Exception:
+        return None
+    if chain and not prefix:
+        names = [name for name in names if not name.startswith('_')]
+    elif chain and prefix == '_':
+        names = [name for name in names if not name.startswith('__')]
+    return sorted(set(name for name in names if name.startswith(prefix)))
+
+
+def resolve(path, namespace):
+    """Return the object for the given list of names without invoking
+    descriptors. Raises ``AttributeError`` on failure."""
+    name = path[0]
+    if name in namespace:
+        obj = namespace[name]
+    else:
+        obj = getattr(builtins, name)
+    for name in path[1:]:
+        obj = static_getattr(obj, name)
+    return obj
+
+
+def static_getattr(obj, name):
+    """Get an attribute without triggering properties or other descriptors.
+    Raises ``AttributeError`` if this is not possible."""
+    if getattr_static is None:
+        raise AttributeError(name)
+    value = getattr_static(obj, name)
+    if isinstance(value, (staticmethod, classmethod)):
+        return value.__func__
+    if hasattr(type(value), '__get__') and not isinstance(value, _ROUTINES):
+        raise AttributeError(name)
+    return value
+
+
+def import_jedi():
+    """Import and configure jedi on first use. Returns ``None`` if jedi is
+    not installed."""
+    global _jedi
+    if _jedi is None:
+        try:
+            import jedi
+        except ImportError:
+            _jedi = False
+        else:
+            jedi.settings.case_insensitive_completion = False
+            _jedi = jedi
+    return _jedi or None
+
+
+def jedi_completions(line, namespace):
+    """Complete ``line`` by static analysis with jedi."""
+    jedi = import_jedi()
+    if jedi is None:
+        return []
+    script = jedi.Interpreter(line, [namespace])
+    if hasattr(script, 'complete'):     # jedi >= 0.16
+        completions = script.complete()
+    else:
+        completions = script.completions()
+    return [comp.name for comp in completions]
@@ -1,26 +1,26 @@
 # -*- coding: utf-8 -*-
+import ast
 import threading
-import ctypes
+import time
+import types
+import unicodedata
+from functools import partial
 from abc import abstractmethod
 
-from qtpy.QtCore import Qt, QThread, Slot, QEvent
+from qtpy.QtCore import Qt, QThread, QTimer, Slot, QEvent
 from qtpy.QtWidgets import QPlainTextEdit, QApplication, QHBoxLayout, QFrame
 from qtpy.QtGui import QFontMetrics, QTextCursor, QClipboard
 
 from .interpreter import PythonInterpreter
-from .stream import Stream
+from .kernel import KernelClient
+from .stream import InputStream, OutputStream
 from .highlighter import PythonHighlighter, PromptHighlighter
 from .commandhistory import CommandHistory
-from .autocomplete import AutoComplete, COMPLETE_MODE
-from .prompt import PromptArea
-
-try:
-    import jedi
-    from jedi import settings
-    settings.case_insensitive_completion = False
-except ImportError:
-    jedi = None
-
+from .autocomplete import (
+    AutoComplete, CompletionCache, COMPLETE_MODE, COMPLETE_TIER)
+from .completer import namespace_completions, jedi_completions, import_jedi
+from .prompt import PromptArea, PromptDoc
+from .stats import CellLog, format_stats
 
 try:                        # PyQt >= 5.11
     QueuedConnection = Qt.ConnectionType.QueuedConnection
@@ -36,6 +36,7 @@ class BaseConsole(QFrame):
         super(BaseConsole, self).__init__(parent)
 
         self.edit = edit = InputArea()
+        self.highlighter = None
         self.pbar = pbar = PromptArea(
             edit, self._get_prompt_text, PromptHighlighter(formats=formats))
 
@@ -46,24 +47,36 @@ class BaseConsole(QFrame):
         layout.setContentsMargins(0, 0, 0, 0)
         self.setLayout(layout)
 
-        self._prompt_doc = ['']
+        self._prompt_doc = PromptDoc()
         self._prompt_pos = 0
+        self._max_lines = None
+        self._max_chars = None
         self._output_inserted = False
         self._tab_chars = 4 * ' '
         self._ctrl_d_exits = False
         self._copy_buffer = ''
 
+        # State of the reverse incremental history search (Ctrl-R), the
+        # query is None while not searching:
+        self._search_query = None
+        self._search_match = -1
+        self._search_failed = False
+        self._search_saved = None
+
         self._last_input = ''
         self._more = False
         self._current_line = 0
+        # CellStats of the running command, shown next to its OUT prompt:
+        self._show_stats = False
+        self._pending_stats = None
 
         self._ps1 = 'IN [%s]: '
         self._ps2 = '...: '
         self._ps_out = 'OUT[%s]: '
         self._ps = self._ps1 % self._current_line
 
-        self.stdin = Stream()
-        self.stdout = Stream()
+        self.stdin = InputStream()
+        self.stdout = OutputStream()
         self.stdout.write_event.connect(self._stdout_data_handler)
 
         # show frame around both child widgets:
@@ -81,6 +94,8 @@ class BaseConsole(QFrame):
         edit.setGeometry(geometry)
         edit.resize(font_width*80+20, font_width*40)
 
+        # The undo stack would keep a copy of all output ever inserted:
+        edit.setUndoRedoEnabled(False)
         edit.setReadOnly(True)
         edit.setTextInteractionFlags(
             Qt.TextSelectableByMouse |
@@ -94,7 +109,7 @@ class BaseConsole(QFrame):
         self._key_event_handlers = self._get_key_event_handlers()
 
         self.command_history = CommandHistory(self)
-        self.auto_complete = jedi and AutoComplete(self)
+        self.auto_complete = AutoComplete(self)
 
         self._show_ps()
 
@@ -133,9 +148,14 @@ class BaseConsole(QFrame):
 
     @Slot(bool, object)
     def _finish_command(self, executed, result):
+        self.stdout.emit_pending()
+        stats, self._pending_stats = self._pending_stats, None
+        if stats is not None and self._show_stats:
+            summary = '# ' + format_stats(stats)
+            result = summary if result is None else result + '  ' + summary
         if result is not None:
             self._insert_output_text(
-                repr(result),
+                result,
                 prompt=self._ps_out % self._current_line)
             self._insert_output_text('\n')
 
@@ -147,9 +167,11 @@ class BaseConsole(QFrame):
         self._show_ps()
 
     def _show_ps(self):
+        self.stdout.emit_pending()
         if self._output_inserted and not self._more:
             self._insert_output_text("\n")
         self._insert_prompt_text(self._ps)
+        self._trim_scrollback()
 
     def _get_key_event_handlers(self):
         return {
@@ -168,6 +190,7 @@ class BaseConsole(QFrame):
             Qt.Key_C:           self._handle_c_key,
             Qt.Key_V:           self._handle_v_key,
             Qt.Key_U:           self._handle_u_key,
+            Qt.Key_R:           self._handle_r_key,
         }
 
     def insertFromMimeData(self, mime_data):
@@ -191,6 +214,9 @@ class BaseConsole(QFrame):
                 self._handle_ctrl_c()
             return True
 
+        if self._search_query is not None and self._handle_search_key(event):
+            return True
+
         handler = self._key_event_handlers.get(key)
         intercepted = handler and handler(event)
 
@@ -332,6 +358,86 @@ class BaseConsole(QFrame):
             self.command_history.inc()
         return True
 
+    def _handle_r_key(self, event):
+        if event.modifiers() == Qt.ControlModifier:
+            self._start_search()
+            return True
+        return False
+
+    def _start_search(self):
+        """Start a reverse incremental search in the command history."""
+        line = self.edit.document().findBlock(self._prompt_pos).blockNumber()
+        self._search_saved = (
+            self.input_buffer(), self._prompt_doc[line], self.pbar.width())
+        self._search_query = ''
+        # older entries from the history file are inserted at the front:
+        self.command_history.load()
+        self._search_match = len(self.command_history)
+        self._search_failed = False
+        self._show_search_prompt()
+
+    def _handle_search_key(self, event):
+        """Handle key press during search. Keys that are not used for
+        searching end the search and are then processed as usual."""
+        key = event.key()
+        text = event.text()
+        ctrl = event.modifiers() & Qt.ControlModifier
+        query = self._search_query
+        if key in (Qt.Key_Control, Qt.Key_Shift, Qt.Key_Alt, Qt.Key_Meta):
+            return False
+        if ctrl and key == Qt.Key_R:
+            self._search_history(query, self._search_match)
+        elif key == Qt.Key_Escape or ctrl and key == Qt.Key_G:
+            self._stop_search(restore=True)
+        elif key == Qt.Key_Backspace:
+            if query:
+                self._search_history(query[:-1], len(self.command_history))
+        elif not ctrl and text and unicodedata.category(text[0]) != 'Cc':
+            if self._search_failed:
+                # a query that contains a failed query fails as well:
+                self._search_query += text
+                self._show_search_prompt()
+            else:
+                self._search_history(query + text, self._search_match + 1)
+        else:
+            self._stop_search()
+            return False
+        return True
+
+    def _search_history(self, query, stop):
+        """Show the most recent history entry before ``stop`` containing
+        ``query``."""
+        index = self.command_history.search(query, stop)
+        self._search_query = query
+        self._search_failed = index < 0
+        if index >= 0:
+            self._search_match = index
+            self.clear_input_buffer()
+            self.insert_input_text(self.command_history[index])
+        self._show_search_prompt()
+
+    def _show_search_prompt(self):
+        self._set_input_prompt("(%sreverse-i-search)`%s': " % (
+            'failed ' if self._search_failed else '', self._search_query))
+
+    def _stop_search(self, restore=False):
+        """End search, keeping the current match unless ``restore`` is
+        true."""
+        text, prompt, width = self._search_saved
+        if restore:
+            self.clear_input_buffer()
+            self.insert_input_text(text)
+        self._search_query = None
+        self._search_saved = None
+        self._set_input_prompt(prompt)
+        self.pbar.setFixedWidth(width)
+
+    def _set_input_prompt(self, prompt):
+        line = self.edit.document().findBlock(self._prompt_pos).blockNumber()
+        self._prompt_doc[line] = prompt
+        self.pbar.adjust_width(prompt)
+        self.pbar.update()
+
     def _handle_left_key(self, event):
         return self.cursor_offset() < 1
 
@@ -405,15 +511,47 @@ class BaseConsole(QFrame):
 
         cursor = self._textCursor()
         cursor.movePosition(QTextCursor.End)
-        cursor.insertText(text)
+        if self.highlighter is None:
+            cursor.insertText(text)
+        else:
+            with self.highlighter.output_mode():
+                cursor.insertText(text)
+            # the last line will receive the next input:
+            cursor.block().setUserState(-1)
         self._prompt_pos = cursor.position()
         self.ensureCursorVisible()
 
         self._insert_prompt_text(prompt + '\n' * text.count('\n'))
         self._output_inserted = True
+        self._trim_scrollback()
         if lf:
             self.process_input('')
 
+    def _trim_scrollback(self):
+        """Remove the oldest lines that exceed the scrollback limit, together
+        with their prompts. The current input is never removed."""
+        doc = self.edit.document()
+        excess = 0
+        if self._max_lines:
+            excess = doc.blockCount() - self._max_lines
+        if self._max_chars:
+            cut = doc.characterCount() - self._max_chars
+            if cut > 0:
+                block = doc.findBlock(cut)
+                excess = max(excess, block.blockNumber() +
+                             int(cut > block.position()))
+        excess = min(excess, doc.findBlock(self._prompt_pos).blockNumber())
+        if excess <= 0:
+            return
+
+        cursor = QTextCursor(doc)
+        cursor.movePosition(QTextCursor.NextBlock, QTextCursor.KeepAnchor,
+                            excess)
+        removed = cursor.selectionEnd()
+        cursor.removeSelectedText()
+        del self._prompt_doc[:excess]
+        self._prompt_pos -= removed
+
     def _update_prompt_pos(self):
         cursor = self._textCursor()
         cursor.movePosition(QTextCursor.End)
@@ -422,7 +560,12 @@ class BaseConsole(QFrame):
 
     def input_buffer(self):
         """Retrieve current input buffer in string form."""
-        return self.edit.toPlainText()[self._prompt_pos:]
+        # Only extract the input region, the cost of toPlainText() would
+        # grow with the size of the scrollback:
+        cursor = QTextCursor(self.edit.document())
+        cursor.setPosition(self._prompt_pos)
+        cursor.movePosition(QTextCursor.End, QTextCursor.KeepAnchor)
+        return plain_text(cursor.selectedText())
 
     def cursor_offset(self):
         """Get current cursor index within input buffer."""
@@ -430,11 +573,15 @@ class BaseConsole(QFrame):
 
     def _get_line_until_cursor(self):
         """Get current line of input buffer, up to cursor position."""
-        return self.input_buffer()[:self.cursor_offset()].rsplit('\n', 1)[-1]
+        cursor = self._textCursor()
+        block = cursor.block()
+        start = max(self._prompt_pos - block.position(), 0)
+        return plain_text(block.text()[start:cursor.positionInBlock()])
 
     def _get_line_after_cursor(self):
         """Get current line of input buffer, after cursor position."""
-        return self.input_buffer()[self.cursor_offset():].split('\n', 1)[0]
+        cursor = self._textCursor()
+        return plain_text(cursor.block().text()[cursor.positionInBlock():])
 
     def clear_input_buffer(self):
         """Clear input buffer."""
@@ -479,11 +626,9 @@ class BaseConsole(QFrame):
             self._update_prompt_pos()
 
     def _handle_ctrl_c(self):
-        """Inject keyboard interrupt if code is being executed in a thread,
-        else cancel the current prompt."""
-        # There is a race condition here, we should lock on the value of
-        # executing() to avoid accidentally raising KeyboardInterrupt after
-        # execution has finished. Deal with this later…
+        """Interrupt the command that is being executed, else cancel the
+        current prompt."""
+        # If the command finishes in the meantime, the interrupt is dropped:
         if self._executing():
             self._cancel()
         else:
@@ -501,12 +646,40 @@ class BaseConsole(QFrame):
             self.insert_input_text(self._copy_buffer)
             self._copy_buffer = ''
 
+    def _background_data_handler(self, data):
+        """Insert output that can arrive while the user is typing, e.g. from
+        background jobs. While waiting for input, it is inserted above the
+        current prompt, and the input is kept."""
+        doc = self.edit.document()
+        block = doc.findBlock(self._prompt_pos)
+        if self._executing() or block.position() != self._prompt_pos:
+            self._insert_output_text(data)
+            return
+        line = block.blockNumber()
+        prompts = [self._prompt_doc[i]
+                   for i in range(line, len(self._prompt_doc))]
+        text = self.input_buffer()
+        offset = self.cursor_offset()
+        output_inserted = self._output_inserted
+
+        cursor = QTextCursor(doc)
+        cursor.setPosition(self._prompt_pos)
+        cursor.movePosition(QTextCursor.End, QTextCursor.KeepAnchor)
+        cursor.removeSelectedText()
+        del self._prompt_doc[line+1:]
+        self._prompt_doc[line] = ''
+
+        self._insert_output_text(data if data.endswith('\n') else data + '\n')
+        self._insert_prompt_text('\n'.join(prompts))
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+        cursor.setPosition(self._prompt_pos + offset)
+        self._setTextCursor(cursor)
+        self._output_inserted = output_inserted
+
     def _insert_prompt_text(self, text):
-        lines = text.split('\n')
-        self._prompt_doc[-1] += lines[0]
-        self._prompt_doc += lines[1:]
-        for line in self._prompt_doc[-len(lines):]:
-            self.pbar.adjust_width(line)
+        for prompt in self._prompt_doc.insert_text(text):
+            self.pbar.adjust_width(prompt)
 
     def _get_prompt_text(self, line_number):
         return self._prompt_doc[line_number]
@@ -528,9 +701,31 @@ class BaseConsole(QFrame):
         event.accept()
 
     def _close(self):
+        self.command_history.close()
         if self.window().isVisible():
             self.window().close()
 
+    def coalesce_output(self, interval=16, max_batch=1 << 16):
+        """Insert output at most every ``interval`` milliseconds in batches of
+        up to ``max_batch`` characters instead of once per write. This keeps
+        the UI responsive for programs that print many small chunks. Pass
+        ``interval=None`` to disable."""
+        self.stdout.set_coalescing(interval, max_batch)
+
+    def set_scrollback_limit(self, lines=None, chars=None):
+        """Limit the number of lines and/or characters kept in the console.
+        The oldest lines are discarded when any limit is exceeded. Pass
+        ``None`` to remove a limit."""
+        self._max_lines = lines
+        self._max_chars = chars
+        self._trim_scrollback()
+
+    def set_history_file(self, path, maxsize=10000):
+        """Save the command history in the given file, which can be shared
+        by multiple consoles. Only the last ``maxsize`` entries are kept.
+        Entries are read lazily when navigating back in the history."""
+        self.command_history.set_file(path, maxsize)
+
     def set_tab(self, chars):
         self._tab_chars = chars
 
@@ -572,37 +767,176 @@ class PythonConsole(BaseConsole):
             self.stdin, self.stdout, locals=locals)
         self.interpreter.done_signal.connect(self._finish_command)
         self.interpreter.exit_signal.connect(self.exit)
+        self.interpreter.stats_signal.connect(self._record_stats)
+        self.completion_cache = CompletionCache()
+        self._warm_up_timer = QTimer(self)
+        self._warm_up_timer.setSingleShot(True)
+        self._warm_up_timer.timeout.connect(self._warm_up)
+        self.completion_tier = COMPLETE_TIER.AUTO
+        self.completion_stats = {
+            COMPLETE_TIER.NAMESPACE: [0, 0.0],
+            COMPLETE_TIER.JEDI: [0, 0.0],
+        }
         self.set_auto_complete_mode(COMPLETE_MODE.DROPDOWN)
         self._thread = None
+        self._kernel = None
+        self._loop = None
+        self._task = None
+        # JobManager, created when the first background job is submitted:
+        self.jobs = None
+        # CellLog, created by enable_cell_stats:
+        self.cell_log = None
 
     def _executing(self):
+        if self._kernel:
+            return self._kernel.executing()
         return self.interpreter.executing()
 
     def _cancel(self):
-        if self._thread:
-            self._thread.inject_exception(KeyboardInterrupt)
+        if self._kernel:
+            self._kernel.interrupt()
+        elif self.interpreter.interrupt() and self._thread:
             # wake up thread in case it is currently waiting on input:
             self.stdin.flush()
 
     def _run_source(self, source):
+        if self._kernel:
+            return self._kernel.runsource(source)
+        if source.rstrip().endswith('&') and self._submit_job(source):
+            return False
         return self.interpreter.runsource(source, symbol='multi')
 
+    def _submit_job(self, source):
+        """Execute the source in the background if it ends with ``&``.
+        Returns the ``Job``, or ``None`` if the source is no valid background
+        job."""
+        # imported here, because it requires python 3:
+        from .jobs import JobManager, background_source
+        source = background_source(source)
+        if source is None:
+            return None
+        if self.jobs is None:
+            # Jobs can write while the user is typing:
+            self._job_output = OutputStream()
+            self._job_output.write_event.connect(
+                self._background_data_handler)
+            self.jobs = JobManager(self.interpreter, self._job_output)
+            self.interpreter.locals.setdefault('jobs', self.jobs)
+        try:
+            job = self.jobs.submit(source)
+        except (OverflowError, SyntaxError, ValueError):
+            return None
+        self.stdout.write('[%d] started\n' % job.id)
+        self._finish_command(True, None)
+        return job
+
     def exit(self):
         """Exit interpreter."""
+        if self.auto_complete:
+            self.auto_complete.close()
         if self._thread:
             self._thread.exit()
             self._thread.wait()
             self._thread = None
+        if self._kernel:
+            self._kernel.stop()
+            self._kernel = None
+        if self._task is not None:
+            self._task.cancel()
+        if self.jobs is not None:
+            self.jobs.shutdown()
         self._close()
 
     def get_completions(self, line):
         """Get completions. Used by the ``autocomplete`` extension."""
-        script = jedi.Interpreter(line, [self.interpreter.locals])
-        return [comp.name for comp in script.completions()]
+        generation = (self._kernel or self.interpreter).namespace_generation
+        return self.completion_cache.get(
+            line, generation, self._get_completions)
+
+    def set_completion_tier(self, tier):
+        """Select the completers to use, see ``COMPLETE_TIER``. The default
+        is to inspect the objects in the namespace, and only fall back to
+        jedi for complex expressions or if nothing was found.
+
+        The number of calls and the total time spent in each completer are
+        recorded in ``completion_stats``."""
+        self.completion_tier = tier
+        self.completion_cache.clear()
+
+    def _get_completions(self, line):
+        tier = self.completion_tier
+        if tier != COMPLETE_TIER.JEDI:
+            words = self._complete(COMPLETE_TIER.NAMESPACE, line)
+            if words or tier == COMPLETE_TIER.NAMESPACE:
+                return words or []
+        return self._complete(COMPLETE_TIER.JEDI, line) or []
+
+    def _complete(self, tier, line):
+        start = time.time()
+        try:
+            if self._kernel:
+                return self._kernel.complete(tier, line)
+            completer = (namespace_completions
+                         if tier == COMPLETE_TIER.NAMESPACE else
+                         jedi_completions)
+            return completer(line, self.interpreter.locals)
+        finally:
+            stats = self.completion_stats[tier]
+            stats[0] += 1
+            stats[1] += time.time() - start
+
+    def warm_up_completion(self, delay=1000):
+        """Import jedi and let it analyze the modules in the namespace in the
+        background once the console has been idle for ``delay`` msecs, so
+        that the first completion does not have to wait for it."""
+        self._warm_up_timer.start(delay)
+
+    def _warm_up(self):
+        if self._executing():
+            self._warm_up_timer.start()
+            return
+        if self._kernel:
+            self._kernel.warm_up()
+            return
+        namespace = self.interpreter.locals
+        modules = [name for name, value in list(namespace.items())
+                   if isinstance(value, types.ModuleType)]
+        self.auto_complete.call_in_background(import_jedi)
+        for name in modules:
+            self.auto_complete.call_in_background(
+                partial(jedi_completions, name + '.', namespace))
+
+    def enable_cell_stats(self, show=True, memory=False, maxlen=1000):
+        """Measure the wall and CPU time and the output of each command,
+        and its memory allocation if ``memory`` is true. Tracing memory can
+        make allocation heavy commands more than ten times as slow. If
+        ``show`` is true, a summary is shown next to the OUT prompt. Returns
+        the ``CellLog`` that keeps the ``CellStats`` of the last ``maxlen``
+        commands."""
+        self.cell_log = CellLog(maxlen)
+        self._show_stats = show
+        self.interpreter.collect_stats = True
+        self.interpreter.trace_memory = memory
+        if self._kernel:
+            self._kernel.set_stats(True, memory)
+        return self.cell_log
+
+    @Slot(object)
+    def _record_stats(self, stats):
+        stats = stats._replace(index=self._current_line,
+                               source=self._last_input)
+        if self.cell_log is not None:
+            self.cell_log.append(stats)
+        self._pending_stats = stats
 
     def push_local_ns(self, name, value):
-        """Set a variable in the local namespace."""
+        """Set a variable in the local namespace. With
+        ``eval_in_subprocess``, the value must be picklable."""
+        if self._kernel:
+            self._kernel.push(name, value)
+            return
         self.interpreter.locals[name] = value
+        self.interpreter.namespace_generation += 1
 
     def eval_in_thread(self):
         """Start a thread in which code snippets will be executed."""
@@ -612,6 +946,64 @@ class PythonConsole(BaseConsole):
             self.interpreter.exec_, QueuedConnection)
         return self._thread
 
+    def eval_in_subprocess(self):
+        """Execute code snippets in a separate python process (the kernel),
+        so that CPU bound commands do not block the UI. Objects can only be
+        shared with the kernel via ``push_local_ns`` and are copied. Returns
+        the ``KernelClient``.
+
+        The kernel is restarted automatically if it dies, and can be
+        restarted manually with ``restart_kernel``."""
+        self._kernel = kernel = KernelClient(self.stdout)
+        kernel.done_signal.connect(self._finish_command)
+        kernel.exit_signal.connect(self.exit)
+        kernel.stats_signal.connect(self._record_stats)
+        kernel.died_signal.connect(self._kernel_died)
+        if self.interpreter.collect_stats:
+            kernel.set_stats(True, self.interpreter.trace_memory)
+        return kernel
+
+    def restart_kernel(self):
+        """Restart the kernel started by ``eval_in_subprocess``. Its
+        namespace is lost."""
+        executing = self._executing()
+        self._kernel.restart()
+        if executing:
+            self._finish_command(False, None)
+
+    def _kernel_died(self, returncode):
+        self.stdout.write('\nKernel died with exit code %s, restarting.\n'
+                          % returncode)
+        self._kernel.restart()
+        self._finish_command(False, None)
+
+    def eval_asyncio(self, loop=None):
+        """Execute code snippets as tasks of an asyncio event loop in the
+        main thread. Commands can use ``await`` at the top level, and the UI
+        remains responsive while they wait. The loop must be driven by the
+        Qt event loop. By default, a ``QtEventLoop`` is created and set as
+        the current event loop. Returns the loop. Requires python 3.8."""
+        # imported here, because it requires python 3:
+        import asyncio
+        from .qtasyncio import QtEventLoop
+        if loop is None:
+            loop = QtEventLoop()
+            asyncio.set_event_loop(loop)
+        self._loop = loop
+        self.interpreter.set_compile_flags(ast.PyCF_ALLOW_TOP_LEVEL_AWAIT)
+        self.interpreter.exec_signal.connect(self._exec_task)
+        return loop
+
+    def _exec_task(self, codes):
+        from .qtasyncio import exec_async
+        self._task = self._loop.create_task(
+            exec_async(self.interpreter, codes))
+        self._task.add_done_callback(self._task_done)
+
+    def _task_done(self, task):
+        if task is self._task:
+            self._task = None
+
     def eval_queued(self):
         """Setup connections to execute code snippets in later mainloop
         iterations in the main thread."""
@@ -641,14 +1033,21 @@ class Thread(QThread):
         self.ready.set()
         self.exec_()
 
-    def inject_exception(self, value):
-        """Raise exception in remote thread to stop execution of current
-        commands (this only triggers once the thread executes any python
-        bytecode)."""
-        if self.ident != threading.current_thread().ident:
-            ctypes.pythonapi.PyThreadState_SetAsyncExc(
-                ctypes.c_long(self.ident),
-                ctypes.py_object(value))
+
+# Characters that QTextDocument.toPlainText() replaces:
+_PLAIN_TEXT = {
+    0x2028: u'\n',     # line separator
+    0x2029: u'\n',     # paragraph separator
+    0xfdd0: u'\n',     # frame start
+    0xfdd1: u'\n',     # frame end
+    0x00a0: u' ',      # non-breaking space
+}
+
+
+def plain_text(text):
+    """Convert text as returned by ``QTextCursor.selectedText()`` or
+    ``QTextBlock.text()`` to plain text."""
+    return text.translate(_PLAIN_TEXT)
 
 
 class InputArea(QPlainTextEdit):
@@ -1,8 +1,11 @@
 from qtpy.QtCore import QRegExp
 from qtpy.QtGui import (QColor, QTextCharFormat, QFont, QSyntaxHighlighter)
 
+import contextlib
 import keyword
 
+from .lexer import lex_line, NORMAL, TRIPLE_SINGLE, TRIPLE_DOUBLE
+
 
 def format(color, style=''):
     """Return a QTextCharFormat with the given attributes.
@@ -64,106 +67,39 @@ class PythonHighlighter(QSyntaxHighlighter):
     # Python keywords
     keywords = keyword.kwlist
 
+    # Block state of program output, which is never highlighted:
+    OUTPUT = 3
+
     def __init__(self, document, formats=None):
         QSyntaxHighlighter.__init__(self, document)
-
-        self.styles = styles = dict(STYLES, **(formats or {}))
-
-        # Multi-line strings (expression, flag, style)
-        # FIXME: The triple-quotes in these two lines will mess up the
-        # syntax highlighting from this point onward
-        self.tri_single = (QRegExp("'''"), 1, styles['string2'])
-        self.tri_double = (QRegExp('"""'), 2, styles['string2'])
-
-        rules = []
-
-        # Keyword, operator, and brace rules
-        rules += [(r'\b%s\b' % w, 0, styles['keyword'])
-                  for w in PythonHighlighter.keywords]
-
-        # All other rules
-        rules += [
-            # 'self'
-            # (r'\bself\b', 0, STYLES['self']),
-
-            # Double-quoted string, possibly containing escape sequences
-            (r'"[^"\\]*(\\.[^"\\]*)*"', 0, styles['string']),
-            # Single-quoted string, possibly containing escape sequences
-            (r"'[^'\\]*(\\.[^'\\]*)*'", 0, styles['string']),
-
-            # 'def' followed by an identifier
-            (r'\bdef\b\s*(\w+)', 1, styles['defclass']),
-            # 'class' followed by an identifier
-            (r'\bclass\b\s*(\w+)', 1, styles['defclass']),
-
-            # From '#' until a newline
-            (r'#[^\n]*', 0, styles['comment']),
-
-            # Numeric literals
-            (r'\b[+-]?[0-9]+[lL]?\b', 0, styles['numbers']),
-            (r'\b[+-]?0[xX][0-9A-Fa-f]+[lL]?\b', 0, styles['numbers']),
-            (r'\b[+-]?[0-9]+(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?\b', 0,
-             styles['numbers']),
-        ]
-
-        # Build a QRegExp for each pattern
-        self.rules = [(QRegExp(pat), index, fmt)
-                      for (pat, index, fmt) in rules]
+        self._output = False
+        self._keywords = frozenset(self.keywords)
+        self.styles = dict(STYLES, **(formats or {}))
+
+    @contextlib.contextmanager
+    def output_mode(self):
+        """Mark all blocks that are modified within this context as output.
+        These blocks will be skipped also when highlighting later on."""
+        self._output = True
+        try:
+            yield
+        finally:
+            self._output = False
 
     def highlightBlock(self, text):
         """Apply syntax highlighting to the given block of text.
         """
-        # Do other syntax formatting
-        for expression, nth, format in self.rules:
-            index = expression.indexIn(text, 0)
-
-            while index >= 0:
-                # We actually want the index of the nth match
-                index = expression.pos(nth)
-                length = len(expression.cap(nth))
-                self.setFormat(index, length, format)
-                index = expression.indexIn(text, index + length)
-
-        self.setCurrentBlockState(0)
-
-        # Do multi-line strings
-        in_multiline = self.match_multiline(text, *self.tri_single)
-        if not in_multiline:
-            in_multiline = self.match_multiline(text, *self.tri_double)
-
-    def match_multiline(self, text, delimiter, in_state, style):
-        """Do highlighting of multi-line strings. ``delimiter`` should be a
-        ``QRegExp`` for triple-single-quotes or triple-double-quotes, and
-        ``in_state`` should be a unique integer to represent the corresponding
-        state changes when inside those strings. Returns True if we're still
-        inside a multi-line string when this function is finished.
-        """
-        # If inside triple-single quotes, start at 0
-        if self.previousBlockState() == in_state:
-            start = 0
-            add = 0
-        # Otherwise, look for the delimiter on this line
-        else:
-            start = delimiter.indexIn(text)
-            # Move past this match
-            add = delimiter.matchedLength()
-
-        # As long as there's a delimiter match on this line...
-        while start >= 0:
-            # Look for the ending delimiter
-            end = delimiter.indexIn(text, start + add)
-            # Ending delimiter on this line?
-            if end >= add:
-                length = end - start + add + delimiter.matchedLength()
-                self.setCurrentBlockState(0)
-            # No; multi-line string
-            else:
-                self.setCurrentBlockState(in_state)
-                length = len(text) - start + add
-            # Apply formatting
-            self.setFormat(start, length, style)
-            # Look for the next match
-            start = delimiter.indexIn(text, start + length)
-
-        # Return True if still inside a multi-line string, False otherwise
-        return self.currentBlockState() == in_state
+        if self._output or self.currentBlockState() == self.OUTPUT:
+            self.setCurrentBlockState(self.OUTPUT)
+            return
+
+        # Continue multi-line strings from the previous block:
+        state = self.previousBlockState()
+        if state not in (TRIPLE_SINGLE, TRIPLE_DOUBLE):
+            state = NORMAL
+
+        tokens, state = lex_line(text, state, self._keywords)
+        styles = self.styles
+        for start, length, kind in tokens:
+            self.setFormat(start, length, styles[kind])
+        self.setCurrentBlockState(state)
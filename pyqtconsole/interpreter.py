@@ -1,19 +1,51 @@
 # -*- coding: utf-8 -*-
 import sys
 import contextlib
+import threading
+from collections import OrderedDict
 from functools import partial
 
 import ast
+import inspect
 from code import InteractiveInterpreter
 
+try:
+    import builtins
+except ImportError:     # python 2
+    import __builtin__ as builtins
+
 from qtpy.QtCore import QObject, Slot, Signal
 
+from .interrupt import Execution
+from .profiler import ProfiledCodes, compile_prun, make_profiler
+from .stats import StatsRecorder
+
+CO_COROUTINE = getattr(inspect, 'CO_COROUTINE', 0)
+
 
 class PythonInterpreter(QObject, InteractiveInterpreter):
 
+    """Interpreter that executes code when ``exec_`` is called.
+
+    The ``done_signal`` carries the ``repr()`` of the result, which is
+    computed in the executing thread and limited to ``repr_maxlength``
+    characters. If ``repr_timeout`` is set, a placeholder is shown when
+    formatting takes longer than the given number of seconds.
+
+    ``namespace_generation`` is incremented whenever code is executed and
+    may therefore have modified the namespace.
+
+    If ``collect_stats`` is set, the ``stats_signal`` carries the
+    ``CellStats`` of each command before the ``done_signal``. Its memory
+    allocation is traced only if ``trace_memory`` is set.
+
+    Commands that start with ``%prun`` are profiled, see
+    ``pyqtconsole.profiler``."""
+
     exec_signal = Signal(object)
     done_signal = Signal(bool, object)
     exit_signal = Signal(object)
+    stats_signal = Signal(object)
 
     def __init__(self, stdin, stdout, locals=None):
         QObject.__init__(self)
@@ -21,37 +53,99 @@ class PythonInterpreter(QObject, InteractiveInterpreter):
         self.locals['exit'] = Exit()
         self.stdin = stdin
         self.stdout = stdout
-        self._executing = False
-        self.compile = partial(compile_multi, self.compile)
+        self.repr_maxlength = 10000
+        self.repr_timeout = None
+        self.collect_stats = False
+        self.trace_memory = False
+        self.namespace_generation = 0
+        self._execution = Execution()
+        self._compiler = self.compile
+        self.set_compile_flags(0)
+
+    def set_compile_flags(self, flags):
+        """Set additional flags for compiling commands, e.g.
+        ``ast.PyCF_ALLOW_TOP_LEVEL_AWAIT``."""
+        self.compile = partial(compile_prun, partial(
+            compile_multi, self._compiler, cache=CompileCache(), flags=flags))
 
     def executing(self):
-        return self._executing
+        return self._execution.executing()
+
+    def interrupt(self):
+        """Raise a ``KeyboardInterrupt`` in the command that is being
+        executed, see ``pyqtconsole.interrupt``. Does nothing and returns
+        ``False`` if no command is executing, or if called from the
+        executing thread."""
+        return self._execution.interrupt()
 
     def runcode(self, code):
         self.exec_signal.emit(code)
 
     @Slot(object)
     def exec_(self, codes):
-        self._executing = True
-        result = None
+        for awaitable in self.exec_steps(codes):
+            # only possible with top-level await, see ``qtasyncio``:
+            awaitable.close()
+
+    def exec_steps(self, codes, cancel=None):
+        """Generator that executes the codes. Code that was compiled with
+        top-level await returns a coroutine. It is yielded, and the caller
+        must send its result or throw its exception back in. ``cancel`` is
+        called by ``interrupt()`` while a coroutine is awaited."""
+        self._execution.start(cancel)
+        self.namespace_generation += 1
+        value = result = None
+        recorder = StatsRecorder(self.trace_memory) \
+            if self.collect_stats else None
+        profiler = make_profiler(codes.options) \
+            if isinstance(codes, ProfiledCodes) else None
+        status = 'ok'
 
         # Redirect IO and disable excepthook, this is the only place were we
         # redirect IO, since we don't how IO is handled within the code we
         # are running. Same thing for the except hook, we don't know what the
         # user are doing in it.
         try:
-            with redirected_io(self.stdout):
-                for code, mode in codes:
-                    if mode == 'eval':
-                        result = eval(code, self.locals)
-                    else:
-                        exec(code, self.locals)
+            try:
+                with redirected_io(self.stdout if recorder is None else
+                                   recorder.stream(self.stdout)):
+                    if profiler is not None:
+                        profiler.start(sys._getframe())
+                    try:
+                        for code, mode in codes:
+                            if code.co_flags & CO_COROUTINE:
+                                awaited = yield eval(code, self.locals)
+                                if mode == 'eval':
+                                    value = awaited
+                            elif mode == 'eval':
+                                value = eval(code, self.locals)
+                            else:
+                                exec(code, self.locals)
+                    finally:
+                        if profiler is not None:
+                            profiler.stop()
+                    if value is not None:
+                        result = format_result(
+                            value, self.repr_maxlength, self.repr_timeout)
+            finally:
+                # A late interrupt can only be raised up to here:
+                self._execution.finish()
         except SystemExit as e:
+            status = 'exit'
             self.exit_signal.emit(e)
+        except KeyboardInterrupt:
+            status = 'interrupted'
+            self.showtraceback()
         except BaseException:
+            status = 'error'
             self.showtraceback()
         finally:
-            self._executing = False
+            self._execution.finish()
+            self.namespace_generation += 1
+            if profiler is not None:
+                profiler.report(self.stdout)
+            if recorder is not None:
+                self.stats_signal.emit(recorder.stop(status))
             self.done_signal.emit(True, result)
 
     def write(self, data):
@@ -75,32 +169,105 @@ class PythonInterpreter(QObject, InteractiveInterpreter):
         self.done_signal.emit(False, None)
 
 
-def compile_multi(compiler, source, filename, symbol):
+def compile_multi(compiler, source, filename, symbol, cache=None, flags=0):
     """If mode is 'multi', split code into individual toplevel expressions or
-    statements. Returns a list of tuples ``(code, mode)``. """
+    statements. Returns a list of tuples ``(code, mode)``, or ``None`` if the
+    code is incomplete. The statements are compiled with the given ``flags``.
+
+    The source is parsed only once. If a ``CompileCache`` is given, leading
+    statements that were already compiled for a previous source are reused,
+    and only the remaining lines are parsed and compiled."""
     if symbol != 'multi':
         return [(compiler(source, filename, symbol), symbol)]
-    # First, check if the source compiles at all. This raises an exception if
-    # there is a SyntaxError, or returns None if the code is incomplete:
-    if compiler(source, filename, 'exec') is None:
-        return None
-    # Now split into individual 'single' units:
-    module = ast.parse(source)
-    # When entering a code block, the standard python interpreter waits for an
-    # additional empty line to apply the input. We adhere to this convention,
-    # checked by `compiler(..., 'single')`:
-    if module.body:
-        block_lineno = module.body[-1].lineno
-        block_source = source[find_nth('\n' + source, '\n', block_lineno):]
-        if compiler(block_source, filename, 'single') is None:
+    prefix, codes = cache.lookup(source) if cache else ('', [])
+    try:
+        return compile_rest(
+            compiler, source, filename, prefix, codes, cache, flags)
+    except SyntaxError:
+        if not prefix:
+            raise
+    # The remaining lines may continue the last block of the prefix, e.g.
+    # with 'else:', so we must start over:
+    return compile_rest(compiler, source, filename, '', [], cache, flags)
+
+
+def compile_rest(compiler, source, filename, prefix, codes, cache=None,
+                 flags=0):
+    """Compile the statements in ``source`` after the given prefix, for
+    which the list of compiled statements is already known."""
+    rest = source[len(prefix):]
+    nlines = prefix.count('\n')
+    # Pad with empty lines to get the correct line numbers in tracebacks and
+    # syntax errors:
+    text = '\n' * nlines + rest
+    try:
+        body = ast.parse(text, filename).body
+    except SyntaxError:
+        # Raises the SyntaxError, or returns None if the code is incomplete:
+        if compiler(text, filename, 'exec') is None:
             return None
-    return [
-        compile_single_node(node, filename)
-        for node in module.body
-    ]
+        raise
+    # Compile all statements before raising a SyntaxError for a misplaced
+    # __future__ import to report the first error in the source:
+    stop = misplaced_future_import(body, at_start=not prefix)
+    codes = codes + [
+        compile_single_node(node, filename, flags) for node in body[:stop]]
+    if stop is not None:
+        node = body[stop]
+        raise SyntaxError(
+            'from __future__ imports must occur at the beginning of the file',
+            (filename, node.lineno, node.col_offset + 1, None))
+    if cache is not None:
+        # Remember the statements before the last line where a statement
+        # starts, these are complete even if more lines are added:
+        for i in range(len(body) - 1, 0, -1):
+            if body[i].col_offset == 0:
+                lineno = first_lineno(body[i]) - nlines
+                end = len(prefix) + line_offsets(rest)[lineno - 1]
+                cache.add(source[:end], codes[:len(codes) - len(body) + i])
+                break
+    # When entering a code block, the standard python interpreter waits for an
+    # additional empty line to apply the input. We adhere to this convention:
+    if body and is_compound(body[-1]) and not rest.endswith('\n'):
+        return None
+    return codes
+
+
+class CompileCache(object):
+
+    """Compiled leading statements of recently compiled sources. The entries
+    are keyed by the source text of these statements."""
+
+    maxsize = 8
+
+    def __init__(self):
+        self._entries = OrderedDict()
 
+    def lookup(self, source):
+        """Return ``(prefix, codes)`` for the longest cached prefix of
+        ``source``."""
+        prefix = ''
+        for text in self._entries:
+            if len(text) > len(prefix) and source.startswith(text):
+                prefix = text
+        if not prefix:
+            return '', []
+        codes = self._entries.pop(prefix)
+        self._entries[prefix] = codes
+        return prefix, codes
 
-def compile_single_node(node, filename):
+    def add(self, prefix, codes):
+        """Add the compiled statements for the given source."""
+        self._entries.pop(prefix, None)
+        self._entries[prefix] = codes
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+def compile_single_node(node, filename, flags=0):
     """Compile a 'single' ast.node (expression or statement)."""
     mode = 'eval' if isinstance(node, ast.Expr) else 'exec'
     if mode == 'eval':
@@ -110,12 +277,163 @@ def compile_single_node(node, filename):
             root = ast.Module([node], type_ignores=[])
         else:
             root = ast.Module([node])
-    return (compile(root, filename, mode), mode)
+    return (compile(root, filename, mode, flags), mode)
+
+
+def misplaced_future_import(body, at_start=True):
+    """Return the index of the first ``__future__`` import that follows
+    other statements, or ``None``. This is otherwise not detected because
+    the statements are compiled individually."""
+    for i, node in enumerate(body):
+        if is_future_import(node):
+            if not at_start:
+                return i
+        elif i > 0 or not is_docstring(node):
+            at_start = False
+    return None
+
+
+def is_future_import(node):
+    return isinstance(node, ast.ImportFrom) and node.module == '__future__'
+
+
+def is_docstring(node):
+    if not isinstance(node, ast.Expr):
+        return False
+    if sys.version_info >= (3, 8):
+        return (isinstance(node.value, ast.Constant) and
+                isinstance(node.value.value, str))
+    return isinstance(node.value, ast.Str)
+
+
+def is_compound(node):
+    """Check if an ast statement node contains a block of statements."""
+    return 'body' in node._fields or 'cases' in node._fields
+
+
+def first_lineno(node):
+    """Return the first line of a statement, including decorators."""
+    return min([node.lineno] + [
+        dec.lineno for dec in getattr(node, 'decorator_list', ())])
+
+
+def line_offsets(text):
+    """Return the offsets at which the lines of ``text`` start."""
+    offsets = [0]
+    pos = text.find('\n')
+    while pos >= 0:
+        offsets.append(pos + 1)
+        pos = text.find('\n', pos + 1)
+    return offsets
+
+
+def format_result(value, maxlength=10000, timeout=None):
+    """Return a ``repr()`` of the value that is at most ``maxlength``
+    characters long. If ``timeout`` is given, wait at most that many seconds
+    for the result and return a placeholder otherwise. Note that a ``repr()``
+    that timed out can not be stopped, and keeps running in a daemon
+    thread."""
+    if timeout is None:
+        return ResultRepr(maxlength).repr(value)
+
+    outcome = []
+
+    def target():
+        try:
+            outcome.append((True, ResultRepr(maxlength).repr(value)))
+        except BaseException as e:
+            outcome.append((False, e))
+
+    thread = threading.Thread(target=target)
+    thread.daemon = True
+    thread.start()
+    thread.join(timeout)
+    if not outcome:
+        return '<%s object: repr() timed out after %gs>' % (
+            type(value).__name__, timeout)
+    success, result = outcome[0]
+    if not success:
+        raise result
+    return result
+
+
+class ResultRepr(object):
+
+    """Size-limited ``repr()``. Builtin containers are traversed only until
+    ``maxlength`` characters have been produced in total, other objects use
+    their own ``repr()``. Results that fit are identical to the builtin
+    ``repr()``."""
+
+    _containers = (list, tuple, dict, set, frozenset)
+    _strings = (str, bytes, type(u''))
+    # shown by the builtin repr() for recursive references:
+    _recursive = {list: '[...]', tuple: '(...)', dict: '{...}'}
+
+    def __init__(self, maxlength=10000):
+        self.maxlength = maxlength
 
+    def repr(self, value):
+        parts = []
+        size = 0
+        # iterators over the pieces of the containers being traversed, and
+        # the ids of these containers:
+        stack = [iter([(value,)])]
+        active = [None]
+        while stack and size <= self.maxlength:
+            piece = next(stack[-1], None)
+            if piece is None:
+                stack.pop()
+                active.pop()
+                continue
+            if not isinstance(piece, tuple):
+                text = piece
+            else:
+                item, = piece
+                kind = type(item)
+                if kind in self._containers and item:
+                    if id(item) not in active:
+                        stack.append(self._pieces(item))
+                        active.append(id(item))
+                        continue
+                    text = self._recursive[kind]
+                elif kind in self._strings:
+                    # the repr of a string is at least as long as the string:
+                    text = builtins.repr(item[:self.maxlength - size + 1])
+                else:
+                    text = builtins.repr(item)
+            parts.append(text)
+            size += len(text)
+        text = ''.join(parts)
+        if size > self.maxlength:
+            text = text[:self.maxlength] + '...'
+        return text
 
-def find_nth(string, char, n):
-    """Find the n'th occurence of a character within a string."""
-    return [i for i, c in enumerate(string) if c == char][n-1]
+    def _pieces(self, x):
+        """Yield the separators of the container as strings, and its items
+        wrapped in 1-tuples."""
+        kind = type(x)
+        if kind is dict:
+            yield '{'
+            for i, (key, value) in enumerate(x.items()):
+                if i:
+                    yield ', '
+                yield (key,)
+                yield ': '
+                yield (value,)
+            yield '}'
+            return
+        left, right = {
+            list: ('[', ']'),
+            tuple: ('(', ',)' if len(x) == 1 else ')'),
+            set: ('{', '}'),
+            frozenset: ('frozenset({', '})'),
+        }[kind]
+        yield left
+        for i, item in enumerate(x):
+            if i:
+                yield ', '
+            yield (item,)
+        yield right
 
 
 @contextlib.contextmanager
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+Interrupt the command that is being executed by raising a
+``KeyboardInterrupt`` in it.
+
+The state of the execution is protected by a lock, so that an interrupt can
+not hit the executing thread after the command has finished. How the
+exception is raised depends on the executing thread:
+
+- In the main thread, a SIGINT is sent to it. This also interrupts blocking
+  system calls such as ``time.sleep()`` or reading from a pipe.
+- In other threads, ``sys.monitoring`` events (python 3.12) are enabled
+  until the thread executes the next line of python code or jumps. They
+  cost nothing while no interrupt is pending. On older versions, the
+  exception is set with ``PyThreadState_SetAsyncExc``. Blocking calls can
+  not be interrupted in other threads.
+"""
+
+import ctypes
+import os
+import signal
+import sys
+import threading
+
+try:
+    import _thread as thread
+except ImportError:     # python 2
+    import thread
+
+IDLE = 'idle'
+RUNNING = 'running'
+INTERRUPTING = 'interrupting'
+
+
+class Execution(object):
+
+    """State of the command execution of an interpreter: ``IDLE``,
+    ``RUNNING``, or ``INTERRUPTING`` until a requested interrupt has been
+    raised in the command."""
+
+    def __init__(self):
+        self.state = IDLE
+        self._lock = threading.Lock()
+        self._ident = None
+        self._cancel = None
+
+    def executing(self):
+        return self.state != IDLE
+
+    def start(self, cancel=None):
+        """Enter the running state in the current thread. If ``cancel`` is
+        given, it is called to interrupt the command instead of raising an
+        exception in the thread, e.g. to cancel an asyncio task."""
+        global _main_execution
+        ident = thread.get_ident()
+        if cancel is None and ident == _main_ident():
+            _install_signal_handler()
+            _main_execution = self
+        with self._lock:
+            self.state = RUNNING
+            self._ident = ident
+            self._cancel = cancel
+
+    def finish(self):
+        """Leave the running state, and withdraw a pending interrupt. Must be
+        called in the executing thread.
+
+        An interrupt that is already on its way may still be raised at the
+        start of this method. It should therefore be called at the end of
+        the ``try`` block of the command, and again afterwards."""
+        with self._lock:
+            state, self.state = self.state, IDLE
+            if state != IDLE and self._cancel is None:
+                _withdraw(self._ident, state == INTERRUPTING)
+            self._ident = self._cancel = None
+
+    def interrupt(self):
+        """Raise a ``KeyboardInterrupt`` in the command. Returns ``False`` if
+        no command is executing, or if called from the executing thread."""
+        with self._lock:
+            if self.state == IDLE:
+                return False
+            if self._cancel is not None:
+                self._cancel()
+                return True
+            if self._ident == thread.get_ident():
+                return False
+            if self.state == RUNNING:
+                self.state = INTERRUPTING
+                _raise_in_thread(self, self._ident)
+            return True
+
+    def _delivered(self):
+        # Called in the executing thread when the exception is raised:
+        if self.state == INTERRUPTING:
+            self.state = RUNNING
+
+
+def _main_ident():
+    try:
+        return threading.main_thread().ident
+    except AttributeError:      # python 2
+        return threading._shutdown.__self__.ident
+
+
+def _raise_in_thread(execution, ident):
+    global _pending_signals, _armed
+    if ident == _main_ident():
+        _pending_signals += 1
+        if hasattr(signal, 'pthread_kill'):
+            signal.pthread_kill(ident, signal.SIGINT)
+        else:
+            # can not interrupt blocking calls:
+            thread.interrupt_main()
+    elif _use_monitoring():
+        with _monitoring_lock:
+            _targets[ident] = execution
+            _monitoring.restart_events()
+            _monitoring.set_events(_tool_id, _EVENTS)
+            _armed = True
+    else:
+        ctypes.pythonapi.PyThreadState_SetAsyncExc(
+            ctypes.c_ulong(ident), ctypes.py_object(KeyboardInterrupt))
+
+
+def _withdraw(ident, pending):
+    global _armed
+    if ident == _main_ident():
+        return      # the signal handler ignores late signals
+    if _tool_id:
+        with _monitoring_lock:
+            _targets.pop(ident, None)
+            _unjump(ident)
+            if _armed and not _targets:
+                _monitoring.set_events(_tool_id, 0)
+                _armed = False
+    elif pending:
+        # Clearing the exception with NULL would leave the eval breaker set
+        # (python <= 3.11), which slows down all code and hangs cProfile.
+        # Instead, replace it by an exception that is raised right here:
+        try:
+            ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                ctypes.c_ulong(ident), ctypes.py_object(_Withdrawn))
+            _checkpoint_here()
+        except _Withdrawn:
+            pass
+
+
+class _Withdrawn(BaseException):
+    pass
+
+
+def _checkpoint_here():
+    pass
+
+
+# Signal handling in the main thread:
+
+_main_execution = None
+_previous_handler = None
+_pending_signals = 0
+
+
+def _install_signal_handler():
+    global _previous_handler
+    handler = signal.getsignal(signal.SIGINT)
+    if handler is not _handle_sigint:
+        _previous_handler = handler
+        signal.signal(signal.SIGINT, _handle_sigint)
+
+
+def _handle_sigint(signum, frame):
+    global _pending_signals
+    ours = _pending_signals > 0
+    if ours:
+        _pending_signals -= 1
+    execution = _main_execution
+    if (execution is not None and execution.state != IDLE and
+            execution._cancel is None):
+        execution._delivered()
+        raise KeyboardInterrupt
+    if ours:
+        return      # arrived after the command finished
+    previous = _previous_handler
+    if callable(previous):
+        previous(signum, frame)
+    elif previous == signal.SIG_DFL:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        os.kill(os.getpid(), signal.SIGINT)
+
+
+# Checkpoints in other threads:
+
+_monitoring = getattr(sys, 'monitoring', None)
+_monitoring_lock = threading.Lock()
+_tool_id = None
+_targets = {}
+_jumped = {}        # ident -> (execution, code) after a JUMP event
+_armed = False
+_EVENTS = 0
+
+
+def _use_monitoring():
+    """Register the ``sys.monitoring`` tool if necessary. Returns ``False``
+    if it is not available."""
+    global _tool_id, _EVENTS
+    with _monitoring_lock:
+        if _tool_id is None:
+            _tool_id = False
+            # skip the ids reserved for debuggers, coverage and profilers:
+            for tool_id in (3, 4) if _monitoring else ():
+                try:
+                    _monitoring.use_tool_id(tool_id, 'pyqtconsole')
+                except ValueError:
+                    continue
+                events = _monitoring.events
+                _EVENTS = events.PY_START | events.LINE | events.JUMP
+                for event in (events.PY_START, events.LINE):
+                    _monitoring.register_callback(tool_id, event, _checkpoint)
+                _monitoring.register_callback(
+                    tool_id, events.JUMP, _jump_checkpoint)
+                _monitoring.register_callback(
+                    tool_id, events.INSTRUCTION, _instruction_checkpoint)
+                _tool_id = tool_id
+                break
+        return bool(_tool_id)
+
+
+def _checkpoint(code, *args):
+    execution = _targets.pop(thread.get_ident(), None)
+    if execution is None:
+        # ignore this location in other threads until the next interrupt:
+        return _monitoring.DISABLE
+    execution._delivered()
+    raise KeyboardInterrupt
+
+
+def _jump_checkpoint(code, *args):
+    # An exception raised by a JUMP callback skips the handlers of the frame
+    # (python 3.12 and 3.13). Raise it before the next instruction instead:
+    ident = thread.get_ident()
+    with _monitoring_lock:
+        execution = _targets.pop(ident, None)
+        if execution is None:
+            return _monitoring.DISABLE
+        _jumped[ident] = (execution, code)
+        _monitoring.set_local_events(
+            _tool_id, code, _monitoring.events.INSTRUCTION)
+
+
+def _instruction_checkpoint(code, offset):
+    ident = thread.get_ident()
+    execution, jumped = _jumped.get(ident, (None, None))
+    if jumped is not code:
+        return      # other threads may still be heading here
+    with _monitoring_lock:
+        _unjump(ident)
+    execution._delivered()
+    raise KeyboardInterrupt
+
+
+def _unjump(ident):
+    """Stop waiting for the next instruction after a jump. Must be called
+    with ``_monitoring_lock`` held."""
+    execution, code = _jumped.pop(ident, (None, None))
+    if code is not None and all(c is not code for e, c in _jumped.values()):
+        _monitoring.set_local_events(_tool_id, code, 0)
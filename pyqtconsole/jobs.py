@@ -0,0 +1,360 @@
+# -*- coding: utf-8 -*-
+"""
+Background jobs, i.e. commands that are executed in a pool of worker
+processes while the console remains usable.
+
+A job only sees a copy of the variables that it uses. Modules are imported
+again in the worker, all other values are pickled. When the job has
+finished, the picklable variables that it assigned are copied back into the
+namespace of the console. Requires python 3.7 or later.
+
+The workers are started with the ``spawn`` method and import the main module
+of the application, which must therefore be guarded by ``if __name__ ==
+'__main__':``.
+"""
+
+import os
+import pickle
+import signal
+import sys
+import threading
+import time
+import traceback
+import types
+import multiprocessing
+from codeop import CommandCompiler
+from concurrent.futures import ProcessPoolExecutor, CancelledError
+from concurrent.futures.process import BrokenProcessPool
+from concurrent.futures import wait as wait_futures
+from itertools import count
+
+from qtpy.QtCore import QObject, Signal, Slot
+
+from .interpreter import compile_multi, format_result
+
+
+class Job(object):
+
+    """A command that is executed in the background."""
+
+    def __init__(self, id, source):
+        self.id = id
+        self.source = source
+        self.future = None
+        self.pid = None
+        self.killed = False
+        self.result = None
+        self.started = time.time()
+        self.finished = None
+
+    @property
+    def status(self):
+        future = self.future
+        if self.killed and (future.cancelled() or future.done()):
+            return 'killed'
+        if not future.done():
+            return 'running' if future.running() else 'pending'
+        if future.cancelled() or future.exception() is not None:
+            return 'failed'
+        return future.result()[0]
+
+    def __repr__(self):
+        return '[%d] %-8s %s' % (self.id, self.status, self.source)
+
+
+class JobManager(QObject):
+
+    """Executes commands in a ``ProcessPoolExecutor``. The output of each job
+    is written to ``stdout``, with every line prefixed by the job id.
+
+    Jobs are listed by ``repr()``, and controlled with ``wait()`` and
+    ``kill()``."""
+
+    _done_signal = Signal(object)
+
+    def __init__(self, interpreter, stdout, max_workers=None):
+        super(JobManager, self).__init__()
+        self.interpreter = interpreter
+        self.stdout = stdout
+        self.max_workers = max_workers
+        self._jobs = {}
+        self._ids = count(1)
+        self._executor = None
+        self._queue = None
+        self._reader = None
+        self._line_start = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._done_signal.connect(self._finish)
+
+    def __repr__(self):
+        if not self._jobs:
+            return 'No jobs.'
+        return '\n'.join(repr(job) for job in self._jobs.values())
+
+    def __getitem__(self, id):
+        return self._jobs[id]
+
+    def __iter__(self):
+        return iter(list(self._jobs.values()))
+
+    def submit(self, source):
+        """Execute the source in the background, and return the ``Job``.
+        Raises ``SyntaxError`` for invalid or incomplete source."""
+        source = source.rstrip() + '\n'
+        id = next(self._ids)
+        filename = '<job %d>' % id
+        codes = compile_multi(CommandCompiler(), source, filename, 'multi')
+        if codes is None:
+            raise SyntaxError('incomplete input', (filename, 1, 1, source))
+        names = set()
+        for code, mode in codes:
+            names.update(code_names(code))
+        namespace = self.interpreter.locals
+        variables = {}
+        modules = {}
+        for name in names:
+            if name not in namespace:
+                continue
+            value = namespace[name]
+            if isinstance(value, types.ModuleType):
+                modules[name] = value.__name__
+                continue
+            try:
+                variables[name] = pickle.dumps(value, -1)
+            except Exception:
+                pass
+        job = self._jobs[id] = Job(id, source.strip())
+        # The job is finished when its result and the end of its output
+        # have both arrived:
+        self._pending[id] = 2
+        args = (run_job, id, source, filename, variables, modules)
+        try:
+            job.future = self._get_executor().submit(*args)
+        except BrokenProcessPool:
+            self._executor = None
+            job.future = self._get_executor().submit(*args)
+        job.future.add_done_callback(lambda future: self._done(job, future))
+        return job
+
+    def wait(self, id=None, timeout=None):
+        """Wait until the given job, or all jobs, have finished. Returns
+        ``False`` on timeout."""
+        jobs = list(self._jobs.values()) if id is None else [self._jobs[id]]
+        futures = [job.future for job in jobs]
+        deadline = None if timeout is None else time.time() + timeout
+        # Wait in small steps to stay responsive to interrupts:
+        while True:
+            remaining = 0.1 if deadline is None else min(
+                0.1, deadline - time.time())
+            done, pending = wait_futures(futures, max(remaining, 0))
+            if not pending:
+                return True
+            if deadline is not None and time.time() >= deadline:
+                return False
+
+    def kill(self, id, force=False):
+        """Stop a job. A running job receives a KeyboardInterrupt, or is
+        killed with its worker process if ``force`` is given. Killing the
+        worker process also fails the other running jobs."""
+        job = self._jobs[id]
+        job.killed = True
+        if job.future.cancel() or job.future.done() or job.pid is None:
+            return
+        if force:
+            os.kill(job.pid, getattr(signal, 'SIGKILL', signal.SIGTERM))
+        elif os.name == 'posix':
+            os.kill(job.pid, signal.SIGINT)
+        else:
+            os.kill(job.pid, signal.SIGTERM)
+
+    def shutdown(self):
+        """Kill all jobs and stop the worker processes."""
+        for job in list(self._jobs.values()):
+            if not job.future.done():
+                self.kill(job.id, force=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            self._queue.put(None)
+            self._reader.join()
+            self._queue.close()
+            self._queue.join_thread()
+            self._queue = self._reader = None
+
+    def _get_executor(self):
+        if self._executor is not None:
+            return self._executor
+        # Forking a multi-threaded process can deadlock the children, so the
+        # workers are always started with a fresh interpreter:
+        context = multiprocessing.get_context('spawn')
+        if self._queue is None:
+            self._queue = context.Queue()
+            self._reader = threading.Thread(
+                target=self._read, args=(self._queue,))
+            self._reader.daemon = True
+            self._reader.start()
+        self._executor = ProcessPoolExecutor(
+            self.max_workers, mp_context=context, initializer=init_worker,
+            initargs=(self._queue,))
+        return self._executor
+
+    def _read(self, queue):
+        while True:
+            message = queue.get()
+            if message is None:
+                break
+            kind, id, data = message
+            if kind == 'start':
+                self._jobs[id].pid = data
+            elif kind == 'output':
+                self._write(id, data)
+            else:
+                self._done(self._jobs[id])
+
+    def _done(self, job, future=None):
+        # Jobs that failed to run send no end of output:
+        failed = future is not None and (
+            future.cancelled() or future.exception() is not None)
+        with self._lock:
+            pending = self._pending.get(job.id)
+            if pending is None:
+                return
+            pending = 0 if failed else pending - 1
+            if pending:
+                self._pending[job.id] = pending
+                return
+            del self._pending[job.id]
+        self._done_signal.emit(job)
+
+    def _write(self, id, text):
+        """Write the output of a job, with lines prefixed by its id."""
+        tag = '[%d] ' % id
+        prefix = tag if self._line_start.get(id, True) else ''
+        body = text[:-1] if text.endswith('\n') else text
+        self.stdout.write(
+            prefix + body.replace('\n', '\n' + tag) + text[len(body):])
+        self._line_start[id] = text.endswith('\n')
+
+    @Slot(object)
+    def _finish(self, job):
+        job.finished = time.time()
+        if not self._line_start.pop(job.id, True):
+            self.stdout.write('\n')
+        try:
+            status, job.result, variables = job.future.result()
+        except CancelledError:
+            status, variables = job.status, {}
+        except Exception as e:
+            status, variables = job.status, {}
+            self.stdout.write('[%d] %s: %s\n' % (
+                job.id, type(e).__name__, e))
+        namespace = self.interpreter.locals
+        for name, data in variables.items():
+            try:
+                namespace[name] = pickle.loads(data)
+            except Exception:
+                pass
+        if variables:
+            self.interpreter.namespace_generation += 1
+        self.stdout.write('[%d] %s  %s\n' % (job.id, status, job.source))
+        if job.result is not None:
+            self.stdout.write('[%d] %s\n' % (job.id, job.result))
+
+
+def background_source(source):
+    """Return the source without a trailing ``&`` that marks it as a
+    background job, or ``None`` if it is not a background job."""
+    stripped = source.rstrip()
+    if not stripped.endswith('&'):
+        return None
+    try:
+        compile(source, '<input>', 'exec')
+    except SyntaxError:
+        return stripped[:-1]
+    return None     # e.g. in a comment
+
+
+def code_names(code):
+    """Return the global names used by a code object and its nested code
+    objects."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names.update(code_names(const))
+    return names
+
+
+# State of the worker processes:
+
+_queue = None
+_job_id = None
+
+
+class JobOutput(object):
+
+    """Write-only stream in the worker that forwards output to the console.
+    """
+
+    def write(self, data):
+        if data and _job_id is not None:
+            _queue.put(('output', _job_id, data))
+
+    def flush(self):
+        pass
+
+
+def init_worker(queue):
+    global _queue
+    _queue = queue
+    signal.signal(signal.SIGINT, interrupt_job)
+    sys.stdout = sys.stderr = JobOutput()
+
+
+def interrupt_job(signum, frame):
+    if _job_id is not None:
+        raise KeyboardInterrupt
+
+
+def run_job(id, source, filename, variables, modules):
+    """Execute a job in the worker process. Returns the status, the
+    ``repr()`` of the result, and the pickled variables that were
+    assigned."""
+    global _job_id
+    namespace = {'__name__': '__console__', '__doc__': None}
+    for name, data in variables.items():
+        namespace[name] = pickle.loads(data)
+    for name, module in modules.items():
+        __import__(module)
+        namespace[name] = sys.modules[module]
+    before = dict(namespace)
+    status, result = 'done', None
+    _queue.put(('start', id, os.getpid()))
+    try:
+        _job_id = id
+        value = None
+        for code, mode in compile_multi(
+                CommandCompiler(), source, filename, 'multi'):
+            if mode == 'eval':
+                value = eval(code, namespace)
+            else:
+                exec(code, namespace)
+        if value is not None:
+            result = format_result(value)
+    except KeyboardInterrupt:
+        status = 'killed'
+    except BaseException:
+        status = 'failed'
+        traceback.print_exc()
+    finally:
+        _job_id = None
+    assigned = {}
+    for name, value in namespace.items():
+        if name == '__builtins__' or name in before and before[name] is value:
+            continue
+        try:
+            assigned[name] = pickle.dumps(value, -1)
+        except Exception:
+            pass
+    _queue.put(('end', id, None))
+    return status, result, assigned
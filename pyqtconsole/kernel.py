@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+"""
+Run the interpreter in a separate process (the kernel), so that CPU bound
+commands can not block the GUI thread.
+
+The kernel is started as ``python -m pyqtconsole.kernel`` and exchanges
+messages with the console over its stdin and stdout pipes. Each message is
+a pickled tuple ``(kind, *args)`` that is prefixed by its length.
+"""
+
+import os
+import pickle
+import signal
+import struct
+import subprocess
+import sys
+import threading
+import time
+import traceback
+import types
+from codeop import CommandCompiler
+from functools import partial
+from itertools import count
+
+try:
+    import queue
+except ImportError:     # python 2
+    import Queue as queue
+
+from qtpy.QtCore import QObject, Signal
+
+from .interpreter import PythonInterpreter, compile_multi, CompileCache
+from .profiler import compile_prun
+from .completer import namespace_completions, jedi_completions, import_jedi
+
+_HEADER = struct.Struct('!I')
+
+
+class Connection(object):
+
+    """Sends and receives messages over a pair of binary streams. Messages
+    can be sent from any thread."""
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._lock = threading.Lock()
+
+    def send(self, *message):
+        data = pickle.dumps(message, 2)
+        with self._lock:
+            self._writer.write(_HEADER.pack(len(data)) + data)
+            self._writer.flush()
+
+    def recv(self):
+        """Return the next message, or ``None`` if the stream was closed."""
+        header = self._reader.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return None
+        size, = _HEADER.unpack(header)
+        data = self._reader.read(size)
+        if len(data) < size:
+            return None
+        return pickle.loads(data)
+
+
+class BatchedOutput(object):
+
+    """Write-only stream in the kernel that sends the written text to the
+    console in batches, at most every ``interval`` seconds."""
+
+    def __init__(self, connection, interval=0.02):
+        self._connection = connection
+        self._interval = interval
+        self._pending = []
+        self._cond = threading.Condition()
+        # keeps the batches in order if flush() is called concurrently:
+        self._flush_lock = threading.Lock()
+        thread = threading.Thread(target=self._run)
+        thread.daemon = True
+        thread.start()
+
+    def write(self, data):
+        with self._cond:
+            if not self._pending:
+                self._cond.notify()
+            self._pending.append(data)
+
+    def flush(self):
+        """Send all pending output now."""
+        with self._flush_lock:
+            with self._cond:
+                data = ''.join(self._pending)
+                del self._pending[:]
+            if data:
+                self._connection.send('output', data)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            time.sleep(self._interval)
+            self.flush()
+
+
+class Kernel(object):
+
+    """Executes the commands received over the connection with a
+    ``PythonInterpreter`` in the main thread. Completion requests and
+    interrupts are handled by a reader thread, also while a command is
+    executing."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.stdout = BatchedOutput(connection)
+        self.interpreter = PythonInterpreter(None, self.stdout)
+        self.interpreter.exec_signal.connect(self.interpreter.exec_)
+        self.interpreter.done_signal.connect(self._done)
+        self.interpreter.exit_signal.connect(self._exit)
+        self.interpreter.stats_signal.connect(self._stats)
+        self._commands = queue.Queue()
+
+    def run(self):
+        """Execute commands until the connection is closed."""
+        # Interrupts are handled by the interpreter while executing:
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        reader = threading.Thread(target=self._read)
+        reader.daemon = True
+        reader.start()
+        while True:
+            source = self._commands.get()
+            if source is None:
+                break
+            if self.interpreter.runsource(source, symbol='multi'):
+                self._done(False, None)
+
+    def _done(self, executed, result):
+        self.stdout.flush()
+        self.connection.send('done', executed, result)
+
+    def _stats(self, stats):
+        self.connection.send('stats', stats)
+
+    def _exit(self, exc):
+        self.stdout.flush()
+        self.connection.send('exit')
+
+    def _read(self):
+        while True:
+            try:
+                message = self.connection.recv()
+            except Exception:
+                # e.g. a pushed value whose class is unknown in the kernel:
+                self.stdout.write(traceback.format_exc())
+                continue
+            if message is None:
+                break
+            getattr(self, '_handle_' + message[0])(*message[1:])
+        self._commands.put(None)
+
+    def _handle_exec(self, source):
+        self._commands.put(source)
+
+    def _handle_complete(self, request_id, tier, line):
+        completer = (namespace_completions if tier == 'namespace' else
+                     jedi_completions)
+        try:
+            words = completer(line, self.interpreter.locals)
+        except Exception:
+            words = []
+        self.connection.send('completions', request_id, words)
+
+    def _handle_interrupt(self):
+        self.interpreter.interrupt()
+
+    def _handle_push(self, name, value):
+        self.interpreter.locals[name] = value
+
+    def _handle_stats(self, collect, memory):
+        self.interpreter.collect_stats = collect
+        self.interpreter.trace_memory = memory
+
+    def _handle_warm_up(self):
+        namespace = self.interpreter.locals
+        modules = [name for name, value in list(namespace.items())
+                   if isinstance(value, types.ModuleType)]
+
+        def warm_up():
+            import_jedi()
+            for name in modules:
+                jedi_completions(name + '.', namespace)
+
+        warmer = threading.Thread(target=warm_up)
+        warmer.daemon = True
+        warmer.start()
+
+
+class KernelClient(QObject):
+
+    """Runs a kernel process and forwards commands to it. The kernel's output
+    is written to ``stdout``. If the kernel dies, ``died_signal`` is emitted
+    with its exit code. If enabled by ``set_stats``, the ``CellStats`` of
+    each command are emitted by ``stats_signal``.
+
+    The signals are emitted from a background thread."""
+
+    done_signal = Signal(bool, object)
+    exit_signal = Signal(object)
+    stats_signal = Signal(object)
+    died_signal = Signal(object)
+
+    def __init__(self, stdout, parent=None):
+        super(KernelClient, self).__init__(parent)
+        self.stdout = stdout
+        self.completion_timeout = 5
+        self.namespace_generation = 0
+        self._compile = partial(compile_prun, partial(
+            compile_multi, CommandCompiler(), cache=CompileCache()))
+        self._executing = False
+        self._stats = (False, False)
+        self._process = None
+        self._connection = None
+        self._request_ids = count()
+        self._requests = {}
+        self._lock = threading.Lock()
+        self.start()
+
+    def start(self):
+        """Start a new kernel process."""
+        # Make sure the kernel can import this package:
+        path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(
+            filter(None, [path, env.get('PYTHONPATH')]))
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'pyqtconsole.kernel'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env)
+        self._process = process
+        self._connection = Connection(process.stdout, process.stdin)
+        self._executing = False
+        self.namespace_generation += 1
+        reader = threading.Thread(
+            target=self._read, args=(process, self._connection))
+        reader.daemon = True
+        reader.start()
+        if self._stats[0]:
+            self._send('stats', *self._stats)
+
+    def stop(self, timeout=1):
+        """Close the connection to the kernel, and kill it if it does not
+        exit within ``timeout`` seconds."""
+        process, self._process = self._process, None
+        self._executing = False
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+        except (IOError, OSError):
+            pass
+        deadline = time.time() + timeout
+        while process.poll() is None and time.time() < deadline:
+            time.sleep(0.01)
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+    def restart(self):
+        """Replace the kernel by a new process with an empty namespace."""
+        self.stop(timeout=0)
+        self.start()
+
+    def executing(self):
+        return self._executing
+
+    def runsource(self, source):
+        """Execute the source in the kernel. Returns ``True`` if the source
+        is incomplete, and ``False`` otherwise, like ``runsource`` of the
+        interpreter. ``done_signal`` is emitted when execution has finished.
+        """
+        try:
+            if self._compile(source, '<input>', 'multi') is None:
+                return True
+        except (OverflowError, SyntaxError, ValueError):
+            pass    # the kernel shows the error
+        self._executing = True
+        self.namespace_generation += 1
+        self._send('exec', source)
+        return False
+
+    def interrupt(self):
+        """Raise a KeyboardInterrupt in the command being executed."""
+        if self._process is None:
+            return
+        if os.name == 'posix':
+            # a signal also interrupts blocking system calls:
+            self._process.send_signal(signal.SIGINT)
+        else:
+            self._send('interrupt')
+
+    def complete(self, tier, line):
+        """Get completions from the kernel, using the given completer
+        (``'namespace'`` or ``'jedi'``). Returns ``None`` on timeout."""
+        if self._process is None or self._process.poll() is not None:
+            return None
+        done = threading.Event()
+        request = [done, None]
+        with self._lock:
+            request_id = next(self._request_ids)
+            self._requests[request_id] = request
+        try:
+            self._send('complete', request_id, tier, line)
+            done.wait(self.completion_timeout)
+        finally:
+            with self._lock:
+                self._requests.pop(request_id, None)
+        return request[1]
+
+    def push(self, name, value):
+        """Set a variable in the kernel's namespace. The value must be
+        picklable."""
+        self._send('push', name, value)
+        self.namespace_generation += 1
+
+    def set_stats(self, collect, memory=False):
+        """Measure each command in the kernel, see ``CellStats``. Memory
+        allocation is traced only if ``memory`` is true. The setting is kept
+        when the kernel is restarted."""
+        self._stats = (collect, memory)
+        self._send('stats', collect, memory)
+
+    def warm_up(self):
+        """Let jedi analyze the modules in the kernel's namespace."""
+        self._send('warm_up')
+
+    def _send(self, *message):
+        try:
+            self._connection.send(*message)
+        except (IOError, OSError):
+            pass    # the reader thread notices that the kernel died
+
+    def _read(self, process, connection):
+        while True:
+            message = connection.recv()
+            if message is None:
+                break
+            kind, args = message[0], message[1:]
+            if kind == 'output':
+                self.stdout.write(args[0])
+            elif kind == 'completions':
+                with self._lock:
+                    request = self._requests.get(args[0])
+                if request:
+                    request[1] = args[1]
+                    request[0].set()
+            elif process is not self._process:
+                continue
+            elif kind == 'stats':
+                self.stats_signal.emit(args[0])
+            elif kind == 'done':
+                self._executing = False
+                self.namespace_generation += 1
+                self.done_signal.emit(*args)
+            elif kind == 'exit':
+                self.exit_signal.emit(None)
+        with self._lock:
+            for done, words in self._requests.values():
+                done.set()
+        if process is self._process:
+            self.died_signal.emit(process.wait())
+
+
+def main():
+    # Keep the pipes for messages, and point the file descriptors elsewhere,
+    # so that output from C code or subprocesses can not corrupt them:
+    reader = os.fdopen(os.dup(0), 'rb')
+    writer = os.fdopen(os.dup(1), 'wb')
+    null = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(null, 0)
+    os.close(null)
+    os.dup2(2, 1)
+    kernel = Kernel(Connection(reader, writer))
+    sys.stdout = sys.stderr = kernel.stdout
+    kernel.run()
+
+
+if __name__ == '__main__':
+    main()
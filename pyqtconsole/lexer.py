@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Single pass lexer that classifies python source code line by line for syntax
+highlighting.
+"""
+
+import keyword
+import re
+
+# States at the end of a line:
+NORMAL = 0
+TRIPLE_SINGLE = 1       # inside a '''string
+TRIPLE_DOUBLE = 2       # inside a """string
+
+KEYWORDS = frozenset(keyword.kwlist)
+
+_PREFIX = r'[rRbBuUfF]{0,2}'
+
+TOKEN_RE = re.compile(r'''
+    (?P<comment>\#.*)
+  | (?P<string2>%(prefix)s(?:\'\'\'|"""))
+  | (?P<string>%(prefix)s(?:
+        "[^"\\\n]*(?:\\.[^"\\\n]*)*"? |
+        '[^'\\\n]*(?:\\.[^'\\\n]*)*'?))
+  | (?P<defclass>(?:def|class)\b)\s+(?P<name>[^\W\d]\w*)
+  | (?P<identifier>[^\W\d]\w*)
+  | (?P<numbers>
+        0[xX](?:_?[0-9a-fA-F])+ |
+        0[oO](?:_?[0-7])+ |
+        0[bB](?:_?[01])+ |
+        (?:\d(?:_?\d)*(?:\.(?:\d(?:_?\d)*)?)? | \.\d(?:_?\d)*)
+        (?:[eE][+-]?\d(?:_?\d)*)?[jJ]?)
+''' % {'prefix': _PREFIX}, re.VERBOSE | re.UNICODE)
+
+# Match the remainder of a triple-quoted string up to the closing quotes:
+STRING_END_RE = {
+    TRIPLE_SINGLE: re.compile(r"[^'\\]*(?:(?:\\.|'(?!''))[^'\\]*)*'''"),
+    TRIPLE_DOUBLE: re.compile(r'[^"\\]*(?:(?:\\.|"(?!""))[^"\\]*)*"""'),
+}
+
+
+def lex_line(text, state=NORMAL, keywords=KEYWORDS):
+    """Classify the tokens in a single line of python code.
+
+    Returns a list of tuples ``(start, length, kind)``, where ``kind`` is one
+    of ``'keyword'``, ``'defclass'``, ``'string'``, ``'string2'`` (triple
+    quoted), ``'comment'`` or ``'numbers'``, and the state at the end of the
+    line, which must be passed in when lexing the next line."""
+    tokens = []
+    pos = 0
+    end = len(text)
+    while pos < end:
+        if state != NORMAL:
+            match = STRING_END_RE[state].match(text, pos)
+            stop = match.end() if match else end
+            tokens.append((pos, stop - pos, 'string2'))
+            if match:
+                state = NORMAL
+            pos = stop
+            continue
+
+        match = TOKEN_RE.search(text, pos)
+        if not match:
+            break
+        kind = match.lastgroup
+        start, pos = match.span()
+        if kind == 'identifier':
+            if match.group() in keywords:
+                tokens.append((start, pos - start, 'keyword'))
+        elif kind == 'name':
+            tokens.append((start, match.end('defclass') - start, 'keyword'))
+            start = match.start('name')
+            tokens.append((start, pos - start, 'defclass'))
+        elif kind == 'string2':
+            state = TRIPLE_SINGLE if text[pos-1] == "'" else TRIPLE_DOUBLE
+            match = STRING_END_RE[state].match(text, pos)
+            if match:
+                state = NORMAL
+                pos = match.end()
+            else:
+                pos = end
+            tokens.append((start, pos - start, 'string2'))
+        else:
+            tokens.append((start, pos - start, kind))
+    return tokens, state
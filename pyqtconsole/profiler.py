@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+Profile a command by prefixing it with ``%prun``::
+
+    %prun [-s key] [-l limit] [-D file] [-q] [-i msecs] [--] statements
+
+The statements can continue on the following lines. They are executed by
+the interpreter as usual, but under ``cProfile``. With ``-i``, the stack of
+the executing thread is instead sampled every ``msecs`` milliseconds by a
+background thread, which slows down code with many small function calls
+much less, but can not count calls.
+
+Afterwards, the ``limit`` (default 20) functions with the largest
+``cumulative`` time are shown, or sorted by ``tottime`` or ``ncalls``. With
+``-D``, the ``cProfile`` results are saved to a file that can be loaded
+with ``pstats``, ``-q`` suppresses the table.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+
+PREFIX = '%prun'
+USAGE = ('usage: %prun [-s cumulative|tottime|ncalls] [-l limit] [-D file] '
+         '[-q] [-i msecs] [--] statements')
+
+# index in the cProfile entries ``(ncalls, primitive calls, tottime,
+# cumulative)``, the sampled entries are ``(self, cumulative)``:
+SORT_KEYS = {
+    'cumulative': (3, 1),
+    'cumtime': (3, 1),
+    'tottime': (2, 0),
+    'time': (2, 0),
+    'ncalls': (0, None),
+    'calls': (0, None),
+}
+
+ProfileOptions = namedtuple('ProfileOptions', [
+    'sort', 'limit', 'dump', 'quiet', 'interval'])
+
+
+class ProfiledCodes(list):
+
+    """The compiled codes of a command that is to be profiled with the given
+    ``ProfileOptions``."""
+
+    def __init__(self, codes, options):
+        super(ProfiledCodes, self).__init__(codes)
+        self.options = options
+
+
+def compile_prun(compile, source, filename, symbol):
+    """Compile the source with the given function, after removing a leading
+    ``%prun`` and its options. Returns ``ProfiledCodes`` in that case.
+    Raises ``ValueError`` for invalid options."""
+    options, source = split_prun(source)
+    codes = compile(source, filename, symbol)
+    if options is None or codes is None:
+        return codes
+    return ProfiledCodes(codes, options)
+
+
+def split_prun(source):
+    """Return ``(options, statements)`` if the source starts with ``%prun``,
+    and ``(None, source)`` otherwise."""
+    head, sep, tail = source.partition('\n')
+    if not head.startswith(PREFIX) or head[len(PREFIX):][:1].strip():
+        return None, source
+    options = {'sort': 'cumulative', 'limit': 20, 'dump': None,
+               'quiet': False, 'interval': None}
+    rest = head[len(PREFIX):].lstrip()
+    while rest.startswith('-'):
+        option, rest = _next_word(rest)
+        if option == '--':
+            break
+        if option == '-q':
+            options['quiet'] = True
+            continue
+        if option not in ('-s', '-l', '-D', '-i'):
+            raise ValueError('unknown option %s, %s' % (option, USAGE))
+        value, rest = _next_word(rest)
+        if not value:
+            raise ValueError('option %s requires a value, %s' % (
+                option, USAGE))
+        try:
+            if option == '-s':
+                if value not in SORT_KEYS:
+                    raise ValueError
+                options['sort'] = value
+            elif option == '-l':
+                options['limit'] = int(value)
+            elif option == '-D':
+                options['dump'] = value
+            else:
+                options['interval'] = float(value) / 1000
+                if options['interval'] <= 0:
+                    raise ValueError
+        except ValueError:
+            raise ValueError('invalid value for %s: %s, %s' % (
+                option, value, USAGE))
+    options = ProfileOptions(**options)
+    if options.interval is not None and (
+            options.dump or SORT_KEYS[options.sort][1] is None):
+        raise ValueError('-D and -s %s are not supported with -i' % (
+            options.sort,))
+    source = rest + sep + tail if rest else tail
+    if not source.strip():
+        raise ValueError(USAGE)
+    return options, source
+
+
+def _next_word(text):
+    words = text.split(None, 1)
+    return (words[0] if words else '',
+            words[1].lstrip() if len(words) > 1 else '')
+
+
+def make_profiler(options):
+    if options.interval is None:
+        return CallProfiler(options)
+    return SamplingProfiler(options)
+
+
+class CallProfiler(object):
+
+    """Records all function calls of the executing thread with
+    ``cProfile``."""
+
+    def __init__(self, options):
+        self.options = options
+        self._profile = None
+        self._running = False
+
+    def start(self, stop_frame):
+        import cProfile
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        self._running = True
+
+    def stop(self):
+        if self._running:
+            self._profile.disable()
+            self._running = False
+
+    def report(self, stdout):
+        """Stop the profiler, and write the results."""
+        self.stop()
+        if self._profile is None:
+            return
+        import pstats
+        stats = pstats.Stats(self._profile)
+        if self.options.dump:
+            stats.dump_stats(self.options.dump)
+            stdout.write('Profile saved to %s\n' % self.options.dump)
+        if self.options.quiet:
+            return
+        index = SORT_KEYS[self.options.sort][0]
+        entries = sorted(stats.stats.items(), reverse=True,
+                         key=lambda item: item[1][index])
+        lines = ['%d function calls in %.3f seconds\n\n' % (
+                     stats.total_calls, stats.total_tt),
+                 '%9s  %8s  %8s  %s\n' % (
+                     'ncalls', 'tottime', 'cumtime', 'function')]
+        for func, (cc, nc, tt, ct, callers) in entries[:self.options.limit]:
+            ncalls = str(nc) if nc == cc else '%d/%d' % (nc, cc)
+            lines.append('%9s  %8.3f  %8.3f  %s\n' % (
+                ncalls, tt, ct, format_function(func)))
+        stdout.write(''.join(lines))
+
+
+class SamplingProfiler(object):
+
+    """Samples the stack of the executing thread from a background thread.
+    Only the frames above ``stop_frame`` are counted."""
+
+    def __init__(self, options):
+        self.options = options
+        self.samples = 0
+        self.own = {}
+        self.cumulative = {}
+        self._thread = None
+        self._stopped = threading.Event()
+        self._duration = 0
+
+    def start(self, stop_frame):
+        self._ident = threading.current_thread().ident
+        self._stop_frame = stop_frame
+        self._started = time.time()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None and not self._stopped.is_set():
+            self._stopped.set()
+            self._thread.join()
+            self._duration = time.time() - self._started
+
+    def _run(self):
+        current_frames = sys._current_frames
+        while not self._stopped.wait(self.options.interval):
+            frame = current_frames().get(self._ident)
+            stack = []
+            while frame is not None and frame is not self._stop_frame:
+                code = frame.f_code
+                stack.append(
+                    (code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            # skip an empty stack, or if the thread is already in stop():
+            if not stack or self._stopped.is_set():
+                continue
+            self.samples += 1
+            self.own[stack[0]] = self.own.get(stack[0], 0) + 1
+            # outer frames first, so that they are listed first on ties:
+            seen = set()
+            for func in reversed(stack):
+                if func not in seen:
+                    seen.add(func)
+                    self.cumulative[func] = self.cumulative.get(func, 0) + 1
+
+    def report(self, stdout):
+        """Stop the profiler, and write the results."""
+        self.stop()
+        if self._thread is None or self.options.quiet:
+            return
+        counts = (self.own, self.cumulative)[
+            SORT_KEYS[self.options.sort][1]]
+        funcs = sorted(counts, key=counts.get, reverse=True)
+        total = float(max(self.samples, 1))
+        lines = ['%d samples every %g ms in %.3f seconds\n\n' % (
+                     self.samples, self.options.interval * 1000,
+                     self._duration),
+                 '%6s  %6s  %s\n' % ('self', 'cumul', 'function')]
+        for func in funcs[:self.options.limit]:
+            lines.append('%5.1f%%  %5.1f%%  %s\n' % (
+                self.own.get(func, 0) / total * 100,
+                self.cumulative[func] / total * 100,
+                format_function(func)))
+        stdout.write(''.join(lines))
+
+
+def format_function(func):
+    filename, line, name = func
+    if filename == '~':
+        return name     # built-in function
+    return '%s:%d(%s)' % (os.path.basename(filename), line, name)
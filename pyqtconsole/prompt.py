@@ -1,18 +1,25 @@
-from qtpy.QtCore import Qt, QRect
+from bisect import bisect_left
+from collections import OrderedDict
+
+from qtpy.QtCore import Qt, QRect, QPointF
 from qtpy.QtWidgets import QWidget
-from qtpy.QtGui import QPainter
+from qtpy.QtGui import QPainter, QFontMetrics, QStaticText, QTransform
 
 
 class PromptArea(QWidget):
 
     """Widget that displays the prompts on the left of the input area."""
 
-    def __init__(self, edit, get_text, highlighter):
+    def __init__(self, edit, get_text, highlighter, cache_size=256):
         super(PromptArea, self).__init__(edit)
         self.setFixedWidth(0)
         self.edit = edit
         self.get_text = get_text
         self.highlighter = highlighter
+        self.cache_size = cache_size
+        self._layouts = OrderedDict()
+        self._widths = OrderedDict()
+        self._widths_font = None
         edit.updateRequest.connect(self.updateContents)
 
     def paintEvent(self, event):
@@ -22,6 +29,7 @@ class PromptArea(QWidget):
         count = block.blockNumber()
         painter = QPainter(self)
         painter.fillRect(event.rect(), edit.palette().base())
+        painter.setFont(edit.font())
         first = True
         while block.isValid():
             count += 1
@@ -29,7 +37,7 @@ class PromptArea(QWidget):
                 edit.contentOffset()).top()
             if not block.isVisible() or block_top > event.rect().bottom():
                 break
-            rect = QRect(0, block_top, self.width(), height)
+            rect = QRect(0, int(block_top), self.width(), height)
             self.draw_block(painter, rect, block, first)
             first = False
             block = block.next()
@@ -43,28 +51,197 @@ class PromptArea(QWidget):
             self.update()
 
     def adjust_width(self, new_text):
-        width = calc_text_width(self.edit, new_text)
+        font_key = self.edit.font().key()
+        if font_key != self._widths_font:
+            self._widths.clear()
+            self._widths_font = font_key
+        width = self._widths.pop(new_text, None)
+        if width is None:
+            width = calc_text_width(self.edit, new_text)
+            while len(self._widths) >= self.cache_size:
+                self._widths.popitem(last=False)
+        self._widths[new_text] = width
         if width > self.width():
             self.setFixedWidth(width)
 
     def draw_block(self, painter, rect, block, first):
         """Draw the info corresponding to a given block (text line) of the text
         document."""
-        pen = painter.pen()
         text = self.get_text(block.blockNumber())
+        if not text:
+            return
+        right = rect.left() + rect.width()
+        for offset, static_text, color in self.get_layout(text):
+            painter.setPen(color)
+            painter.drawStaticText(
+                QPointF(right - offset, rect.top()), static_text)
 
-        default = self.edit.currentCharFormat()
-        formats = [default] * len(text)
-        painter.setFont(self.edit.font())
+    def get_layout(self, text):
+        """Return the highlighted runs of the prompt text as a list of tuples
+        ``(offset, static_text, color)``, where ``offset`` is the distance of
+        the left edge of the run from the right edge of the widget. Layouts
+        are cached for the most recently used prompts."""
+        font = self.edit.font()
+        key = (text, font.key(), self.edit.palette().cacheKey())
+        layout = self._layouts.pop(key, None)
+        if layout is None:
+            layout = self._create_layout(text, font)
+            while len(self._layouts) >= self.cache_size:
+                self._layouts.popitem(last=False)
+        self._layouts[key] = layout
+        return layout
 
+    def _create_layout(self, text, font):
+        default = self.edit.currentCharFormat().foreground().color()
+        colors = [default] * len(text)
         for index, length, format in self.highlighter.highlight(text):
-            formats[index:index+length] = [format] * length
+            colors[index:index+length] = [format.foreground().color()] * length
+
+        metrics = QFontMetrics(font)
+        layout = []
+        start = 0
+        for end in range(1, len(text) + 1):
+            if end < len(text) and colors[end] == colors[start]:
+                continue
+            run = text[start:end]
+            if run.strip():
+                static_text = QStaticText(run)
+                static_text.setTextFormat(Qt.PlainText)
+                static_text.prepare(QTransform(), font)
+                layout.append(
+                    (metrics.width(text[start:]), static_text, colors[start]))
+            start = end
+        return layout
+
+
+class PromptDoc(object):
+
+    """Sequence of prompt texts, one for each line of the document.
+
+    Only lines with a non-empty prompt are stored, as a sorted list of line
+    numbers with an index into a table of distinct prompt strings. Entries of
+    the table are reference counted and reused once no line refers to them.
+    Lines can only be appended at the end, removing lines from the front is
+    cheap. Changing the prompt of a line other than the last is O(number of
+    prompts) in the worst case."""
+
+    def __init__(self):
+        self._size = 1
+        self._base = 0          # number of lines removed from the front
+        self._lines = []        # sorted line numbers (including _base)
+        self._ids = []          # prompt id for each entry in _lines
+        self._table = []        # prompt text for each id
+        self._counts = []       # number of lines for each id
+        self._free = []         # unused ids
+        self._index = {}        # prompt text -> id
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, line):
+        line = self._line(line)
+        i = bisect_left(self._lines, line)
+        if i < len(self._lines) and self._lines[i] == line:
+            return self._table[self._ids[i]]
+        return ''
 
-        for idx, (char, format) in enumerate(zip(text, formats)):
-            rpos = len(text) - idx - 1
-            pen.setColor(format.foreground().color())
-            painter.setPen(pen)
-            painter.drawText(rect, Qt.AlignRight, text[idx] + ' ' * rpos)
+    def __setitem__(self, line, text):
+        line = self._line(line)
+        lines, ids = self._lines, self._ids
+        i = bisect_left(lines, line)
+        found = i < len(lines) and lines[i] == line
+        if not text:
+            if found:
+                self._release(ids[i])
+                del lines[i]
+                del ids[i]
+        elif found:
+            prompt_id = self._prompt_id(text)
+            self._release(ids[i])
+            ids[i] = prompt_id
+        else:
+            lines.insert(i, line)
+            ids.insert(i, self._prompt_id(text))
+
+    def __delitem__(self, key):
+        start, stop, _ = key.indices(self._size)
+        if start >= stop:
+            return
+        lines, ids = self._lines, self._ids
+        i = bisect_left(lines, self._base + start)
+        j = bisect_left(lines, self._base + stop)
+        for prompt_id in ids[i:j]:
+            self._release(prompt_id)
+        del lines[i:j]
+        del ids[i:j]
+        if start == 0:
+            self._base += stop
+        else:
+            for k in range(i, len(lines)):
+                lines[k] -= stop - start
+        self._size -= stop - start
+
+    def insert_text(self, text):
+        """Append text at the end, where each newline starts a new line.
+        Returns the list of non-empty prompts that were modified."""
+        first, sep, rest = text.partition('\n')
+        changed = []
+        if first:
+            changed.append(self._set(self._size - 1, self[-1] + first))
+        if not sep:
+            return changed
+        start = self._size
+        self._size += rest.count('\n') + 1
+        # Avoid creating one object per line for the common case of a block
+        # of empty lines:
+        if rest.strip('\n'):
+            for offset, line in enumerate(rest.split('\n')):
+                if line:
+                    changed.append(self._set(start + offset, line))
+        return changed
+
+    def _line(self, line):
+        """Check line number and convert to internal representation."""
+        if line < 0:
+            line += self._size
+        if not 0 <= line < self._size:
+            raise IndexError("prompt line out of range")
+        return line + self._base
+
+    def _prompt_id(self, text):
+        """Return the id for the prompt text, and count a new reference."""
+        prompt_id = self._index.get(text)
+        if prompt_id is None:
+            if self._free:
+                prompt_id = self._free.pop()
+                self._table[prompt_id] = text
+            else:
+                prompt_id = len(self._table)
+                self._table.append(text)
+                self._counts.append(0)
+            self._index[text] = prompt_id
+        self._counts[prompt_id] += 1
+        return prompt_id
+
+    def _release(self, prompt_id):
+        """Remove a reference to the prompt id, and free it if unused."""
+        self._counts[prompt_id] -= 1
+        if not self._counts[prompt_id]:
+            del self._index[self._table[prompt_id]]
+            self._table[prompt_id] = None
+            self._free.append(prompt_id)
+
+    def _set(self, line, text):
+        """Set prompt for the line (which must be the last one)."""
+        line += self._base
+        prompt_id = self._prompt_id(text)
+        if self._lines and self._lines[-1] == line:
+            self._release(self._ids[-1])
+            self._ids[-1] = prompt_id
+        else:
+            self._lines.append(line)
+            self._ids.append(prompt_id)
+        return text
 
 
 def calc_text_width(widget, text):
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Run an asyncio event loop on top of the Qt event loop, and execute commands
+as asyncio tasks. Requires python 3.8 or later.
+
+The asyncio loop has no thread or blocking call of its own. Each of its
+iterations is triggered from the Qt event loop: by a ``QSocketNotifier`` when
+a watched file descriptor becomes ready, and by a ``QTimer`` when callbacks
+are scheduled or due. The loop is idle while there is nothing to do.
+"""
+
+import asyncio
+import heapq
+import math
+import selectors
+from functools import partial
+
+from qtpy.QtCore import Qt, QSocketNotifier, QTimer
+
+
+class QtSelector(selectors.DefaultSelector):
+
+    """Selector that watches the registered file descriptors with
+    ``QSocketNotifier`` and calls ``wake()`` when one of them is ready."""
+
+    _kinds = [
+        (selectors.EVENT_READ, QSocketNotifier.Read),
+        (selectors.EVENT_WRITE, QSocketNotifier.Write),
+    ]
+
+    def __init__(self, wake):
+        super().__init__()
+        self._wake = wake
+        self._notifiers = {}
+
+    def register(self, fileobj, events, data=None):
+        key = super().register(fileobj, events, data)
+        self._watch(key.fd, events)
+        return key
+
+    def unregister(self, fileobj):
+        key = super().unregister(fileobj)
+        self._watch(key.fd, 0)
+        return key
+
+    def modify(self, fileobj, events, data=None):
+        key = super().modify(fileobj, events, data)
+        self._watch(key.fd, events)
+        return key
+
+    def close(self):
+        for fd, event in list(self._notifiers):
+            self._watch(fd, 0)
+        super().close()
+
+    def _watch(self, fd, events):
+        for event, kind in self._kinds:
+            notifier = self._notifiers.get((fd, event))
+            if events & event and notifier is None:
+                notifier = QSocketNotifier(fd, kind)
+                notifier.activated.connect(lambda *args: self._wake())
+                self._notifiers[fd, event] = notifier
+            elif not events & event and notifier is not None:
+                del self._notifiers[fd, event]
+                notifier.setEnabled(False)
+                notifier.deleteLater()
+
+
+class QtEventLoop(asyncio.SelectorEventLoop):
+
+    """Asyncio event loop that is driven by the Qt event loop of the thread
+    in which it was created.
+
+    Do not call ``run_forever()`` or ``run_until_complete()``, the loop runs
+    whenever the Qt event loop runs. Each iteration polls the file
+    descriptors without blocking, and runs the callbacks that are ready."""
+
+    def __init__(self):
+        self._soon = False
+        self._stepping = False
+        self._deadlines = []
+        self._timer = QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.timeout.connect(self._iterate)
+        super().__init__(QtSelector(self._wake))
+
+    def call_soon(self, callback, *args, **kwargs):
+        handle = super().call_soon(callback, *args, **kwargs)
+        self._wake()
+        return handle
+
+    def call_at(self, when, callback, *args, **kwargs):
+        handle = super().call_at(when, callback, *args, **kwargs)
+        heapq.heappush(self._deadlines, when)
+        if not self._stepping:
+            self._schedule()
+        return handle
+
+    def close(self):
+        self._timer.stop()
+        super().close()
+
+    def _wake(self):
+        """Run an iteration as soon as Qt is idle."""
+        self._soon = True
+        if not self._stepping:
+            self._timer.start(0)
+
+    def _schedule(self):
+        if self._soon:
+            self._timer.start(0)
+        elif self._deadlines:
+            delay = self._deadlines[0] - self.time()
+            self._timer.start(max(0, math.ceil(delay * 1000)))
+        else:
+            self._timer.stop()
+
+    def _iterate(self):
+        # Skip if called from a nested Qt event loop during an iteration, the
+        # outer iteration reschedules when it is done:
+        if self._stepping or self.is_running() or self.is_closed():
+            return
+        self._soon = False
+        now = self.time()
+        self._stepping = True
+        try:
+            # Calling stop() first makes run_forever() run one iteration
+            # without blocking:
+            self.stop()
+            self.run_forever()
+        finally:
+            self._stepping = False
+        # Callbacks that were due at the start have been executed:
+        while self._deadlines and self._deadlines[0] <= now:
+            heapq.heappop(self._deadlines)
+        self._schedule()
+
+
+async def exec_async(interpreter, codes):
+    """Execute the compiled codes like ``PythonInterpreter.exec_()``, and
+    await the code that was compiled with top-level await. Cancelling the
+    task, or ``interpreter.interrupt()``, raises a ``KeyboardInterrupt`` in
+    the command."""
+    task = asyncio.current_task()
+    steps = interpreter.exec_steps(codes, cancel=partial(
+        task.get_loop().call_soon_threadsafe, task.cancel))
+    advance, value = steps.send, None
+    while True:
+        try:
+            awaitable = advance(value)
+        except StopIteration:
+            return
+        try:
+            value = await awaitable
+        except asyncio.CancelledError:
+            advance, value = steps.throw, KeyboardInterrupt()
+        except BaseException as e:
+            # hide this frame in the traceback:
+            advance, value = steps.throw, e.with_traceback(
+                e.__traceback__.tb_next)
+        else:
+            advance = steps.send
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Per-command statistics: wall and CPU time, amount of output, and memory
+allocation as measured by ``tracemalloc``.
+"""
+
+import contextlib
+import csv
+import json
+import time
+from collections import deque, namedtuple
+
+try:
+    from time import perf_counter, process_time
+except ImportError:     # python 2
+    from time import time as perf_counter, clock as process_time
+
+CellStats = namedtuple('CellStats', [
+    'index',            # number of the IN/OUT prompt
+    'source',
+    'started',          # time.time() at the start
+    'wall',             # seconds
+    'cpu',              # seconds of CPU time of the process
+    'peak_memory',      # bytes, None if memory was not traced
+    'net_memory',       # bytes still allocated at the end
+    'output_chars',     # characters written to stdout and stderr
+    'status',           # 'ok', 'error', 'interrupted' or 'exit'
+])
+
+
+class StatsRecorder(object):
+
+    """Measures a single command, from its creation until ``stop()``. If
+    ``memory`` is true, ``tracemalloc`` is started for the duration of the
+    command, which can make allocation heavy code more than ten times as
+    slow."""
+
+    def __init__(self, memory=False):
+        self.output_chars = 0
+        self._tracemalloc = None
+        self._was_tracing = False
+        self._memory_base = 0
+        if memory:
+            import tracemalloc
+            self._tracemalloc = tracemalloc
+            self._was_tracing = tracemalloc.is_tracing()
+            if not self._was_tracing:
+                tracemalloc.start()
+            elif hasattr(tracemalloc, 'reset_peak'):    # python 3.9
+                tracemalloc.reset_peak()
+            self._memory_base = tracemalloc.get_traced_memory()[0]
+        self._started = time.time()
+        self._wall = perf_counter()
+        self._cpu = process_time()
+
+    def stream(self, stream):
+        """Return a wrapper for ``stream`` that counts the output."""
+        return CountingStream(stream, self)
+
+    def stop(self, status):
+        """Return the ``CellStats``, without index and source."""
+        wall = perf_counter() - self._wall
+        cpu = process_time() - self._cpu
+        peak = net = None
+        if self._tracemalloc is not None:
+            current, peak = self._tracemalloc.get_traced_memory()
+            if not self._was_tracing:
+                self._tracemalloc.stop()
+            net = current - self._memory_base
+            peak = max(peak - self._memory_base, 0)
+        return CellStats(None, None, self._started, wall, cpu, peak, net,
+                         self.output_chars, status)
+
+
+class CountingStream(object):
+
+    """Forwards writes to a stream, and counts the written characters."""
+
+    def __init__(self, stream, recorder):
+        self._stream = stream
+        self._recorder = recorder
+
+    def write(self, data):
+        self._recorder.output_chars += len(data)
+        self._stream.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class CellLog(object):
+
+    """The ``CellStats`` of the last ``maxlen`` commands."""
+
+    def __init__(self, maxlen=1000):
+        self._entries = deque(maxlen=maxlen)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(list(self._entries))
+
+    def __getitem__(self, index):
+        return self._entries[index]
+
+    def append(self, stats):
+        self._entries.append(stats)
+
+    def clear(self):
+        self._entries.clear()
+
+    def export_csv(self, file):
+        """Write the log as CSV to a file object or path."""
+        with _open(file, newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(CellStats._fields)
+            writer.writerows(self)
+
+    def export_json(self, file):
+        """Write the log as JSON list of objects to a file object or path."""
+        with _open(file) as f:
+            json.dump([stats._asdict() for stats in self], f, indent=1)
+
+
+@contextlib.contextmanager
+def _open(file, **kwargs):
+    """Open a path for writing, or use an already opened file object."""
+    if hasattr(file, 'write'):
+        yield file
+    else:
+        with open(file, 'w', **kwargs) as f:
+            yield f
+
+
+def format_stats(stats):
+    """Return a short summary of the ``CellStats``."""
+    parts = ['%s wall' % format_duration(stats.wall),
+             '%s cpu' % format_duration(stats.cpu)]
+    if stats.peak_memory is not None:
+        parts.append('peak %s' % format_size(stats.peak_memory))
+        parts.append('net %s%s' % ('-' if stats.net_memory < 0 else '+',
+                                   format_size(abs(stats.net_memory))))
+    if stats.output_chars:
+        parts.append('%d chars output' % stats.output_chars)
+    return ', '.join(parts)
+
+
+def format_duration(seconds):
+    if seconds < 1e-3:
+        return '%.3g µs' % (seconds * 1e6)
+    if seconds < 1:
+        return '%.3g ms' % (seconds * 1e3)
+    return '%.3g s' % seconds
+
+
+def format_size(size):
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024:
+            return '%.3g %s' % (size, unit)
+        size /= 1024.0
+    return '%.3g GiB' % size
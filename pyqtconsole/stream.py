@@ -1,22 +1,124 @@
 # -*- coding: utf-8 -*-
-from threading import Condition
-from qtpy.QtCore import QObject, Signal
+from collections import deque
+from threading import Condition, Lock
+from qtpy.QtCore import QObject, QTimer, Signal, Slot
 
 
-class Stream(QObject):
+class OutputStream(QObject):
+
+    """Write-only stream that forwards all written data as ``write_event``.
+    The data is not retained."""
 
     write_event = Signal(str)
     flush_event = Signal(str)
     close_event = Signal()
 
+    # Internal signal that arms the coalescing timer within the thread that
+    # owns the stream, no matter which thread is writing:
+    _schedule_event = Signal()
+
     def __init__(self):
-        super(Stream, self).__init__()
+        super(OutputStream, self).__init__()
+        self._pending = deque()
+        self._pending_lock = Lock()
+        self._scheduled = False
+        self._coalesce = False
+        self._max_batch = 0
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._emit_batch)
+        self._schedule_event.connect(self._arm_timer)
+
+    def set_coalescing(self, interval=16, max_batch=1 << 16):
+        """Coalesce writes and emit them as a single ``write_event`` at most
+        every ``interval`` milliseconds, with at most ``max_batch`` characters
+        per event (0 for no limit). Pass ``interval=None`` to emit one event
+        per write again.
+
+        This must be called from the thread that owns the stream."""
+        self.emit_pending()
+        self._coalesce = interval is not None
+        self._max_batch = max_batch or 0
+        if interval is not None:
+            self._timer.setInterval(interval)
+
+    def write(self, data):
+        if not self._coalesce:
+            self.write_event.emit(data)
+            return
+
+        with self._pending_lock:
+            self._pending.append(data)
+            schedule = not self._scheduled
+            self._scheduled = True
+
+        # Only the first write after a flush has to arm the timer, all other
+        # writes until then are appended to the same batch:
+        if schedule:
+            self._schedule_event.emit()
+
+    def _take_batch(self, max_batch):
+        """Remove and return up to ``max_batch`` characters of pending
+        output, and whether there is more output left."""
+        chunks = []
+        size = 0
+        with self._pending_lock:
+            pending = self._pending
+            while pending and (not max_batch or size < max_batch):
+                chunk = pending.popleft()
+                if max_batch and size + len(chunk) > max_batch:
+                    pending.appendleft(chunk[max_batch-size:])
+                    chunk = chunk[:max_batch-size]
+                chunks.append(chunk)
+                size += len(chunk)
+            self._scheduled = more = bool(pending)
+        return ''.join(chunks), more
+
+    @Slot()
+    def _arm_timer(self):
+        if not self._timer.isActive():
+            self._timer.start()
+
+    @Slot()
+    def _emit_batch(self):
+        data, more = self._take_batch(self._max_batch)
+        if more:
+            self._timer.start()
+        if data:
+            self.write_event.emit(data)
+
+    def emit_pending(self):
+        """Emit all coalesced output immediately. Must be called from the
+        thread that owns the stream."""
+        self._timer.stop()
+        data, _ = self._take_batch(0)
+        if data:
+            self.write_event.emit(data)
+
+    def flush(self):
+        self.flush_event.emit('')
+        return ''
+
+    def close(self):
+        self.close_event.emit()
+
+
+class InputStream(OutputStream):
+
+    """Stream whose written data can be read back line by line using
+    ``readline``. Data is kept as a queue of chunks, so writing is O(1)
+    and reading a line is O(length of the line)."""
+
+    def __init__(self):
+        super(InputStream, self).__init__()
         self._line_cond = Condition()
-        self._buffer = ''
+        self._chunks = deque()
+        self._num_lines = 0
 
     def _reset_buffer(self):
-        data = self._buffer
-        self._buffer = ''
+        data = ''.join(self._chunks)
+        self._chunks.clear()
+        self._num_lines = 0
         return data
 
     def _flush(self):
@@ -26,18 +128,32 @@ class Stream(QObject):
 
         return data
 
+    def _pop_line(self):
+        """Remove the first line from the buffer and return it. Requires at
+        least one complete line to be present."""
+        chunks = self._chunks
+        parts = []
+        while True:
+            chunk = chunks.popleft()
+            end = chunk.find('\n') + 1
+            if end:
+                parts.append(chunk[:end])
+                if end < len(chunk):
+                    chunks.appendleft(chunk[end:])
+                break
+            parts.append(chunk)
+        self._num_lines -= 1
+        return ''.join(parts)
+
     def readline(self, timeout=None):
         data = ''
 
         try:
             with self._line_cond:
-                first_linesep = self._buffer.find('\n')
-
                 # Is there already some lines in the buffer, write might have
                 # been called before we read !
-                while first_linesep == -1:
+                while not self._num_lines:
                     notfied = self._line_cond.wait(timeout)
-                    first_linesep = self._buffer.find('\n')
 
                     # We had a timeout, break !
                     if not notfied:
@@ -46,13 +162,8 @@ class Stream(QObject):
                 # Check if there really is something in the buffer after
                 # waiting for line_cond. There might have been a timeout, and
                 # there is still no data available
-                if first_linesep > -1:
-                    data = self._buffer[0:first_linesep+1]
-
-                    if len(self._buffer) > len(data):
-                        self._buffer = self._buffer[first_linesep+1:]
-                    else:
-                        self._buffer = ''
+                if self._num_lines:
+                    data = self._pop_line()
 
         # Tricky RuntimeError !, wait releases the lock and waits for notify
         # and then acquire the lock again !. There might be an exception, i.e
@@ -66,17 +177,21 @@ class Stream(QObject):
 
     def write(self, data):
         with self._line_cond:
-            self._buffer += data
+            if data:
+                self._chunks.append(data)
+                num_lines = data.count('\n')
+                self._num_lines += num_lines
 
-            if '\n' in self._buffer:
-                self._line_cond.notify()
+                if num_lines:
+                    self._line_cond.notify()
 
-            self.write_event.emit(data)
+            super(InputStream, self).write(data)
 
     def flush(self):
         data = self._flush()
         self.flush_event.emit(data)
         return data
 
-    def close(self):
-        self.close_event.emit()
+
+# Deprecated alias for backward compatibility:
+Stream = InputStream
@@ -1,6 +1,19 @@
 # -*- coding: utf-8 -*-
 
 
+def common_prefix(words):
+    """Return the longest common prefix of all words in linear time."""
+    if not words:
+        return ''
+    # The common prefix of all words is the common prefix of the
+    # lexicographically smallest and largest word:
+    first, last = min(words), max(words)
+    for i, char in enumerate(first):
+        if char != last[i]:
+            return first[:i]
+    return first
+
+
 def long_substr(data):
     substr = ''
     if len(data) > 1 and len(data[0]) > 0:
@@ -111,34 +124,16 @@ def columnize(array, displaywidth=80, colsep='  ',
         o['displaywidth'] -= len(o['lineprefix'])
 
     o['displaywidth'] = max(4, o['displaywidth'] - len(o['lineprefix']))
+    lengths = [len(x) for x in array]
     if o['arrange_vertical']:
-        def array_index(nrows, row, col):
-            return nrows*col + row
-        # Try every row count from 1 upwards
-        for nrows in range(1, size):
-            ncols = (size+nrows-1) // nrows
-            colwidths = []
-            totwidth = -len(o['colsep'])
-            for col in range(ncols):
-                # get max column width for this column
-                colwidth = 0
-                for row in range(nrows):
-                    i = array_index(nrows, row, col)
-                    if i >= size:
-                        break
-                    x = array[i]
-                    colwidth = max(colwidth, len(x))
-                colwidths.append(colwidth)
-                totwidth += colwidth + len(o['colsep'])
-                if totwidth > o['displaywidth']:
-                    break
-            if totwidth <= o['displaywidth']:
-                break
+        nrows, colwidths = vertical_layout(
+            lengths, o['displaywidth'], len(o['colsep']))
+        ncols = len(colwidths)
         # The smallest number of rows computed and the
         # max widths for each column has been obtained.
         # Now we just have to format each of the
         # rows.
-        s = ''
+        lines = []
         for row in range(nrows):
             texts = []
             for col in range(ncols):
@@ -155,74 +150,34 @@ def columnize(array, displaywidth=80, colsep='  ',
                     texts[col] = texts[col].ljust(colwidths[col])
                 else:
                     texts[col] = texts[col].rjust(colwidths[col])
-            s += "%s%s%s" % (o['lineprefix'], str(o['colsep'].join(texts)),
-                             o['linesuffix'])
-        return s
+            lines.append("%s%s%s" % (o['lineprefix'],
+                                     str(o['colsep'].join(texts)),
+                                     o['linesuffix']))
+        return ''.join(lines)
     else:
-        def array_index(ncols, row, col):
-            return ncols*(row-1) + col
-        # Try every column count from size downwards
-        colwidths = []
-        for ncols in range(size, 0, -1):
-            # Try every row count from 1 upwards
-            min_rows = (size+ncols-1) // ncols
-            nrows = min_rows - 1
-            while nrows < size:
-                nrows += 1
-                rounded_size = nrows * ncols
-                colwidths = []
-                totwidth = -len(o['colsep'])
-                for col in range(ncols):
-                    # get max column width for this column
-                    colwidth = 0
-                    for row in range(1, nrows+1):
-                        i = array_index(ncols, row, col)
-                        if i >= rounded_size:
-                            break
-                        elif i < size:
-                            x = array[i]
-                            colwidth = max(colwidth, len(x))
-                    colwidths.append(colwidth)
-                    totwidth += colwidth + len(o['colsep'])
-                    if totwidth >= o['displaywidth']:
-                        break
-                if totwidth <= o['displaywidth'] and i >= rounded_size-1:
-                    # Found the right nrows and ncols
-                    # print "right nrows and ncols"
-                    nrows = row
-                    break
-                elif totwidth >= o['displaywidth']:
-                    # print "reduce ncols", ncols
-                    # Need to reduce ncols
-                    break
-            if totwidth <= o['displaywidth'] and i >= rounded_size-1:
-                break
+        nrows, colwidths = horizontal_layout(
+            lengths, o['displaywidth'], len(o['colsep']))
+        ncols = len(colwidths)
         # The smallest number of rows computed and the
         # max widths for each column has been obtained.
         # Now we just have to format each of the
         # rows.
-        s = ''
+        lines = []
         if len(o['array_prefix']) != 0:
             prefix = o['array_prefix']
         else:
             prefix = o['lineprefix']
-        for row in range(1, nrows+1):
-            texts = []
-            for col in range(ncols):
-                i = array_index(ncols, row, col)
-                if i >= size:
-                    break
-                else:
-                    x = array[i]
-                texts.append(x)
+        for row in range(nrows):
+            texts = array[ncols*row:ncols*(row+1)]
             for col in range(len(texts)):
                 if o['ljust']:
                     texts[col] = texts[col].ljust(colwidths[col])
                 else:
                     texts[col] = texts[col].rjust(colwidths[col])
-            s += "%s%s%s" % (prefix, str(o['colsep'].join(texts)),
-                             o['linesuffix'])
+            lines.append("%s%s%s" % (prefix, str(o['colsep'].join(texts)),
+                                     o['linesuffix']))
             prefix = o['lineprefix']
+        s = ''.join(lines)
         if o['arrange_array']:
             colsep = o['colsep'].rstrip()
             colsep_pos = -(len(colsep)+1)
@@ -231,3 +186,55 @@ def columnize(array, displaywidth=80, colsep='  ',
         else:
             s += o['array_suffix']
         return s
+
+
+def _max_columns(lengths, displaywidth, seplen):
+    """Upper bound for the number of columns that can fit in displaywidth."""
+    minwidth = min(lengths) + seplen
+    if minwidth == 0:
+        return len(lengths)
+    return max((displaywidth + seplen) // minwidth, 1)
+
+
+def vertical_layout(lengths, displaywidth, seplen):
+    """Find the smallest number of rows such that items with the given
+    lengths fit into ``displaywidth`` when arranged top to bottom, left to
+    right. Returns the number of rows and the list of column widths. Falls
+    back to a single column if no layout fits."""
+    size = len(lengths)
+    maxcols = _max_columns(lengths, displaywidth, seplen)
+    # Layouts with fewer rows would need more than maxcols columns:
+    for nrows in range(max((size + maxcols - 1) // maxcols, 1), size):
+        ncols = (size + nrows - 1) // nrows
+        colwidths = []
+        totwidth = -seplen
+        for col in range(ncols):
+            colwidth = max(lengths[nrows*col:nrows*(col+1)])
+            colwidths.append(colwidth)
+            totwidth += colwidth + seplen
+            if totwidth > displaywidth:
+                break
+        else:
+            return nrows, colwidths
+    return size, [max(lengths)]
+
+
+def horizontal_layout(lengths, displaywidth, seplen):
+    """Find the largest number of columns such that items with the given
+    lengths fit into ``displaywidth`` when arranged left to right, top to
+    bottom. Returns the number of rows and the list of column widths. Falls
+    back to a single column if no layout fits."""
+    size = len(lengths)
+    maxcols = _max_columns(lengths, displaywidth, seplen)
+    for ncols in range(min(size, maxcols), 0, -1):
+        colwidths = []
+        totwidth = -seplen
+        for col in range(ncols):
+            colwidth = max(lengths[col::ncols])
+            colwidths.append(colwidth)
+            totwidth += colwidth + seplen
+            if totwidth >= displaywidth:
+                break
+        if totwidth <= displaywidth and len(colwidths) == ncols:
+            return (size + ncols - 1) // ncols, colwidths
+    return size, [max(lengths)]
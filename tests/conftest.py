@@ -0,0 +1,26 @@
+import os
+
+import pytest
+
+# Allow running the GUI tests on machines without a display:
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    QtWidgets = pytest.importorskip('qtpy.QtWidgets')
+    app = QtWidgets.QApplication.instance()
+    return app or QtWidgets.QApplication([])
+
+
+@pytest.fixture
+def process_events(qapp):
+    """Return a function that processes Qt events for the given time span."""
+    QtCore = pytest.importorskip('qtpy.QtCore')
+
+    def process_events(msecs=50):
+        timer = QtCore.QElapsedTimer()
+        timer.start()
+        while timer.elapsed() < msecs:
+            qapp.processEvents()
+    return process_events
@@ -0,0 +1,170 @@
+import subprocess
+import sys
+import threading
+
+import pytest
+
+pytest.importorskip('qtpy.QtCore')
+
+from pyqtconsole.autocomplete import (     # noqa: E402
+    CompletionCache, CompletionWorker, COMPLETE_MODE, COMPLETE_TIER)
+from pyqtconsole.completer import namespace_completions     # noqa: E402
+
+
+def test_worker_drops_outdated_requests(process_events):
+    started = threading.Event()
+    proceed = threading.Event()
+    requests = []
+
+    def get_completions(text):
+        requests.append(text)
+        started.set()
+        proceed.wait()
+        return [text + '1', text + '2']
+
+    worker = CompletionWorker(get_completions)
+    results = []
+    worker.done_signal.connect(lambda *args: results.append(args))
+    worker.request(1, 'a')
+    started.wait()
+    for i, text in enumerate(['ab', 'abc', 'abcd'], 2):
+        worker.request(i, text)
+    proceed.set()
+    process_events(200)
+    worker.close()
+    assert requests == ['a', 'abcd']
+    assert results == [(1, ['a1', 'a2']), (4, ['abcd1', 'abcd2'])]
+
+
+def test_completion_cache():
+    calls = []
+    words = ['linalg', 'linspace', 'load', 'log']
+
+    def get_completions(line):
+        calls.append(line)
+        prefix = line.rsplit('.', 1)[-1]
+        return [word for word in words if word.startswith(prefix)]
+
+    cache = CompletionCache(maxsize=2)
+    assert cache.get('np.l', 0, get_completions) == words
+    assert cache.get('np.lin', 0, get_completions) == ['linalg', 'linspace']
+    assert cache.get('np.lina', 0, get_completions) == ['linalg']
+    assert cache.get('np.lo', 0, get_completions) == ['load', 'log']
+    assert calls == ['np.l']
+    assert (cache.hits, cache.misses) == (3, 1)
+
+    # namespace has changed:
+    assert cache.get('np.lo', 1, get_completions) == ['load', 'log']
+    assert calls == ['np.l', 'np.lo']
+
+    # shorter prefix, and eviction of least recently used entry:
+    assert cache.get('np.', 1, get_completions) == words
+    assert cache.get('x.', 1, get_completions) == words
+    assert cache.get('np.l', 0, get_completions) == words
+    assert calls == ['np.l', 'np.lo', 'np.', 'x.', 'np.l']
+    assert (cache.hits, cache.misses) == (3, 5)
+
+
+def test_completion_cache_private_names():
+    ns = {'a': type('A', (), {'_y': 1, 'z': 2})()}
+
+    def get_completions(line):
+        return namespace_completions(line, ns)
+
+    cache = CompletionCache()
+    assert '_y' not in cache.get('a.', 0, get_completions)
+    assert cache.get('a._', 0, get_completions) == ['_y']
+    assert '__init__' in cache.get('a.__', 0, get_completions)
+    assert cache.get('a.__dic', 0, get_completions) == ['__dict__']
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_console_completions(qapp):
+    from pyqtconsole.console import PythonConsole
+    console = PythonConsole(locals={'value': 1})
+    try:
+        assert 'real' in console.get_completions('value.re')
+        assert console.get_completions('value.rea') == ['real']
+        assert console.completion_cache.hits == 1
+        console.push_local_ns('value', 1j)
+        assert 'imag' in console.get_completions('value.i')
+    finally:
+        console.exit()
+
+
+def test_completion_tiers(qapp):
+    from pyqtconsole.console import PythonConsole
+    console = PythonConsole(locals={'value': 1})
+    try:
+        stats = console.completion_stats
+        assert console.get_completions('value.rea') == ['real']
+        assert stats[COMPLETE_TIER.NAMESPACE][0] == 1
+        assert stats[COMPLETE_TIER.JEDI][0] == 0
+        # complex expressions are deferred to jedi:
+        assert 'upper' in console.get_completions('str(value).up')
+        assert stats[COMPLETE_TIER.JEDI][0] == 1
+
+        console.set_completion_tier(COMPLETE_TIER.NAMESPACE)
+        assert console.get_completions('str(value).up') == []
+        assert stats[COMPLETE_TIER.JEDI][0] == 1
+
+        console.set_completion_tier(COMPLETE_TIER.JEDI)
+        assert console.get_completions('value.rea') == ['real']
+        assert stats[COMPLETE_TIER.NAMESPACE][0] == 3
+        assert stats[COMPLETE_TIER.JEDI][0] == 2
+    finally:
+        console.exit()
+
+
+def test_completer_is_reused(qapp, process_events):
+    from qtpy.QtWidgets import QCompleter
+    from pyqtconsole.console import PythonConsole
+    console = PythonConsole()
+    try:
+        console.set_auto_complete_mode(COMPLETE_MODE.DROPDOWN)
+        console.show()
+        console.insert_input_text('x')
+        auto_complete = console.auto_complete
+        completer = auto_complete.completer
+        model = completer.model()
+        for words in (['xa', 'xb', 'xc'], ['xd', 'xe']):
+            auto_complete.show_completion_suggestions(words)
+            process_events()
+            assert auto_complete.completer is completer
+            assert model.stringList() == words
+            assert auto_complete.completing()
+        assert len(auto_complete.findChildren(QCompleter)) == 1
+        popup = completer.popup()
+        popup.setCurrentIndex(completer.completionModel().index(0, 0))
+        auto_complete.complete()
+        assert console.input_buffer() == 'xd'
+        assert not auto_complete.completing()
+    finally:
+        console.exit()
+
+
+def test_jedi_is_imported_lazily():
+    code = 'import sys, pyqtconsole.console; print("jedi" in sys.modules)'
+    output = subprocess.check_output([sys.executable, '-c', code])
+    assert output.strip() == b'False'
+
+
+def test_warm_up_completion(qapp, process_events, monkeypatch):
+    import os
+    import pyqtconsole.console
+    from pyqtconsole.console import PythonConsole
+    calls = []
+    monkeypatch.setattr(pyqtconsole.console, 'import_jedi',
+                        lambda: calls.append('import'))
+    monkeypatch.setattr(pyqtconsole.console, 'jedi_completions',
+                        lambda line, ns: calls.append(line))
+    console = PythonConsole(locals={'os': os, 'value': 1})
+    try:
+        done = threading.Event()
+        console.warm_up_completion(0)
+        process_events()
+        console.auto_complete.call_in_background(done.set)
+        assert done.wait(5)
+        assert calls == ['import', 'os.']
+    finally:
+        console.exit()
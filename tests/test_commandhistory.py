@@ -0,0 +1,167 @@
+import errno
+import random
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('qtpy.QtCore')
+
+from pyqtconsole import commandhistory          # noqa: E402
+from pyqtconsole.commandhistory import (        # noqa: E402
+    CommandHistory, HistoryFile, HistoryIndex)
+
+ENTRIES = ['x = 1', 'for i in range(3):\n    print("\\n", i)\n', u'\xe9']
+
+
+def test_history_file(tmpdir):
+    path = str(tmpdir.join('history'))
+    first = HistoryFile(path)
+    first.chunk_size = 7
+    assert list(first.entries()) == []
+    second = HistoryFile(path)
+    for entry in ENTRIES:
+        first.append(entry)
+        second.append(entry + '!')
+    expect = [e for entry in ENTRIES for e in (entry, entry + '!')][::-1]
+    assert list(first.entries()) == expect
+    # ignore incomplete records:
+    with open(path, 'ab') as f:
+        f.write(b'"abc')
+    assert list(first.entries()) == expect
+    assert list(HistoryFile(path, maxsize=2).entries()) == expect[:2]
+
+
+def test_history_file_compact(tmpdir):
+    path = str(tmpdir.join('history'))
+    history = HistoryFile(path, maxsize=10)
+    history.compact()
+    for i in range(100):
+        history.append(str(i))
+    history.compact()
+    assert list(HistoryFile(path).entries()) == [
+        str(i) for i in range(99, 89, -1)]
+    with open(path) as f:
+        assert len(f.readlines()) == 10
+
+
+@pytest.mark.skipif(commandhistory.fcntl is None, reason="requires flock()")
+def test_history_file_compact_keeps_concurrent_appends(tmpdir, monkeypatch):
+    path = str(tmpdir.join('history'))
+    history = HistoryFile(path, maxsize=10)
+    for i in range(100):
+        history.append(str(i))
+    other = threading.Thread(target=HistoryFile(path).append, args=('new',))
+    replace = commandhistory._replace
+
+    def slow_replace(src, dst):
+        # another console appends while the file is being rewritten:
+        other.start()
+        time.sleep(0.1)
+        replace(src, dst)
+
+    monkeypatch.setattr(commandhistory, '_replace', slow_replace)
+    history.compact()
+    other.join()
+    assert list(HistoryFile(path).entries()) == ['new'] + [
+        str(i) for i in range(99, 89, -1)]
+
+
+@pytest.mark.skipif(commandhistory.fcntl is None, reason="requires flock()")
+def test_history_file_without_locks(tmpdir, monkeypatch):
+    def flock(fd, operation):
+        raise OSError(errno.ENOLCK, 'No locks available')
+
+    monkeypatch.setattr(commandhistory.fcntl, 'flock', flock)
+    path = str(tmpdir.join('history'))
+    history = HistoryFile(path, maxsize=2)
+    for entry in ENTRIES:
+        history.append(entry)
+    history.compact()
+    assert list(history.entries()) == ENTRIES[:0:-1]
+
+
+def test_history_file_errors(qapp, tmpdir):
+    path = str(tmpdir.join('missing', 'history'))
+    history = CommandHistory(None)
+    history.set_file(path)
+    history.add('x = 1')
+    history.add('y = 2')
+    assert history.search('') == 1
+    history.close()
+
+
+def test_history_index_matches_linear_search():
+    rng = random.Random(0)
+    index = HistoryIndex()
+    index.block_size = 5
+    entries = []
+    for _ in range(1000):
+        if rng.random() < 0.5:
+            entry = ''.join(rng.choice('abc\n') for _ in range(rng.randrange(8)))
+            index.add(entry)
+            entries.append(entry)
+        else:
+            query = ''.join(rng.choice('abc') for _ in range(rng.randrange(4)))
+            stop = rng.randrange(len(entries) + 2)
+            expect = next((i for i in reversed(range(min(stop, len(entries))))
+                           if query in entries[i]), -1)
+            assert index.find(query, stop) == expect
+
+
+def test_console_history_file(qapp, tmpdir):
+    from pyqtconsole.console import PythonConsole
+    path = str(tmpdir.join('history'))
+    HistoryFile(path).append('old')
+    console = PythonConsole()
+    try:
+        console.set_history_file(path, maxsize=2)
+        assert console.command_history._cmd_history == []
+        console.process_input('x = 1')
+        for expect in ['x = 1', 'old', 'old']:
+            console.command_history.dec(console.input_buffer())
+            assert console.input_buffer() == expect
+    finally:
+        console.exit()
+    assert list(HistoryFile(path).entries()) == ['x = 1', 'old']
+
+
+def test_history_index_startswith():
+    rng = random.Random(0)
+    index = HistoryIndex()
+    entries = []
+    for _ in range(500):
+        entry = ''.join(rng.choice('ab') for _ in range(rng.randrange(5)))
+        index.add(entry)
+        entries.append(entry)
+        if rng.random() < 0.2:
+            prefix = entry[:rng.randrange(len(entry) + 1)]
+            assert index.startswith(prefix) == [
+                i for i, e in enumerate(entries) if e.startswith(prefix)]
+
+
+def test_prefix_navigation(qapp):
+    from pyqtconsole.console import PythonConsole
+    console = PythonConsole()
+    history = console.command_history
+    try:
+        for entry in ['plot(1)', 'x = 1', 'plot(2)', 'plot(2)', 'y', 'plot(2)']:
+            history.add(entry)
+        console.insert_input_text('plot(')
+        for expect in ['plot(2)', 'plot(1)', 'plot(1)']:
+            history.dec(console.input_buffer())
+            assert console.input_buffer() == expect
+        for expect in ['plot(2)', 'plot(', 'plot(']:
+            history.inc()
+            assert console.input_buffer() == expect
+        console.clear_input_buffer()
+        for expect in ['plot(2)', 'y', 'plot(2)', 'x = 1']:
+            history.dec(console.input_buffer())
+            assert console.input_buffer() == expect
+        history.add('z')
+        console.clear_input_buffer()
+        console.insert_input_text('q')
+        history.dec(console.input_buffer())
+        assert console.input_buffer() == 'q'
+    finally:
+        console.exit()
@@ -0,0 +1,46 @@
+from pyqtconsole.completer import namespace_completions
+
+
+class Example(object):
+
+    calls = 0
+    value = 1
+
+    def __init__(self):
+        self.child = self
+
+    @property
+    def prop(self):
+        Example.calls += 1
+        return self
+
+    @staticmethod
+    def static():
+        pass
+
+    def method(self):
+        pass
+
+
+def test_namespace_completions():
+    ns = {'example': Example(), 'exact': 1}
+    assert namespace_completions('exa', ns) == ['exact', 'example']
+    assert namespace_completions('if exc', ns) == ['except']
+    assert namespace_completions('x = ab', ns) == ['abs']
+    assert namespace_completions('example.v', ns) == ['value']
+    assert namespace_completions('example.child.child.me', ns) == ['method']
+    assert namespace_completions('example.static.__na', ns) == ['__name__']
+    assert 'prop' in namespace_completions('example.', ns)
+    assert '__init__' not in namespace_completions('example.', ns)
+    assert '__init__' not in namespace_completions('example._', ns)
+    assert '__init__' in namespace_completions('example.__', ns)
+
+
+def test_namespace_completions_are_safe():
+    ns = {'example': Example()}
+    assert namespace_completions('example.prop.v', ns) is None
+    assert namespace_completions('example.method().v', ns) is None
+    assert namespace_completions('[example][0].v', ns) is None
+    assert namespace_completions('"abc".up', ns) is None
+    assert namespace_completions('missing.v', ns) is None
+    assert Example.calls == 0
@@ -0,0 +1,133 @@
+import pytest
+
+pytest.importorskip('qtpy.QtWidgets')
+
+from pyqtconsole.console import PythonConsole   # noqa: E402
+
+
+@pytest.fixture
+def console(qapp):
+    console = PythonConsole()
+    yield console
+    console.exit()
+
+
+def test_scrollback_limit_lines(console):
+    console.set_scrollback_limit(lines=10)
+    for i in range(100):
+        console._insert_output_text('%d\n' % i)
+    console.insert_input_text('x = 1')
+    doc = console.edit.document()
+    assert doc.blockCount() == 10
+    assert len(console._prompt_doc) == 10
+    assert console.edit.toPlainText().startswith('91\n')
+    assert console.input_buffer() == 'x = 1'
+
+
+def test_scrollback_limit_keeps_prompts_aligned(console):
+    console.set_scrollback_limit(chars=50)
+    for i in range(20):
+        console._insert_output_text('%d\n' % i, prompt='OUT[%d]: ' % i)
+    console._show_ps()
+    doc = console.edit.document()
+    assert doc.characterCount() <= 50
+    console.insert_input_text('abc')
+    assert len(console._prompt_doc) == doc.blockCount()
+    first = doc.firstBlock().text()
+    assert console._get_prompt_text(0) == 'OUT[%s]: ' % first
+    assert console.input_buffer() == 'abc'
+
+
+def test_input_buffer(console):
+    console._insert_output_text('some\noutput')
+    console.insert_input_text(u'if x:\n    y =\u00a01')
+    text = console.edit.toPlainText()
+    assert console.input_buffer() == text[console._prompt_pos:]
+    assert console.input_buffer() == 'if x:\n    y = 1'
+    console._move_cursor(console._prompt_pos + 10)
+    assert console._get_line_until_cursor() == '    '
+    assert console._get_line_after_cursor() == 'y = 1'
+    console._move_cursor(console._prompt_pos + 2)
+    assert console._get_line_until_cursor() == 'if'
+
+
+def test_prompt_layout_cache(console):
+    pbar = console.pbar
+    pbar.cache_size = 4
+    layout = pbar.get_layout('IN [1]: ')
+    assert [s.text() for _, s, _ in layout] == ['IN [', '1', ']', ': ']
+    assert pbar.get_layout('IN [1]: ') is layout
+    for i in range(10):
+        pbar.get_layout('OUT[%d]: ' % i)
+    assert len(pbar._layouts) == 4
+    assert pbar.get_layout('IN [1]: ') is not layout
+
+
+def test_output_is_not_highlighted(console):
+    console._insert_output_text('def foo(): return 1\n')
+    console.insert_input_text('def foo(): return 1')
+    doc = console.edit.document()
+    output = doc.findBlockByNumber(0)
+    current = doc.lastBlock()
+    assert output.userState() == console.highlighter.OUTPUT
+    assert not output.layout().formats()
+    assert current.userState() != console.highlighter.OUTPUT
+    assert current.layout().formats()
+    console.highlighter.rehighlight()
+    assert not output.layout().formats()
+    assert current.layout().formats()
+
+
+def test_reverse_history_search(console):
+    from qtpy.QtCore import Qt
+    from qtpy.QtTest import QTest
+    for entry in ['print(1)', 'x = 2', 'print(3)', 'for i in x:\n    y']:
+        console.command_history.add(entry)
+    line = console.edit.document().blockCount() - 1
+    console.insert_input_text('abc')
+
+    def key(key, modifiers=Qt.NoModifier):
+        QTest.keyClick(console.edit, key, modifiers)
+
+    key(Qt.Key_R, modifiers=Qt.ControlModifier)
+    assert console._prompt_doc[line] == "(reverse-i-search)`': "
+    QTest.keyClicks(console.edit, 'pri')
+    assert console.input_buffer() == 'print(3)'
+    assert console._prompt_doc[line] == "(reverse-i-search)`pri': "
+    key(Qt.Key_R, modifiers=Qt.ControlModifier)
+    assert console.input_buffer() == 'print(1)'
+    key(Qt.Key_R, modifiers=Qt.ControlModifier)
+    assert console.input_buffer() == 'print(1)'
+    assert console._prompt_doc[line] == "(failed reverse-i-search)`pri': "
+    key(Qt.Key_Backspace)
+    assert console.input_buffer() == 'print(3)'
+    QTest.keyClicks(console.edit, 'nt(3')
+    assert console.input_buffer() == 'print(3)'
+    key(Qt.Key_Escape)
+    assert console.input_buffer() == 'abc'
+    assert console._prompt_doc[line] == 'IN [0]: '
+
+    key(Qt.Key_R, modifiers=Qt.ControlModifier)
+    QTest.keyClicks(console.edit, 'in x')
+    assert console.input_buffer() == 'for i in x:\n    y'
+    key(Qt.Key_End)
+    assert console._search_query is None
+    assert console._prompt_doc[line] == 'IN [0]: '
+    assert console.input_buffer() == 'for i in x:\n    y'
+
+
+def test_reverse_history_search_file(console, tmpdir):
+    from qtpy.QtCore import Qt
+    from qtpy.QtTest import QTest
+    from pyqtconsole.commandhistory import HistoryFile
+    path = str(tmpdir.join('history'))
+    history = HistoryFile(path)
+    for i in range(200):
+        history.append('old%d' % i)
+    console.set_history_file(path)
+    console.command_history.add('new')
+    QTest.keyClick(console.edit, Qt.Key_R, Qt.ControlModifier)
+    QTest.keyClicks(console.edit, 'old')
+    assert console.input_buffer() == 'old199'
+    QTest.keyClick(console.edit, Qt.Key_R, Qt.ControlModifier)
+    assert console.input_buffer() == 'old198'
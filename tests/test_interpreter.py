@@ -0,0 +1,122 @@
+import ast
+import dis
+import inspect
+import sys
+import time
+from codeop import CommandCompiler
+from collections import namedtuple
+
+import pytest
+
+pytest.importorskip('qtpy.QtCore')
+
+from pyqtconsole.interpreter import (      # noqa: E402
+    format_result, compile_multi, CompileCache)
+
+
+def test_format_result_matches_repr():
+    recursive = [1, 2]
+    recursive.append(recursive)
+    Point = namedtuple('Point', ['x', 'y'])
+    values = [
+        0, 1.5, None, 'abc', u'ä\n', b'x', (), (1,), [], [1, [2, (3,)]],
+        {}, {'b': 1, 'a': {2: 3}}, set(), {3, 1, 2}, frozenset([1]),
+        recursive, Point(1, 2), [Point(3, 4)],
+    ]
+    for value in values:
+        assert format_result(value) == repr(value)
+
+
+def test_format_result_truncates_large_objects():
+    value = list(range(10 ** 7))
+    start = time.time()
+    text = format_result(value, maxlength=100)
+    assert time.time() - start < 1
+    assert text == repr(value[:50])[:100] + '...'
+
+
+def test_format_result_shares_budget():
+    nested = [list(range(2000)) for i in range(2000)]
+    strings = ['x' * 10000] * 5000
+    start = time.time()
+    assert format_result(nested, 1000) == repr(nested[:1])[:1000] + '...'
+    assert format_result(strings, 1000) == repr(strings[:1])[:1000] + '...'
+    assert time.time() - start < 0.1
+    # shared (but not recursive) references at each level:
+    deep, expected = [], '[]'
+    for i in range(10):
+        deep = [deep, {'a': (deep,)}]
+        expected = "[%s, {'a': (%s,)}]" % (expected, expected)
+    assert format_result(deep, 10 ** 6) == expected
+
+
+def test_format_result_timeout():
+    class Slow(object):
+        def __repr__(self):
+            time.sleep(1)
+            return 'slow'
+
+    class Broken(object):
+        def __repr__(self):
+            raise ValueError
+
+    assert format_result(Slow(), timeout=0.01) == \
+        '<Slow object: repr() timed out after 0.01s>'
+    assert format_result([1], timeout=1) == '[1]'
+    with pytest.raises(ValueError):
+        format_result(Broken(), timeout=1)
+
+
+def lineno(code):
+    return min(line for offset, line in dis.findlinestarts(code) if line)
+
+
+def test_compile_multi():
+    def compile_source(source):
+        result = compile_multi(compiler, source, '<input>', 'multi', cache)
+        return result and [(mode, lineno(code)) for code, mode in result]
+
+    compiler = CommandCompiler()
+    cache = CompileCache()
+    assert compile_source('') == []
+    assert compile_source('x = (') is None
+    assert compile_source('x = (\n1)\ny') == [('exec', 1), ('eval', 3)]
+    assert compile_source('x = 1\nif x:\n    y') is None
+    assert compile_source('x = 1\nif x:\n    y\n') == [
+        ('exec', 1), ('exec', 2)]
+    assert compile_source('x = 1\nif x:\n    y\nelse:') is None
+    assert compile_source('x = 1\nif x:\n    y\nelse:\n    z\n') == [
+        ('exec', 1), ('exec', 2)]
+    with pytest.raises(SyntaxError) as exc:
+        compile_source('x = 1\nif x:\n    y\n  z\n')
+    assert exc.value.lineno == 4
+    with pytest.raises(SyntaxError) as exc:
+        compile_source('x = 1\nfrom __future__ import division')
+    assert exc.value.lineno == 2
+    assert compile_source('"""doc"""\nfrom __future__ import division') == [
+        ('eval', 1), ('exec', 2)]
+
+
+def test_compile_multi_reuses_code():
+    compiler = CommandCompiler()
+    cache = CompileCache()
+    source = 'x = 1\n\n@dec\ndef f():\n    pass'
+    assert compile_multi(compiler, source, '<input>', 'multi', cache) is None
+    codes = compile_multi(compiler, source + '\n', '<input>', 'multi', cache)
+    first, second = [code for code, mode in codes]
+    assert lineno(second) == 3
+    codes = compile_multi(compiler, source + '\n\ny', '<input>', 'multi', cache)
+    assert codes[0][0] is first
+    assert codes[1][0] is not second
+    assert lineno(codes[1][0]) == 3
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8),
+                    reason='top-level await requires python 3.8')
+def test_compile_multi_top_level_await():
+    source = 'x = await f()\nawait g(x)\ny = 1'
+    codes = compile_multi(CommandCompiler(), source, '<input>', 'multi',
+                          flags=ast.PyCF_ALLOW_TOP_LEVEL_AWAIT)
+    assert [mode for code, mode in codes] == ['exec', 'eval', 'exec']
+    assert [bool(code.co_flags & inspect.CO_COROUTINE)
+            for code, mode in codes] == [True, True, False]
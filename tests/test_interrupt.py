@@ -0,0 +1,186 @@
+import cProfile
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('qtpy.QtCore')
+
+from pyqtconsole.interpreter import PythonInterpreter   # noqa: E402
+from pyqtconsole.interrupt import Execution             # noqa: E402
+
+
+class Output(list):
+
+    def write(self, data):
+        self.append(data)
+
+
+@pytest.fixture
+def interpreter():
+    return PythonInterpreter(None, Output())
+
+
+def execute(interpreter, source):
+    interpreter.exec_(interpreter.compile(source + '\n', '<input>', 'multi'))
+
+
+def interrupt_later(interpreter, delay=0.1):
+    """Interrupt the command from another thread once it has executed for
+    ``delay`` seconds. Returns a list that receives the time of the
+    interrupt."""
+    interrupted = []
+
+    def target():
+        while not interpreter.executing():
+            time.sleep(0.001)
+        time.sleep(delay)
+        interrupted.append(time.time())
+        assert interpreter.interrupt()
+
+    thread = threading.Thread(target=target)
+    thread.daemon = True
+    thread.start()
+    return interrupted
+
+
+def test_execution_states():
+    execution = Execution()
+    assert not execution.interrupt()
+    execution.start(cancel=lambda: cancelled.append(1))
+    cancelled = []
+    assert execution.executing()
+    assert execution.interrupt()
+    assert cancelled == [1]
+    execution.finish()
+    execution.finish()
+    assert not execution.executing()
+    assert not execution.interrupt()
+    assert cancelled == [1]
+
+
+@pytest.mark.skipif(not hasattr(signal, 'pthread_kill'),
+                    reason='requires pthread_kill')
+@pytest.mark.parametrize('source', [
+    'while True:\n    pass',
+    'import time\ntime.sleep(30)',
+    'import os\nos.read(fd, 1)',
+])
+def test_interrupt_main_thread(interpreter, source):
+    read_fd, write_fd = os.pipe()
+    interpreter.locals['fd'] = read_fd
+    try:
+        interrupted = interrupt_later(interpreter)
+        execute(interpreter, source)
+        latency = time.time() - interrupted[0]
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+    assert 'KeyboardInterrupt\n' in interpreter.stdout
+    assert latency < 0.5
+    # late interrupts are dropped:
+    assert not interpreter.interrupt()
+    execute(interpreter, 'x = 1')
+    assert interpreter.locals['x'] == 1
+
+
+def test_interrupt_other_thread(interpreter):
+    thread = threading.Thread(
+        target=execute, args=(interpreter, 'while True:\n    x = 1'))
+    thread.start()
+    while not interpreter.executing():
+        time.sleep(0.001)
+    time.sleep(0.1)
+    start = time.time()
+    assert interpreter.interrupt()
+    thread.join(5)
+    latency = time.time() - start
+    assert not thread.is_alive()
+    assert 'KeyboardInterrupt\n' in interpreter.stdout
+    assert latency < 0.5
+    assert not interpreter.interrupt()
+
+
+@pytest.mark.parametrize('loop', [
+    'while flag: pass',
+    'while flag:\n            x = 1',
+])
+def test_interrupt_other_thread_runs_handlers(interpreter, loop):
+    # python 3.12 and 3.13 used to skip the handlers for one line loops:
+    interpreter.locals['flag'] = True
+    thread = threading.Thread(target=execute, args=(interpreter, (
+        'log = []\n'
+        'try:\n'
+        '    try:\n'
+        '        %s\n'
+        '    finally:\n'
+        '        log.append("finally")\n'
+        'except KeyboardInterrupt:\n'
+        '    log.append("except")\n') % loop))
+    thread.start()
+    while not interpreter.executing():
+        time.sleep(0.001)
+    time.sleep(0.1)
+    assert interpreter.interrupt()
+    thread.join(5)
+    interpreter.locals['flag'] = False
+    thread.join()
+    assert interpreter.locals['log'] == ['finally', 'except']
+    assert 'KeyboardInterrupt\n' not in interpreter.stdout
+
+
+def test_no_pending_interrupt_after_finish(interpreter):
+    thread = threading.Thread(
+        target=execute, args=(interpreter, 'while True:\n    x = 1'))
+    thread.start()
+    while not interpreter.executing():
+        time.sleep(0.001)
+    assert interpreter.interrupt()
+    thread.join(5)
+    # a left over interrupt request used to hang cProfile on python 3.11:
+    profiler = threading.Thread(target=cProfile.runctx, args=(
+        '[sum(range(i)) for i in range(100)]', {}, {}))
+    profiler.daemon = True
+    profiler.start()
+    profiler.join(5)
+    assert not profiler.is_alive()
+
+
+def test_interrupt_from_executing_thread(interpreter):
+    interpreter.locals['interpreter'] = interpreter
+    execute(interpreter, 'result = interpreter.interrupt()')
+    assert interpreter.locals['result'] is False
+
+
+def test_idle_sigint_goes_to_previous_handler(interpreter):
+    calls = []
+    previous = signal.signal(signal.SIGINT, lambda *args: calls.append(1))
+    try:
+        execute(interpreter, 'x = 1')
+        os.kill(os.getpid(), signal.SIGINT)
+        time.sleep(0.01)
+        assert calls == [1]
+    finally:
+        signal.signal(signal.SIGINT, previous)
+
+
+def test_console_interrupts_thread(qapp):
+    pytest.importorskip('qtpy.QtWidgets')
+    from pyqtconsole.console import PythonConsole
+    console = PythonConsole()
+    console.eval_in_thread()
+    try:
+        console.process_input('while True:\n    pass\n')
+        while not console._executing():
+            qapp.processEvents()
+        start = time.time()
+        console._handle_ctrl_c()
+        while console._executing():
+            assert time.time() - start < 5
+            qapp.processEvents()
+        qapp.processEvents()
+        assert 'KeyboardInterrupt' in console.edit.toPlainText()
+    finally:
+        console.exit()
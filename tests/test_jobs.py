@@ -0,0 +1,120 @@
+import sys
+import time
+
+import pytest
+
+pytest.importorskip('qtpy.QtCore')
+
+if sys.version_info < (3, 7):
+    pytest.skip('background jobs require python 3.7', allow_module_level=True)
+
+from pyqtconsole.jobs import JobManager, background_source   # noqa: E402
+
+
+class Interpreter(object):
+
+    def __init__(self, **locals):
+        self.locals = locals
+        self.namespace_generation = 0
+
+
+class Output(list):
+
+    def write(self, data):
+        self.append(data)
+
+
+@pytest.fixture
+def manager(qapp):
+    manager = JobManager(Interpreter(y=21), Output(), max_workers=2)
+    yield manager
+    manager.shutdown()
+
+
+def wait_finished(qapp, job, timeout=20):
+    start = time.time()
+    while job.finished is None:
+        assert time.time() - start < timeout
+        qapp.processEvents()
+        time.sleep(0.001)
+
+
+def test_background_source():
+    assert background_source('x = f() &') == 'x = f() '
+    assert background_source('for i in x:\n    f(i)\n&\n') == \
+        'for i in x:\n    f(i)\n'
+    assert background_source('x = f()') is None
+    assert background_source('x = f()  # &') is None
+
+
+def test_job_output_and_variables(qapp, manager):
+    job = manager.submit('x = y * 2\nprint("a\\nb", end="")\nx')
+    assert manager.wait(job.id, timeout=20)
+    wait_finished(qapp, job)
+    output = ''.join(manager.stdout)
+    assert output == '[1] a\n[1] b\n[1] done  x = y * 2\n' \
+        'print("a\\nb", end="")\nx\n[1] 42\n'
+    assert manager.interpreter.locals['x'] == 42
+    assert manager.interpreter.namespace_generation == 1
+    assert repr(manager).startswith('[1] done ')
+
+
+def test_job_errors(qapp, manager):
+    job = manager.submit('import os\n1 / 0')
+    wait_finished(qapp, job)
+    output = ''.join(manager.stdout)
+    assert '[1] ZeroDivisionError: division by zero\n' in output
+    assert job.status == 'failed'
+    assert 'os' not in manager.interpreter.locals
+    with pytest.raises(SyntaxError):
+        manager.submit('x = (')
+
+
+def test_kill_job(qapp, manager):
+    loop = manager.submit('import time\nwhile True:\n    time.sleep(0.01)')
+    other = manager.submit('import time\ntime.sleep(0.5)\nz = 1')
+    start = time.time()
+    while loop.pid is None:
+        assert time.time() - start < 20
+        time.sleep(0.01)
+    manager.kill(loop.id)
+    wait_finished(qapp, loop)
+    assert loop.status == 'killed'
+    wait_finished(qapp, other)
+    assert other.status == 'done'
+    assert manager.interpreter.locals['z'] == 1
+
+
+def test_console_background_job(qapp):
+    from pyqtconsole.console import PythonConsole
+    console = PythonConsole()
+    try:
+        console.process_input('w = 2 * 3 &')
+        job = console.jobs[1]
+        assert console.interpreter.locals['jobs'] is console.jobs
+        wait_finished(qapp, job)
+        assert console.interpreter.locals['w'] == 6
+        console.process_input('v = 1  # &')
+        assert list(console.jobs) == [job]
+    finally:
+        console.exit()
+
+
+def test_job_output_keeps_input(qapp):
+    from pyqtconsole.console import PythonConsole
+    console = PythonConsole()
+    try:
+        console.process_input('import time; time.sleep(0.5); 42 &')
+        job = console.jobs[1]
+        console.insert_input_text('pri')
+        wait_finished(qapp, job)
+        qapp.processEvents()
+        assert console.input_buffer() == 'pri'
+        assert console.cursor_offset() == 3
+        lines = console.edit.toPlainText().split('\n')
+        assert lines[-3:] == [
+            '[1] done  import time; time.sleep(0.5); 42', '[1] 42', 'pri']
+        assert console._prompt_doc[-1] == 'IN [1]: '
+        assert console._prompt_doc[-2] == ''
+    finally:
+        console.exit()
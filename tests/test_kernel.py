@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+pytest.importorskip('qtpy.QtWidgets')
+
+from pyqtconsole.console import PythonConsole   # noqa: E402
+
+
+@pytest.fixture
+def console(qapp):
+    console = PythonConsole()
+    console.eval_in_subprocess()
+    yield console
+    console.exit()
+
+
+@pytest.fixture
+def run(console, qapp):
+    """Return a function that executes the source in the kernel and waits
+    until it has finished."""
+    def run(source, interrupt_after=None, timeout=10):
+        console.process_input(source)
+        start = time.time()
+        while console._executing():
+            elapsed = time.time() - start
+            assert elapsed < timeout
+            if interrupt_after is not None and elapsed > interrupt_after:
+                console._handle_ctrl_c()
+                interrupt_after = None
+            qapp.processEvents()
+            time.sleep(0.001)
+        qapp.processEvents()
+        return console.edit.toPlainText()
+    return run
+
+
+def test_kernel_executes_code(console, run):
+    assert console.process_input('for i in range(3):') is None
+    assert console._more
+    assert run('x = 6 * 7\nprint("hello")\nx').endswith('hello\n42\n\n')
+    assert 'SyntaxError' in run('x = )')
+    console.push_local_ns('y', [1, 2])
+    assert run('y + [x]').endswith('[1, 2, 42]\n\n')
+
+
+def test_kernel_completions(console, run):
+    run('value = 1')
+    assert console.get_completions('val') == ['value']
+    assert console.get_completions('value.re') == ['real']
+
+
+def test_kernel_interrupt(console, run):
+    text = run('import time\nwhile True:\n    time.sleep(0.01)\n',
+               interrupt_after=0.5)
+    assert 'KeyboardInterrupt' in text
+    assert run('1 + 2').endswith('\n3\n\n')
+
+
+def test_kernel_interrupts_sleep(console, run):
+    start = time.time()
+    text = run('import time\ntime.sleep(100)', interrupt_after=0.5)
+    assert time.time() - start < 5
+    assert 'KeyboardInterrupt' in text
+
+
+def test_kernel_restarts_when_it_dies(console, run):
+    run('value = 1')
+    run('import os\nos._exit(3)')
+    assert 'Kernel died with exit code 3' in console.edit.toPlainText()
+    assert 'NameError' in run('value')
+    run('value = 2')
+    assert console.get_completions('valu') == ['value']
+
+
+def test_kernel_cell_stats(console, run):
+    log = console.enable_cell_stats(memory=True)
+    assert run('data = [0] * 100000\ndata[0]').startswith('0  # ')
+    stats = log[0]
+    assert stats.source == 'data = [0] * 100000\ndata[0]'
+    assert stats.status == 'ok'
+    assert stats.net_memory >= 800000
+    console.restart_kernel()
+    run('print("hello")')
+    assert log[1].output_chars == 6
+
+
+def test_kernel_prun(console, run):
+    assert console.process_input('%prun -l 3\nfor i in range(3):\n') is None
+    assert console._more
+    text = run('%prun -l 3\nfor i in range(3):\n    x = sum(range(10))\n\n')
+    assert 'function calls in' in text
+    assert run('x').endswith('\n45\n\n')
@@ -0,0 +1,88 @@
+import glob
+import io
+import keyword
+import os
+import tokenize
+
+import pytest
+
+from pyqtconsole.lexer import lex_line, NORMAL, TRIPLE_DOUBLE
+
+
+def lex_source(source):
+    """Return the tokens for each line of source code using ``lex_line``."""
+    result = []
+    state = NORMAL
+    for row, line in enumerate(source.splitlines(), 1):
+        tokens, state = lex_line(line, state)
+        result += [(row, start, length, kind)
+                   for start, length, kind in tokens if length]
+    return result
+
+
+def tokenize_source(source):
+    """Return the expected tokens for each line using ``tokenize``."""
+    lines = source.splitlines()
+    result = []
+    prev = None
+    fstring_start = None
+    tokens = tokenize.generate_tokens(io.StringIO(source).readline)
+    for tok_type, string, start, end, _ in tokens:
+        name = tokenize.tok_name[tok_type]
+        kind = None
+        if name == 'FSTRING_START':         # python >= 3.12
+            fstring_start = start
+        elif name == 'FSTRING_END':
+            start, kind = fstring_start, 'string'
+            fstring_start = None
+        elif fstring_start:
+            pass
+        elif name == 'COMMENT':
+            kind = 'comment'
+        elif name == 'NUMBER':
+            kind = 'numbers'
+        elif name == 'STRING':
+            triple = string.lstrip('rRbBuUfF')[:3] in ('"""', "'''")
+            kind = 'string2' if triple else 'string'
+        elif name == 'NAME' and prev in ('def', 'class'):
+            kind = 'defclass'
+        elif name == 'NAME' and keyword.iskeyword(string):
+            kind = 'keyword'
+        if name not in ('NL', 'NEWLINE', 'INDENT', 'DEDENT', 'COMMENT'):
+            prev = string
+        if kind is None:
+            continue
+        (srow, scol), (erow, ecol) = start, end
+        for row in range(srow, erow + 1):
+            col0 = scol if row == srow else 0
+            col1 = ecol if row == erow else len(lines[row-1])
+            if col1 > col0:
+                result.append((row, col0, col1 - col0, kind))
+    return result
+
+
+def corpus():
+    pattern = os.path.join(os.path.dirname(__file__), '..', '*', '*.py')
+    files = sorted(glob.glob(pattern))
+    assert files
+    files.insert(0, os.path.join(os.path.dirname(__file__), 'lexer_sample.txt'))
+    for filename in files:
+        with io.open(filename, encoding='utf-8') as f:
+            yield os.path.basename(filename), f.read()
+
+
+@pytest.mark.parametrize('name,source', list(corpus()))
+def test_lexer_matches_tokenize(name, source):
+    assert lex_source(source) == tokenize_source(source)
+
+
+def test_lexer_state():
+    tokens, state = lex_line('x = """abc')
+    assert tokens == [(4, 6, 'string2')]
+    assert state == TRIPLE_DOUBLE
+    tokens, state = lex_line('still "inside', state)
+    assert tokens == [(0, 13, 'string2')]
+    assert state == TRIPLE_DOUBLE
+    tokens, state = lex_line('end""" if 1', state)
+    assert tokens == [(0, 6, 'string2'), (7, 2, 'keyword'), (10, 1, 'numbers')]
+    assert state == NORMAL
@@ -0,0 +1,90 @@
+import pstats
+
+import pytest
+
+pytest.importorskip('qtpy.QtCore')
+
+from pyqtconsole.interpreter import PythonInterpreter   # noqa: E402
+from pyqtconsole.profiler import split_prun             # noqa: E402
+
+
+class Output(list):
+
+    def write(self, data):
+        self.append(data)
+
+
+@pytest.fixture
+def interpreter():
+    interpreter = PythonInterpreter(None, Output())
+    interpreter.exec_signal.connect(interpreter.exec_)
+    interpreter.runsource(
+        'def work(n):\n    return sum(i * i for i in range(n))\n', symbol='multi')
+    return interpreter
+
+
+def run(interpreter, source):
+    del interpreter.stdout[:]
+    assert not interpreter.runsource(source, symbol='multi')
+    return ''.join(interpreter.stdout)
+
+
+def test_split_prun():
+    assert split_prun('x = 1\n') == (None, 'x = 1\n')
+    assert split_prun('%prunx\n') == (None, '%prunx\n')
+    options, source = split_prun('%prun -s tottime -l 5 -q  f(x)\ng()\n')
+    assert source == 'f(x)\ng()\n'
+    assert (options.sort, options.limit, options.quiet) == ('tottime', 5, True)
+    options, source = split_prun('%prun -i 2\nfor x in y:\n    f(x)\n')
+    assert options.interval == 0.002
+    assert source == 'for x in y:\n    f(x)\n'
+    assert split_prun('%prun -- -x\n')[1] == '-x\n'
+    for source in ['%prun\n', '%prun -x f()', '%prun -l many f()',
+                   '%prun -s name f()', '%prun -i 1 -D file f()', '%prun -s']:
+        with pytest.raises(ValueError):
+            split_prun(source)
+
+
+def test_prun_incomplete(interpreter):
+    assert interpreter.runsource('%prun -l 3 for i in range(3):\n',
+                                 symbol='multi')
+
+
+def test_prun_table(interpreter):
+    text = run(interpreter, '%prun -l 3 [work(100) for i in range(10)]\n')
+    lines = text.splitlines()
+    assert 'function calls in' in lines[0]
+    assert lines[2].split() == ['ncalls', 'tottime', 'cumtime', 'function']
+    assert len(lines) == 6
+    text = run(interpreter, '%prun -s ncalls work(10)\n')
+    assert text.splitlines()[3].split()[0] == '11'
+    assert interpreter.locals['work'](3) == 5
+
+
+def test_prun_error(interpreter):
+    text = run(interpreter, '%prun -s calls\nwork(10)\n1 / 0\n')
+    assert text.index('ZeroDivisionError') < text.index('function calls')
+    assert 'invalid value for -l' in run(interpreter, '%prun -l x work(1)\n')
+
+
+def test_prun_dump(interpreter, tmpdir):
+    path = str(tmpdir.join('work.pstats'))
+    text = run(interpreter, '%%prun -q -D %s work(10)\n' % path)
+    assert text == 'Profile saved to %s\n' % path
+    stats = pstats.Stats(path)
+    assert any(name == 'work' for _, _, name in stats.stats)
+
+
+def test_prun_sampling(interpreter):
+    text = run(interpreter, '%prun -i 1 -l 5\n'
+                            'import time\n'
+                            'end = time.time() + 0.3\n'
+                            'while time.time() < end:\n'
+                            '    work(1000)\n')
+    lines = text.splitlines()
+    assert 'samples every 1 ms' in lines[0]
+    assert int(lines[0].split()[0]) > 10
+    assert lines[2].split() == ['self', 'cumul', 'function']
+    assert lines[3].endswith('<input>:1(<module>)')
+    assert lines[3].split()[1] == '100.0%'
+    assert any(line.endswith('(work)') for line in lines[4:])
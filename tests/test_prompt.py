@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+pytest.importorskip('qtpy.QtWidgets')
+
+from pyqtconsole.prompt import PromptDoc    # noqa: E402
+
+
+class ListPromptDoc(list):
+
+    """Reference implementation of PromptDoc."""
+
+    def insert_text(self, text):
+        lines = text.split('\n')
+        self[-1] += lines[0]
+        self += lines[1:]
+
+
+def test_prompt_doc_matches_list():
+    rng = random.Random(0)
+    texts = ['', '\n', 'IN [0]: ', '...: ', '\n\n\n', 'OUT[1]: \n\n',
+             '\nIN [2]: ', 'a\n\nb\n']
+    doc, ref = PromptDoc(), ListPromptDoc([''])
+    for _ in range(2000):
+        op = rng.random()
+        if op < 0.6:
+            text = rng.choice(texts)
+            doc.insert_text(text)
+            ref.insert_text(text)
+        elif op < 0.7:
+            line = rng.randrange(-len(ref), len(ref))
+            text = rng.choice(['', 'IN [0]: ', '...: '])
+            doc[line] = text
+            ref[line] = text
+        else:
+            start = rng.randrange(len(ref))
+            stop = start + rng.randrange(4)
+            if op < 0.85:
+                start = 0
+            if stop < len(ref):
+                del doc[start:stop]
+                del ref[start:stop]
+        assert len(doc) == len(ref)
+        assert [doc[i] for i in range(len(doc))] == ref
+        assert doc[-1] == ref[-1]
+    in_use = set(doc._ids)
+    assert set(doc._index.values()) == in_use
+    assert all(doc._counts[i] == doc._ids.count(i) for i in in_use)
+
+
+def test_prompt_doc_stores_only_prompts():
+    doc = PromptDoc()
+    assert doc.insert_text('IN [0]: ') == ['IN [0]: ']
+    assert doc.insert_text('\n' * 1000000) == []
+    assert doc.insert_text('OUT[0]: \n\n') == ['OUT[0]: ']
+    assert len(doc) == 1000003
+    assert len(doc._lines) == 2
+    assert doc[0] == 'IN [0]: '
+    assert doc[1000000] == 'OUT[0]: '
+    with pytest.raises(IndexError):
+        doc[1000003]
+
+
+def test_prompt_doc_frees_trimmed_prompts():
+    doc = PromptDoc()
+    for i in range(1000):
+        doc.insert_text('IN [%d]: \nOUT[%d]: \n' % (i, i))
+        del doc[:max(len(doc) - 5, 0)]
+    assert [doc[i] for i in range(len(doc))] == [
+        'IN [998]: ', 'OUT[998]: ', 'IN [999]: ', 'OUT[999]: ', '']
+    assert len(doc._index) == 4
+    assert len(doc._table) <= 6
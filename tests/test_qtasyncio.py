@@ -0,0 +1,133 @@
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('qtpy.QtWidgets')
+
+if sys.version_info < (3, 8):
+    pytest.skip('top-level await requires python 3.8',
+                allow_module_level=True)
+
+import asyncio      # noqa: E402
+
+from pyqtconsole.console import PythonConsole       # noqa: E402
+from pyqtconsole.qtasyncio import QtEventLoop       # noqa: E402
+
+
+@pytest.fixture
+def loop(qapp):
+    loop = QtEventLoop()
+    yield loop
+    loop.close()
+
+
+def wait_for(qapp, condition, timeout=5):
+    start = time.time()
+    while not condition():
+        assert time.time() - start < timeout
+        qapp.processEvents()
+        time.sleep(0.001)
+
+
+def test_callbacks_and_timers(qapp, loop):
+    calls = []
+    loop.call_later(0.05, calls.append, 'later')
+    loop.call_soon(calls.append, 'soon')
+    loop.call_soon_threadsafe(calls.append, 'threadsafe')
+    wait_for(qapp, lambda: len(calls) == 3)
+    assert calls == ['soon', 'threadsafe', 'later']
+
+    thread = threading.Thread(
+        target=lambda: loop.call_soon_threadsafe(calls.append, 'thread'))
+    thread.start()
+    thread.join()
+    wait_for(qapp, lambda: len(calls) == 4)
+
+
+def test_concurrent_io(qapp, loop):
+    async def echo(reader, writer):
+        writer.write(await reader.read(100))
+        await writer.drain()
+        writer.close()
+
+    async def request(port, i):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'%d' % i)
+        data = await reader.read(100)
+        writer.close()
+        return int(data)
+
+    async def main():
+        server = await asyncio.start_server(echo, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await asyncio.gather(*(request(port, i)
+                                          for i in range(50)))
+        finally:
+            server.close()
+
+    task = loop.create_task(main())
+    wait_for(qapp, task.done)
+    assert task.result() == list(range(50))
+
+
+def test_idle_loop_does_not_iterate(qapp, loop, process_events):
+    a, b = socket.socketpair()
+    a.setblocking(False)
+    task = loop.create_task(loop.sock_recv(a, 10))
+    process_events(50)
+    iterations = []
+    loop.run_forever = lambda: iterations.append(1)
+    process_events(200)
+    assert not iterations and not task.done()
+    a.close()
+    b.close()
+    task.cancel()
+
+
+@pytest.fixture
+def console(qapp):
+    console = PythonConsole()
+    console.eval_asyncio()
+    yield console
+    console.exit()
+
+
+def run(qapp, console, source, timeout=5):
+    """Execute the source and wait until the next prompt is shown."""
+    line = console._current_line
+    console.process_input(source)
+    wait_for(qapp, lambda: console._current_line != line, timeout)
+    qapp.processEvents()
+    return console.edit.toPlainText()
+
+
+def test_top_level_await(qapp, console):
+    run(qapp, console, 'import asyncio')
+    start = time.time()
+    text = run(qapp, console, 'x = await asyncio.gather(\n'
+               '    *(asyncio.sleep(0.2, i) for i in range(200)))\n'
+               'await asyncio.sleep(0, len(x))')
+    assert time.time() - start < 2
+    assert text.endswith('200\n\n')
+    assert console.interpreter.locals['x'] == list(range(200))
+    text = run(qapp, console, 'async def f():\n    raise ValueError(1)\n\n')
+    text = run(qapp, console, 'await f()')
+    assert 'exec_async' not in text
+    assert text.endswith('ValueError: 1\n\n')
+
+
+def test_cancel_await(qapp, console):
+    run(qapp, console, 'import asyncio')
+    console.process_input('await asyncio.sleep(10)')
+    wait_for(qapp, console._executing)
+    start = time.time()
+    console._handle_ctrl_c()
+    wait_for(qapp, lambda: not console._executing())
+    text = run(qapp, console, '1 + 2')
+    assert time.time() - start < 2
+    assert 'KeyboardInterrupt' in text
+    assert text.endswith('\n3\n\n')
@@ -0,0 +1,83 @@
+import io
+import json
+
+import pytest
+
+pytest.importorskip('qtpy.QtCore')
+
+from pyqtconsole.interpreter import PythonInterpreter       # noqa: E402
+from pyqtconsole.stats import CellLog, CellStats, format_stats  # noqa: E402
+
+
+class Output(list):
+
+    def write(self, data):
+        self.append(data)
+
+
+def measure(source, memory=False):
+    interpreter = PythonInterpreter(None, Output())
+    interpreter.collect_stats = True
+    interpreter.trace_memory = memory
+    recorded = []
+    interpreter.stats_signal.connect(recorded.append)
+    interpreter.exec_(interpreter.compile(source, '<input>', 'multi'))
+    assert len(recorded) == 1
+    return recorded[0]
+
+
+def test_interpreter_stats():
+    stats = measure('data = [0] * 100000\nprint("hello")\n', memory=True)
+    assert stats.status == 'ok'
+    assert stats.output_chars == 6
+    assert stats.wall >= 0 and stats.cpu >= 0
+    assert stats.peak_memory >= 800000
+    assert stats.net_memory >= 800000
+    assert stats.index is None and stats.source is None
+
+
+def test_interpreter_stats_status():
+    stats = measure('1 / 0')
+    assert stats.status == 'error'
+    assert stats.peak_memory is None and stats.net_memory is None
+    assert measure('raise KeyboardInterrupt').status == 'interrupted'
+
+
+def test_cell_log_export():
+    log = CellLog(maxlen=2)
+    for i in range(3):
+        log.append(CellStats(i, 'x = %d' % i, 0.0, 0.5, 0.25, None, None,
+                             0, 'ok'))
+    assert [stats.index for stats in log] == [1, 2]
+    csv_file = io.StringIO()
+    log.export_csv(csv_file)
+    lines = csv_file.getvalue().splitlines()
+    assert lines[0] == ','.join(CellStats._fields)
+    assert lines[1] == '1,x = 1,0.0,0.5,0.25,,,0,ok'
+    json_file = io.StringIO()
+    log.export_json(json_file)
+    assert json.loads(json_file.getvalue())[1]['source'] == 'x = 2'
+
+
+def test_format_stats():
+    stats = CellStats(0, '', 0.0, 0.0123, 1.5, 3 << 20, -1024, 24, 'ok')
+    assert format_stats(stats) == (
+        '12.3 ms wall, 1.5 s cpu, peak 3 MiB, net -1 KiB, 24 chars output')
+
+
+def test_console_shows_stats(qapp):
+    pytest.importorskip('qtpy.QtWidgets')
+    from pyqtconsole.console import PythonConsole
+    console = PythonConsole()
+    console.interpreter.exec_signal.connect(console.interpreter.exec_)
+    try:
+        log = console.enable_cell_stats()
+        console.process_input('x = 1\n')
+        console.process_input('x + 1\n')
+        text = console.edit.toPlainText()
+        assert text.startswith('# ') and ' cpu' in text
+        assert '\n2  # ' in text
+        assert [(stats.index, stats.source) for stats in log] == [
+            (0, 'x = 1\n'), (1, 'x + 1\n')]
+    finally:
+        console.exit()
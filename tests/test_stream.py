@@ -0,0 +1,69 @@
+import tracemalloc
+
+import pytest
+
+pytest.importorskip('qtpy.QtCore')
+
+from pyqtconsole.stream import InputStream, OutputStream   # noqa: E402
+
+
+def test_write_emits_each_chunk(qapp):
+    stream = OutputStream()
+    events = []
+    stream.write_event.connect(events.append)
+    stream.write('a')
+    stream.write('b\n')
+    assert events == ['a', 'b\n']
+
+
+def test_output_memory_is_constant(qapp):
+    stream = OutputStream()
+    chunk = 'x' * (1 << 20)
+    tracemalloc.start()
+    try:
+        for _ in range(2048):       # 2 GiB in total
+            stream.write(chunk)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak < len(chunk)
+
+
+def test_coalesced_writes_are_batched(process_events):
+    stream = OutputStream()
+    stream.set_coalescing(interval=1, max_batch=4)
+    events = []
+    stream.write_event.connect(events.append)
+    for i in range(5):
+        stream.write(str(i))
+    assert events == []
+    process_events()
+    assert events == ['0123', '4']
+
+
+def test_emit_pending_flushes_immediately(process_events):
+    stream = OutputStream()
+    stream.set_coalescing(interval=1000, max_batch=2)
+    events = []
+    stream.write_event.connect(events.append)
+    stream.write('abc')
+    stream.write('de')
+    stream.emit_pending()
+    assert events == ['abcde']
+    process_events()
+    assert events == ['abcde']
+
+
+def test_readline(qapp):
+    stream = InputStream()
+    stream.write('ab')
+    assert stream.readline(timeout=0) == ''
+    stream.write('c\nde')
+    stream.write('f\ng\n')
+    assert stream.readline() == 'abc\n'
+    assert stream.readline() == 'def\n'
+    assert stream.readline() == 'g\n'
+    assert stream.readline(timeout=0) == ''
+    stream.write('h')
+    assert stream.flush() == 'h'
+    assert stream.readline(timeout=0) == ''
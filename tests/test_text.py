@@ -1,5 +1,5 @@
 import pytest
-from pyqtconsole.text import columnize
+from pyqtconsole.text import columnize, common_prefix
 
 
 def _strip(text):
@@ -171,3 +171,18 @@ def test_columnize_count55():
 def test_columnize_raises_typeerror():
     with pytest.raises(TypeError):
         columnize(5)
+
+
+def test_columnize_too_wide():
+    data = ['a' * 10, 'b', 'c']
+    expect = 'aaaaaaaaaa\nb         \nc         \n'
+    assert columnize(data, displaywidth=6) == expect
+    assert columnize(data, displaywidth=6, arrange_vertical=False) == expect
+
+
+def test_common_prefix():
+    assert common_prefix([]) == ''
+    assert common_prefix(['foo']) == 'foo'
+    assert common_prefix(['foobar', 'foo', 'foobaz']) == 'foo'
+    assert common_prefix(['print', 'property', 'pow']) == 'p'
+    assert common_prefix(['abc_x', 'def_x']) == ''